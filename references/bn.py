@@ -4,13 +4,19 @@
 # Focuses BN on estimating P(doom) by 2035 based on relevant timing/risk factors.
 # Uses heuristics to extrapolate estimates for 2050 and 2100.
 # NOTE: CPTs and heuristics are ILLUSTRATIVE and NOT CALIBRATED.
+# MODIFIED: Queries run on a compiled junction tree (bn_exact.py): one calibration per
+#           evidence set returns every marginal, cached so nothing is recomputed.
 
 import numpy as np
-from pgmpy.models import BayesianNetwork
+try: # pgmpy >= 1.0 renamed the discrete model class
+    from pgmpy.models import DiscreteBayesianNetwork as BayesianNetwork
+except ImportError:
+    from pgmpy.models import BayesianNetwork
 from pgmpy.factors.discrete import TabularCPD
-from pgmpy.inference import VariableElimination
 import pandas as pd
 import sys
+import functools
+import bn_exact
 
 # --- 1. Define Simplified Expert Data ---
 # Rough P(doom by 2100 = High or VeryHigh) % - Still used for final heuristic comparison
@@ -146,12 +152,25 @@ except Exception as e:
      sys.exit(1)
 
 # --- 6. Inference Engine ---
+# The model is compiled once into a junction tree (elimination ordering, cliques and
+# message schedule). A single calibration yields all marginals, and results are cached
+# per evidence set, so the quiz loop and the final heuristic block share the work.
 try:
-    infer = VariableElimination(model)
+    compiled_network = bn_exact.network_from_pgmpy(model)
+    junction_tree = bn_exact.junction_tree_for(compiled_network)
 except Exception as e:
     print(f"Failed to initialize inference engine: {e}")
     sys.exit(1)
 
+@functools.lru_cache(maxsize=256)
+def query_all_marginals(evidence_items):
+    """All posterior marginals {node: {state: p}} for a frozen evidence tuple (one calibration pass)."""
+    return junction_tree.marginals(dict(evidence_items))
+
+def query_marginals(evidence=None):
+    """Cached posterior marginals for an evidence dict."""
+    return query_all_marginals(tuple(sorted((evidence or {}).items())))
+
 # --- 7. Define Questions and Mapping ---
 questions_map = {
      'Q14': { # Maps to AGI_Time
@@ -205,38 +224,22 @@ current_level = 0
 print("\n--- AI Risk Assessment (BN Focus on 2035) ---")
 
 def get_prob(prob_dist, state_name, default=0.0):
-    if prob_dist is None: return default
-    var = prob_dist.variables[0]
-    # Use state_names from the CPD associated with the variable for checking
-    cpd = model.get_cpds(var)
-    if cpd and hasattr(cpd, 'state_names') and var in cpd.state_names:
-        valid_states = cpd.state_names[var]
-        if state_name in valid_states:
-             # Ensure the probability distribution object also uses the same state names
-             if hasattr(prob_dist, 'state_names') and var in prob_dist.state_names and state_name in prob_dist.state_names[var]:
-                  try:
-                      # Create the state dictionary dynamically for get_value
-                      state_dict = {var: state_name}
-                      # Get index based on distribution's state order
-                      state_index = prob_dist.state_names[var].index(state_name)
-                      return prob_dist.values.flat[state_index] # Access flat array value
-                  except Exception as e:
-                      print(f"Warning: Error getting value for state '{state_name}' node '{var}': {e}")
-                      return default
-             else:
-                  # This case might happen if inference returns states differently than CPD
-                  print(f"Warning: State name mismatch between CPD and distribution for '{var}'.")
-                  return default
-    # print(f"Warning: State '{state_name}' not found for variable '{var}' in distribution states.")
-    return default
+    """Probability of state_name in a {state: p} distribution (default if unavailable)."""
+    if not prob_dist or state_name not in prob_dist: return default
+    return prob_dist[state_name]
+
+def print_distribution(node, prob_dist, indent=""):
+    """Prints a {state: p} distribution as a small table."""
+    for state, prob in prob_dist.items():
+        print(f"{indent}  P({node}={state}) = {prob:.4f}")
 
 
 # Initial state
 initial_prob = None
 try:
-    initial_prob = infer.query(['P_doom_2035'], show_progress=False)
+    initial_prob = query_marginals()['P_doom_2035']
     print("\nInitial Estimated P(doom by 2035) Distribution:")
-    print(initial_prob)
+    print_distribution('P_doom_2035', initial_prob)
     p_high_vh = (get_prob(initial_prob,'High') + get_prob(initial_prob,'VeryHigh')) * 100
     print(f"Initial P(Doom by 2035 = High or VeryHigh): {p_high_vh:.1f}%")
 except Exception as e:
@@ -273,9 +276,9 @@ for qid in sorted_qids:
             print(f" -> Setting Evidence: {node} = {chosen_state}")
 
             try:
-                updated_prob = infer.query(['P_doom_2035'], evidence=user_evidence, show_progress=False)
+                updated_prob = query_marginals(user_evidence)['P_doom_2035']
                 print("\n   Updated P(doom by 2035) Distribution:")
-                print(updated_prob)
+                print_distribution('P_doom_2035', updated_prob, indent="   ")
                 p_high_vh = (get_prob(updated_prob,'High') + get_prob(updated_prob,'VeryHigh')) * 100
                 print(f"   Current P(Doom by 2035 = High or VeryHigh): {p_high_vh:.1f}%")
             except Exception as e:
@@ -295,25 +298,17 @@ prob_agi_time = None
 prob_align_time = None
 
 try:
-    # Final P(doom) by 2035
-    final_prob_doom_2035 = infer.query(['P_doom_2035'], evidence=user_evidence, show_progress=False)
+    # Final P(doom) by 2035 - the same cached calibration also holds AGI_Time / Alignment_Solved_Time
+    final_marginals = query_marginals(user_evidence)
+    final_prob_doom_2035 = final_marginals['P_doom_2035']
     print("\nFinal P(doom by 2035) Distribution based on your answers:")
-    print(final_prob_doom_2035)
+    print_distribution('P_doom_2035', final_prob_doom_2035)
     final_pdoom_2035_high_vh_percent = (get_prob(final_prob_doom_2035,'High') + get_prob(final_prob_doom_2035,'VeryHigh')) * 100
     print(f"\nYour Final Estimated P(Doom=High or VeryHigh by 2035): {final_pdoom_2035_high_vh_percent:.1f}%")
 
-    # Query intermediate nodes needed for heuristics (Corrected query logic)
-    evidence_no_agi = {k: v for k, v in user_evidence.items() if k != 'AGI_Time'}
-    if 'AGI_Time' not in user_evidence: # Query if not evidence
-         prob_agi_time = infer.query(['AGI_Time'], evidence=evidence_no_agi, show_progress=False)
-    else: # If it was evidence, we know its state
-         prob_agi_time = None # Indicate we don't need to query
-
-    evidence_no_align = {k: v for k, v in user_evidence.items() if k != 'Alignment_Solved_Time'}
-    if 'Alignment_Solved_Time' not in user_evidence:
-         prob_align_time = infer.query(['Alignment_Solved_Time'], evidence=evidence_no_align, show_progress=False)
-    else:
-         prob_align_time = None
+    # Intermediate nodes needed for heuristics (None if they were given as evidence)
+    prob_agi_time = final_marginals['AGI_Time'] if 'AGI_Time' not in user_evidence else None
+    prob_align_time = final_marginals['Alignment_Solved_Time'] if 'Alignment_Solved_Time' not in user_evidence else None
 
 except Exception as e:
     print(f"\nError during final inference/querying: {e}")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Anytime P(doom) inference under a latency budget.
+
+anytime_query() returns the best answer it can produce before the budget
+runs out, trying the cheapest source first and tagging the result with the
+method used and an error estimate:
+
+1. 'table' / 'cache': the precomputed answer-space table (bn_lookup) or an
+   earlier result for the same model and evidence.
+2. 'exact' / 'forward': the junction tree posterior (mode='exact') or the
+   forward pass (mode='forward'), run only when its predicted cost fits in
+   the remaining budget. Error 0.
+3. 'sampling': likelihood weighting (bn_sampling), refined chunk by chunk
+   until the deadline or target_se. Its error is the standard error of
+   P(High or VeryHigh). It is only used with mode='exact', because sampling
+   estimates the posterior, not the forward pass.
+
+The lookup table holds forward-pass values, so it only answers mode='forward'.
+Costs are predicted from clique sizes at first and then from measured run
+times, kept per model. Call warm_up() at startup so the first request does
+not pay for compiling the junction tree.
+
+model is a CompiledNetwork (e.g. vanilla_bn.get_compiled_network(CPTS_central)
+from bn_cpts.json) or a pgmpy model such as the one in bn.py, which is
+compiled once and cached. Later edits to the pgmpy model are not seen.
+
+Usage: python bn_anytime.py [--budget-ms MS] [--mode exact|forward] [--table FILE] [--pgmpy] [Node=State ...]
+"""
+
+import argparse
+import sys
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+import bn_cache
+import bn_engine
+import bn_exact
+import bn_sampling
+
+# --- Configuration ---
+DEFAULT_BUDGET = 0.050 # Seconds
+TABLE_ERROR = 1e-7 # Table values are float32
+EXACT_SECONDS_PER_CLIQUE = 2e-5 # First-query cost model, before any exact query has been timed
+EXACT_SECONDS_PER_ENTRY = 2e-8
+FORWARD_SECONDS_PER_NODE = 5e-6
+COST_SMOOTHING = 0.3 # Weight of the newest timing in the running cost estimates
+MIN_SAMPLE_CHUNK = 256
+MAX_SAMPLE_CHUNK = bn_sampling.DEFAULT_CHUNK
+SAFETY = 0.8 # Fraction of the remaining budget a step may be predicted to use
+RESULT_CACHE_SIZE = 4096
+
+# --- 1. Models ---
+PGMPY_NETWORKS = weakref.WeakKeyDictionary() # pgmpy model -> CompiledNetwork
+
+def network_for(model):
+    """CompiledNetwork for a CompiledNetwork or a pgmpy model. Raises TypeError otherwise."""
+    if isinstance(model, bn_engine.CompiledNetwork):
+        return model
+    if hasattr(model, 'get_cpds'):
+        network = PGMPY_NETWORKS.get(model)
+        if network is None:
+            network = PGMPY_NETWORKS[model] = bn_exact.network_from_pgmpy(model)
+        return network
+    raise TypeError(f"Expected a CompiledNetwork or a pgmpy model, got {type(model).__name__}.")
+
+class AnytimeState:
+    """Per-network results cache and running cost estimates. Holds the network weakly (STATES is keyed by it)."""
+
+    def __init__(self, network, target=TARGET_NODE):
+        self._network = weakref.ref(network)
+        self.t, self.high = bn_cli.high_states(network, target)
+        self.costs = {} # 'exact' / 'forward': seconds per query, 'sample': seconds per sample, 'min_chunk': seconds per smallest chunk
+        self.results = OrderedDict() # (mode, evidence) -> result dict
+
+    @property
+    def network(self):
+        network = self._network()
+        if network is None:
+            raise ReferenceError("The network of this AnytimeState has been freed.")
+        return network
+
+    def predicted(self, kind):
+        if kind in self.costs:
+            return self.costs[kind]
+        if kind == 'forward':
+            return FORWARD_SECONDS_PER_NODE * len(self.network)
+        s = bn_exact.structure_for(self.network)
+        entries = sum(int(np.prod([self.network.cardinality[v] for v in clique])) for clique in s.cliques)
+        return EXACT_SECONDS_PER_CLIQUE * len(s.cliques) + EXACT_SECONDS_PER_ENTRY * entries
+
+    def observe(self, kind, seconds):
+        previous = self.costs.get(kind)
+        self.costs[kind] = seconds if previous is None else (1.0 - COST_SMOOTHING) * previous + COST_SMOOTHING * seconds
+
+    def remember(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > RESULT_CACHE_SIZE:
+            self.results.popitem(last=False)
+
+STATES = weakref.WeakKeyDictionary() # network -> AnytimeState
+
+def state_for(network):
+    state = STATES.get(network)
+    if state is None:
+        state = STATES[network] = AnytimeState(network)
+    return state
+
+def warm_up(model, mode='exact'):
+    """Compiles the engine for model ahead of the first request, then times one warm query."""
+    network = network_for(model)
+    state = state_for(network)
+    for _ in range(2): # The first run compiles; only the second is representative
+        start = time.perf_counter()
+        if mode == 'exact':
+            bn_exact.junction_tree_for(network).query({}, [state.t])
+        else:
+            network.forward({})
+        seconds = time.perf_counter() - start
+    state.costs[mode] = seconds
+
+
+# --- 2. Tiers ---
+def result(probability, error, method, start, marginal=None):
+    return {'probability': float(probability), 'error': float(error), 'method': method,
+            'elapsed': time.perf_counter() - start, 'marginal': marginal}
+
+def table_result(table, evidence, start):
+    """Lookup-table answer, or None if the evidence is outside the table (soft evidence never is in it)."""
+    if table is None:
+        return None
+    row = table.lookup(evidence or {})
+    return None if row is None else result(row['p_doom_high_vh'], TABLE_ERROR, 'table', start)
+
+def engine_result(state, evidence, mode, start):
+    """Exact posterior or forward-pass answer, timed into the cost estimates."""
+    net = state.network
+    began = time.perf_counter()
+    if mode == 'exact':
+        marginal = bn_exact.junction_tree_for(net).query(evidence, [state.t])[state.t]
+    else:
+        marginal = net.forward(evidence)[state.t]
+    state.observe(mode, time.perf_counter() - began)
+    return result(marginal[state.high].sum(), 0.0, mode, start, marginal)
+
+def sampling_result(state, evidence, deadline, start, target_se=None, seed=None):
+    """Likelihood weighting in budget-sized chunks until the deadline (at least one chunk) or target_se."""
+    net = state.network
+    encoded, likelihoods = net.encode_evidence(evidence), net.encode_likelihoods(evidence)
+    estimate = bn_sampling.RunningEstimate(net, [state.t])
+    root = np.random.SeedSequence(seed)
+    while True:
+        remaining = deadline - time.perf_counter()
+        per_sample = state.costs.get('sample')
+        size = MIN_SAMPLE_CHUNK if per_sample is None else int(SAFETY * remaining / per_sample)
+        size = min(max(size, MIN_SAMPLE_CHUNK), MAX_SAMPLE_CHUNK)
+        if estimate.samples and (per_sample is None or size * per_sample > remaining):
+            break
+        began = time.perf_counter()
+        estimate.update(bn_sampling.chunk_statistics(net, encoded, [state.t], size, root.spawn(1)[0], likelihoods))
+        elapsed = time.perf_counter() - began
+        state.observe('sample', elapsed / size)
+        if size == MIN_SAMPLE_CHUNK:
+            state.observe('min_chunk', elapsed)
+        p, se = estimate.event_probability(state.t, state.high)
+        if target_se is not None and se <= target_se:
+            break
+    p, se = estimate.event_probability(state.t, state.high)
+    return result(p, se, 'sampling', start, estimate.marginal(state.t))
+
+
+# --- 3. Entry Point ---
+def anytime_query(model, evidence=None, budget=DEFAULT_BUDGET, mode='exact', table=None, target_se=None, seed=None):
+    """
+    Best P(P_doom_2035 = High or VeryHigh) within budget seconds, as a dict
+    {'probability', 'error', 'method', 'elapsed', 'marginal'} (marginal is
+    None for table answers). table is a bn_lookup.LookupTable built from the
+    same CPTs, used with mode='forward'.
+    """
+    if mode not in ('exact', 'forward'):
+        raise ValueError(f"Unknown inference mode '{mode}'.")
+    start = time.perf_counter()
+    deadline = start + budget
+    if mode == 'forward':
+        answer = table_result(table, evidence, start)
+        if answer is not None:
+            return answer
+    state = state_for(network_for(model))
+    key = (mode, bn_cache.canonical_evidence(evidence))
+    cached = state.results.get(key)
+    if cached is not None and (cached['error'] == 0.0 or (target_se is not None and cached['error'] <= target_se)):
+        state.results.move_to_end(key)
+        return dict(cached, method='cache', elapsed=time.perf_counter() - start)
+    # Exact when it fits, or when it is cheaper than the smallest sampling step anyway
+    exact_cost = 0.0 if mode == 'forward' else state.predicted('exact')
+    if exact_cost <= max(SAFETY * (deadline - time.perf_counter()), state.costs.get('min_chunk', 0.0)):
+        answer = engine_result(state, evidence, mode, start)
+    else:
+        answer = sampling_result(state, evidence, deadline, start, target_se, seed)
+        if cached is not None and cached['error'] < answer['error']: # An earlier, longer run was better
+            return dict(cached, method='cache', elapsed=time.perf_counter() - start)
+    state.remember(key, answer)
+    return answer
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="P(doom by 2035) within a latency budget.")
+    bn_cli.add_evidence_argument(parser, 'ControlLossRisk=High')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET * 1000)
+    parser.add_argument('--mode', choices=('exact', 'forward'), default='exact')
+    parser.add_argument('--table', help="Lookup table built by bn_lookup.py (forward mode).")
+    parser.add_argument('--pgmpy', action='store_true', help="Query the equivalent pgmpy model instead of the compiled one.")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+
+    import vanilla_bn
+    model = bn_cli.central_network()
+    if args.pgmpy:
+        try:
+            model = bn_exact.to_pgmpy_model(model)
+        except ImportError:
+            print("Error: --pgmpy requires pgmpy.", file=sys.stderr)
+            sys.exit(1)
+    table = None
+    if args.table:
+        import bn_lookup
+        table = bn_lookup.load_lookup_table(args.table, bn_engine.file_sha256(vanilla_bn.CPTS_JSON_PATH), vanilla_bn.PERTURBATION_DELTA)
+    budget = args.budget_ms / 1000.0
+    print(f"\nP({TARGET_NODE} = High or VeryHigh) within {args.budget_ms:g} ms ({args.mode}):")
+    for attempt in ('cold', 'repeat'):
+        answer = anytime_query(model, evidence, budget, args.mode, table, seed=args.seed)
+        print(f"  {attempt:<7} {answer['probability'] * 100:6.2f}% +/- {answer['error'] * 100:.3f}%  "
+              f"[{answer['method']}, {answer['elapsed'] * 1000:.2f} ms]")
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the P(doom) Bayesian network inference engines.
+
+Usage: python bn_benchmarks.py [forward] [batch] [exact] [incremental] [load] [scaling] [parametric] [uncertainty] [import] [memory] [--repeats N]
+Run from the references/ directory (paths to bn_cpts.json are relative).
+"""
+
+import argparse
+import contextlib
+import io
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# --- Configuration ---
+SCALING_SIZES = (50, 200, 1000) # Synthetic DAG sizes for the scaling benchmark
+SCALING_MAX_PARENTS = 3
+SCALING_PARENT_WINDOW = 8 # Parents are drawn from the previous N nodes (keeps treewidth bounded)
+SCALING_SAMPLES = 10000
+EXACT_STATE_LIMIT = 2 ** 22 # Skip exact inference when the largest clique has more joint states
+PARAMETRIC_PARENT_COUNTS = (2, 4, 6, 8, 10)
+UNCERTAINTY_SAMPLES = 10000
+IMPORT_RUNS = 5 # Fresh interpreters per import timing (best run is reported)
+MEMORY_VARIANTS = 100 # CPT variants (one overridden node each) for the memory benchmark
+IMPORT_DEPENDENCIES = 'numpy, bn_cache, bn_credal, bn_engine, bn_exact, bn_horizon, bn_incremental, bn_sampling, bn_uncertainty, bn_voi'
+
+# --- Helper Functions ---
+def import_quietly(module_name):
+    """Imports a script module and builds its lazy CPT model (if any) while swallowing the prints."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        module = __import__(module_name)
+        if hasattr(module, 'MODEL'):
+            module.MODEL.build()
+    return module
+
+def time_per_call(func, repeats):
+    """Returns the best-of-three mean wall time per call in microseconds."""
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            func()
+        best = min(best, (time.perf_counter() - start) / repeats)
+    return best * 1e6
+
+def print_row(label, micros, baseline=None):
+    speedup = f"{baseline / micros:8.1f}x" if baseline else ""
+    print(f"  {label:<54} {micros:10.1f} us {speedup}")
+
+
+# --- 1. Forward Pass: dict/itertools vs compiled tensors ---
+def benchmark_forward(repeats):
+    vbn = import_quietly('vanilla_bn')
+    evidence = {'Timeline': 'Early', 'Coordination': 'Poor', 'MisusePotential': 'High'}
+    variants = [('central', vbn.CPTS_central), ('optimistic', vbn.CPTS_optimistic), ('pessimistic', vbn.CPTS_pessimistic)]
+
+    print("Forward pass, one query (3 evidence nodes):")
+    legacy = time_per_call(lambda: vbn.update_all_probabilities_reference(evidence, vbn.CPTS_central), repeats)
+    compiled = time_per_call(lambda: vbn.update_all_probabilities_manual(evidence, vbn.CPTS_central), repeats)
+    network = vbn.get_compiled_network(vbn.CPTS_central)
+    raw = time_per_call(lambda: network.forward(evidence), repeats)
+    print_row("dict/itertools (update_all_probabilities_reference)", legacy)
+    print_row("compiled, dict output", compiled, legacy)
+    print_row("compiled, vector output", raw, legacy)
+
+    print("Quiz step (central + optimistic + pessimistic):")
+    legacy3 = time_per_call(lambda: [vbn.update_all_probabilities_reference(evidence, c) for _, c in variants], repeats)
+    compiled3 = time_per_call(lambda: [vbn.update_all_probabilities_manual(evidence, c) for _, c in variants], repeats)
+    networks = [vbn.get_compiled_network(c) for _, c in variants]
+    separate = time_per_call(lambda: [n.forward(evidence) for n in networks], repeats)
+    shared = time_per_call(lambda: vbn.bn_engine.evaluate_scenarios(networks, evidence), repeats)
+    print_row("dict/itertools", legacy3)
+    print_row("compiled", compiled3, legacy3)
+    print_row("compiled, 3 separate forward passes (uncached)", separate, legacy3)
+    print_row("compiled, shared-upstream scenarios (uncached)", shared, legacy3)
+
+    worst = 0.0
+    for _, cpts in variants:
+        ref = vbn.update_all_probabilities_reference(evidence, cpts)
+        new = vbn.update_all_probabilities_manual(evidence, cpts)
+        worst = max(worst, max(abs(ref[n][s] - new[n][s]) for n in ref for s in ref[n]))
+    print(f"  max |difference| vs reference: {worst:.2e}")
+
+
+# --- 2. Batched Evidence Scoring ---
+def random_evidence(network, rows, observed_fraction=0.5, seed=0):
+    """Random (rows x nodes) evidence index array with roughly observed_fraction of cells set."""
+    rng = np.random.default_rng(seed)
+    evidence = np.full((rows, len(network)), -1, dtype=np.int8)
+    for i, k in enumerate(network.cardinality):
+        mask = rng.random(rows) < observed_fraction
+        evidence[mask, i] = rng.integers(0, k, mask.sum())
+    return evidence
+
+def benchmark_batch(repeats):
+    vbn = import_quietly('vanilla_bn')
+    network = vbn.get_compiled_network(vbn.CPTS_central)
+    sample = random_evidence(network, max(repeats, 1))
+    dicts = [{network.nodes[i]: network.states[i][j] for i, j in enumerate(row) if j >= 0} for row in sample]
+    start = time.perf_counter()
+    for evidence in dicts:
+        vbn.update_all_probabilities_manual(evidence, vbn.CPTS_central)
+    per_row_loop = (time.perf_counter() - start) / len(dicts) * 1e6
+
+    print("Batched scoring (P_doom_2035 + Timeline), 50% of nodes observed per row:")
+    print_row("one dict per call (compiled forward)", per_row_loop)
+    for rows in (10_000, 100_000, 1_000_000):
+        evidence = random_evidence(network, rows)
+        start = time.perf_counter()
+        network.forward_batch(evidence, extra_nodes=['Timeline'])
+        elapsed = time.perf_counter() - start
+        print_row(f"forward_batch, N={rows:,} ({elapsed:.2f} s total)", elapsed / rows * 1e6, per_row_loop)
+
+
+# --- 3. Exact Inference: junction tree vs forward pass vs pgmpy ---
+def benchmark_exact(repeats):
+    vbn = import_quietly('vanilla_bn')
+    import bn_exact
+    network = vbn.get_compiled_network(vbn.CPTS_central)
+    start = time.perf_counter()
+    bn_exact.STRUCTURE_CACHE.clear()
+    tree = bn_exact.JunctionTree(network)
+    compile_ms = (time.perf_counter() - start) * 1e3
+    target = [network.index['P_doom_2035']]
+    evidence = {'ControlLossRisk': 'High', 'Coordination': 'Poor', 'Timeline': 'Early'}
+    print(f"Exact inference ({len(tree.structure.cliques)} cliques, largest {tree.structure.max_clique_states:.0f} states, "
+          f"compiled in {compile_ms:.1f} ms), evidence on 3 nodes incl. a child node:")
+    legacy = time_per_call(lambda: vbn.update_all_probabilities_reference(evidence, vbn.CPTS_central), repeats)
+    print_row("forward pass, dict/itertools (all nodes)", legacy)
+    print_row("forward pass, compiled (all nodes)", time_per_call(lambda: network.forward(evidence), repeats), legacy)
+    print_row("junction tree (all posteriors)", time_per_call(lambda: tree.query(evidence), repeats), legacy)
+    print_row("junction tree (P_doom_2035 only)", time_per_call(lambda: tree.query(evidence, target), repeats), legacy)
+    try:
+        from pgmpy.inference import VariableElimination
+    except ImportError:
+        print("  pgmpy not installed; skipping pgmpy comparison.")
+        return
+    infer = VariableElimination(bn_exact.to_pgmpy_model(network))
+    pgmpy_repeats = max(1, repeats // 10)
+    query = lambda nodes: infer.query(nodes, evidence=evidence, joint=False, show_progress=False)
+    free_nodes = [n for n in network.nodes if n not in evidence]
+    print_row("pgmpy VariableElimination (P_doom_2035 only)", time_per_call(lambda: query(['P_doom_2035']), pgmpy_repeats), legacy)
+    print_row("pgmpy VariableElimination (all posteriors)", time_per_call(lambda: query(free_nodes), pgmpy_repeats), legacy)
+    reference = query(free_nodes)
+    posterior = tree.query(evidence)
+    worst = max(np.abs(reference[n].values - posterior[network.index[n]]).max() for n in free_nodes)
+    print(f"  max |difference| vs pgmpy: {worst:.2e}")
+
+
+# --- 4. Incremental Propagation During the Quiz ---
+def benchmark_incremental(repeats):
+    vbn = import_quietly('vanilla_bn')
+    import bn_exact
+    import bn_incremental
+    network = vbn.get_compiled_network(vbn.CPTS_central)
+    tree = bn_exact.junction_tree_for(network)
+    answers = [(q['node'], next(iter(q['options'].values()))[1]) for q in (vbn.questions_map[qid] for qid in vbn.sorted_qids)
+               if not q.get('is_prior_belief', False)]
+    target = network.index['P_doom_2035']
+
+    def full_quiz(mode):
+        evidence = {}
+        for node, state in answers:
+            evidence[node] = state
+            network.forward(evidence) if mode == 'forward' else tree.query(evidence, [target])
+
+    def incremental_quiz(mode, counts=None):
+        belief = bn_incremental.IncrementalBelief(network, mode)
+        for node, state in answers:
+            belief.set_evidence(node, state)
+            belief.query([target])
+            if counts is not None:
+                counts.append(belief.last_recomputed)
+
+    print(f"Live meter over a {len(answers)}-answer quiz (per answer):")
+    for mode, unit in (('forward', 'nodes'), ('exact', 'messages')):
+        full = time_per_call(lambda: full_quiz(mode), max(1, repeats // 10)) / len(answers)
+        incremental = time_per_call(lambda: incremental_quiz(mode), max(1, repeats // 10)) / len(answers)
+        counts = []
+        incremental_quiz(mode, counts)
+        print_row(f"{mode}: recompute from scratch", full)
+        print_row(f"{mode}: incremental (avg {np.mean(counts):.1f} {unit} recomputed)", incremental, full)
+
+
+# --- 5. Model Loading: JSON parse + compile vs memory-mapped artifact ---
+def benchmark_load(repeats):
+    vbn = import_quietly('vanilla_bn')
+    import bn_engine
+    source_sha256 = bn_engine.file_sha256(vbn.CPTS_JSON_PATH)
+    if bn_engine.load_compiled(vbn.COMPILED_CPTS_PATH, source_sha256) is None:
+        print(f"Compiled artifact {vbn.COMPILED_CPTS_PATH} is missing or stale; run generate_cpts.py first.")
+        return
+    def from_json():
+        with contextlib.redirect_stdout(io.StringIO()):
+            cpts = vbn.load_cpts_from_json(vbn.CPTS_JSON_PATH, vbn.PARENTS, vbn.KEY_DELIMITER)
+        return bn_engine.compile_network(vbn.PARENTS, vbn.STATES, cpts, vbn.CALCULATION_ORDER)
+
+    def quiet_load(snapshot_path=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return vbn.load_cpts_from_json(vbn.CPTS_JSON_PATH, vbn.PARENTS, vbn.KEY_DELIMITER, snapshot_path)
+
+    print("Loading the CPT dicts:")
+    parse_only = time_per_call(quiet_load, repeats)
+    print_row("load_cpts_from_json (parse)", parse_only)
+    if vbn.CPTS_SNAPSHOT_PATH:
+        quiet_load(vbn.CPTS_SNAPSHOT_PATH) # Make sure the snapshot is current
+        print_row("load_cpts_from_json (snapshot hit, hashes the JSON)", time_per_call(lambda: quiet_load(vbn.CPTS_SNAPSHOT_PATH), repeats), parse_only)
+
+    print("Loading the compiled central network:")
+    parsed = time_per_call(from_json, repeats)
+    print_row("load_cpts_from_json + compile_network", parsed)
+    print_row("load_compiled (mmap, hash check skipped)", time_per_call(lambda: bn_engine.load_compiled(vbn.COMPILED_CPTS_PATH), repeats), parsed)
+    print_row("load_or_compile (hashes the JSON, then mmap)", time_per_call(
+        lambda: bn_engine.load_or_compile(vbn.COMPILED_CPTS_PATH, vbn.CPTS_JSON_PATH, from_json), repeats), parsed)
+
+
+# --- 6. Scaling on Synthetic DAGs ---
+def synthetic_network(size, seed=0, max_parents=SCALING_MAX_PARENTS, window=SCALING_PARENT_WINDOW):
+    """
+    Random layered DAG as PARENTS / STATES / CPT dicts (the shape the scripts load),
+    defined in shuffled order so the topological sort does real work.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"Factor_{i:04d}" for i in range(size)]
+    parents_map, states_map, cpts = {}, {}, {}
+    for i in rng.permutation(size):
+        node = names[i]
+        low = max(0, i - window)
+        count = int(rng.integers(0, min(max_parents, i - low) + 1)) if i > low else 0
+        parent_nodes = [names[p] for p in sorted(rng.choice(np.arange(low, i), count, replace=False))] if count else []
+        node_states = ['Low', 'Med', 'High'][:int(rng.integers(2, 4))]
+        parents_map[node], states_map[node] = parent_nodes, node_states
+    for node, parent_nodes in parents_map.items():
+        rows = {}
+        for key in np.ndindex(*[len(states_map[p]) for p in parent_nodes]):
+            probs = rng.dirichlet(np.ones(len(states_map[node])))
+            rows[tuple(states_map[p][j] for p, j in zip(parent_nodes, key))] = dict(zip(states_map[node], probs.tolist()))
+        cpts[node] = rows if parent_nodes else rows[()]
+    return parents_map, states_map, cpts
+
+def benchmark_scaling(repeats):
+    import bn_engine
+    import bn_exact
+    print(f"Synthetic DAGs (<= {SCALING_MAX_PARENTS} parents from the previous {SCALING_PARENT_WINDOW} nodes, 2-3 states):")
+    for size in SCALING_SIZES:
+        parents_map, states_map, cpts = synthetic_network(size)
+        loops = max(1, repeats * 10 // size)
+        print(f" {size} nodes:")
+        start = time.perf_counter()
+        network = bn_engine.compile_network(parents_map, states_map, cpts) # Order from the topological sort
+        print_row("topological sort + compile", (time.perf_counter() - start) * 1e6)
+        evidence = {network.nodes[i]: network.states[i][0] for i in range(0, size, 10)}
+        print_row("forward pass, one query", time_per_call(lambda: network.forward(evidence), loops))
+        rows = random_evidence(network, 1000, observed_fraction=0.1)
+        print_row("forward pass, batched (per row of 1000, all nodes)", time_per_call(
+            lambda: network._forward_chunk(rows.astype(np.int64), range(size)), max(1, loops // 10)) / len(rows))
+        print_row(f"ancestral sampling, {SCALING_SAMPLES} samples", time_per_call(
+            lambda: network.sample(SCALING_SAMPLES, 0), max(1, loops // 10)))
+        start = time.perf_counter()
+        structure = bn_exact.JunctionTreeStructure(network.parents, network.cardinality)
+        print_row(f"junction tree structure ({len(structure.cliques)} cliques, max {structure.max_clique_states:.0f} states)",
+                  (time.perf_counter() - start) * 1e6)
+        if structure.max_clique_states > EXACT_STATE_LIMIT:
+            print(f"  exact inference skipped: largest clique exceeds {EXACT_STATE_LIMIT} states")
+            continue
+        bn_exact.STRUCTURE_CACHE[(tuple(network.parents), tuple(int(k) for k in network.cardinality))] = structure
+        start = time.perf_counter()
+        tree = bn_exact.junction_tree_for(network)
+        print_row("junction tree potentials", (time.perf_counter() - start) * 1e6)
+        target = [size - 1]
+        print_row("exact query, one node", time_per_call(lambda: tree.query(evidence, target), loops))
+        print_row("exact query, all marginals", time_per_call(lambda: tree.query(evidence), max(1, loops // 10)))
+
+
+# --- 7. Parametric CPTs: noisy-MAX factorized vs explicit table ---
+def benchmark_parametric(repeats):
+    import bn_engine
+    rng = np.random.default_rng(0)
+    print("One forward-pass step for a 3-state child of k 3-state parents:")
+    for count in PARAMETRIC_PARENT_COUNTS:
+        parents_map = {f"Parent_{j}": [] for j in range(count)}
+        parents_map['Child'] = list(parents_map)
+        states_map = {node: ['Low', 'Med', 'High'] for node in parents_map}
+        spec = {'type': 'noisy_max', 'leak': {'Low': 0.9, 'Med': 0.08, 'High': 0.02},
+                'links': {p: {s: dict(zip(states_map['Child'], rng.dirichlet(np.ones(3)).tolist())) for s in states_map[p]} for p in parents_map['Child']}}
+        cpts = {p: {'Low': 0.3, 'Med': 0.4, 'High': 0.3} for p in parents_map['Child']}
+        parametric = bn_engine.compile_network(parents_map, states_map, dict(cpts, Child=spec))
+        explicit = bn_engine.compile_network(parents_map, states_map, dict(cpts, Child=bn_engine.expand_parametric_cpt('Child', spec, parents_map['Child'], states_map)))
+        marginals = parametric.forward()
+        child = parametric.index['Child']
+        dense = time_per_call(lambda: explicit.node_marginal(child, marginals, {}), repeats)
+        factorized = time_per_call(lambda: parametric.node_marginal(child, marginals, {}), repeats)
+        worst = np.abs(parametric.node_marginal(child, marginals, {}) - explicit.node_marginal(child, marginals, {})).max()
+        print_row(f"{count:2d} parents, explicit table ({explicit.tables[child].nbytes:,} bytes)", dense)
+        print_row(f"{count:2d} parents, noisy-MAX ({parametric.tables[child].nbytes:,} bytes, max diff {worst:.0e})", factorized, dense)
+
+
+# --- 8. CPT Uncertainty: three-point perturbation vs Dirichlet Monte Carlo ---
+def benchmark_uncertainty(repeats):
+    vbn = import_quietly('vanilla_bn')
+    import bn_uncertainty
+    evidence = {'Timeline': 'Early', 'Coordination': 'Poor', 'MisusePotential': 'High'}
+    network = vbn.get_compiled_network(vbn.CPTS_central)
+    variants = [vbn.get_compiled_network(c) for c in (vbn.CPTS_central, vbn.CPTS_optimistic, vbn.CPTS_pessimistic)]
+    loops = max(1, repeats // 100)
+    print(f"2035 range ({UNCERTAINTY_SAMPLES:,} Dirichlet CPT sets, one core):")
+    three_point = time_per_call(lambda: [variant.forward(evidence) for variant in variants], repeats)
+    sampled = time_per_call(lambda: bn_uncertainty.cpt_uncertainty(network, evidence, UNCERTAINTY_SAMPLES, seed=0), loops)
+    print_row("perturbation (central + optimistic + pessimistic)", three_point)
+    print_row("Dirichlet Monte Carlo, stacked forward pass", sampled)
+    summary = bn_uncertainty.summarize(bn_uncertainty.cpt_uncertainty(network, evidence, UNCERTAINTY_SAMPLES, seed=0))
+    print(f"  q5 / q50 / q95: {summary['q5'] * 100:.1f}% / {summary['q50'] * 100:.1f}% / {summary['q95'] * 100:.1f}%")
+
+
+# --- 9. Import Time: lazy model vs building the CPT variants ---
+def import_seconds(statement, setup='pass'):
+    """Best wall time of statement over IMPORT_RUNS fresh interpreters (setup runs first, untimed)."""
+    code = (f"import contextlib, io, sys, time\n{setup}\nstart = time.perf_counter()\n"
+            f"with contextlib.redirect_stdout(io.StringIO()):\n    {statement}\n"
+            f"print(time.perf_counter() - start)")
+    runs = [float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()[-1])
+            for _ in range(IMPORT_RUNS)]
+    return min(runs)
+
+def benchmark_import(repeats):
+    dependencies = import_seconds(f"import {IMPORT_DEPENDENCIES}")
+    lazy = import_seconds("import vanilla_bn", f"import {IMPORT_DEPENDENCIES}")
+    eager = import_seconds("import vanilla_bn; vanilla_bn.MODEL.build()", f"import {IMPORT_DEPENDENCIES}")
+    first_use = import_seconds("vanilla_bn.MODEL.build()", "import vanilla_bn")
+    print(f"Import time (best of {IMPORT_RUNS} fresh interpreters):")
+    print_row("numpy + bn_* dependencies", dependencies * 1e6)
+    print_row("import vanilla_bn (dependencies already imported)", lazy * 1e6)
+    print_row("import vanilla_bn + MODEL.build() (old import-time work)", eager * 1e6)
+    print_row("MODEL.build() on first use", first_use * 1e6)
+
+
+# --- 10. Variant Memory: deep copies vs copy-on-write layers ---
+def allocated_bytes(build):
+    """Bytes still allocated (tracemalloc) after build() returns, with its result kept alive."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+def benchmark_memory(repeats):
+    vbn = import_quietly('vanilla_bn')
+    import copy
+    import bn_engine
+    central = vbn.CPTS_central
+    network = vbn.get_compiled_network(central)
+    target = 'P_doom_2035'
+    overrides = [copy.deepcopy(central[target]) for _ in range(MEMORY_VARIANTS)] # Built up front: not counted for either layout
+
+    def deep_copies():
+        variants = []
+        for override in overrides:
+            cpts = copy.deepcopy(central)
+            cpts[target] = override
+            variants.append(cpts)
+        return variants
+
+    def layers():
+        return [bn_engine.LayeredCPTs(central, {target: override}) for override in overrides]
+
+    copied = allocated_bytes(deep_copies)
+    layered = allocated_bytes(layers)
+    copied_compiled = allocated_bytes(lambda: [bn_engine.compile_network(vbn.PARENTS, vbn.STATES, cpts, vbn.CALCULATION_ORDER) for cpts in deep_copies()])
+    layered_compiled = allocated_bytes(lambda: [bn_engine.compile_layered(network, cpts.overrides) for cpts in layers()])
+    print(f"Memory per extra CPT variant ({MEMORY_VARIANTS} variants, {target} overridden, tracemalloc):")
+    for label, total in [("copy.deepcopy of the CPT dicts", copied), ("LayeredCPTs (shared base + override)", layered),
+                         ("deepcopy + compile_network", copied_compiled), ("LayeredCPTs + compile_layered (shared tensors)", layered_compiled)]:
+        print(f"  {label:<54} {total / MEMORY_VARIANTS / 1024:10.1f} KiB")
+    i = network.index[target]
+    same = bn_engine.tables_equal(bn_engine.compile_layered(network, layers()[0].overrides).tables[i],
+                                  bn_engine.compile_network(vbn.PARENTS, vbn.STATES, deep_copies()[0], vbn.CALCULATION_ORDER).tables[i])
+    print(f"  layered and deep-copied variants compile to the same tables: {same}")
+
+BENCHMARKS = {
+    'forward': benchmark_forward,
+    'batch': benchmark_batch,
+    'exact': benchmark_exact,
+    'incremental': benchmark_incremental,
+    'load': benchmark_load,
+    'scaling': benchmark_scaling,
+    'parametric': benchmark_parametric,
+    'uncertainty': benchmark_uncertainty,
+    'import': benchmark_import,
+    'memory': benchmark_memory,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)}).")
+    parser.add_argument('--repeats', type=int, default=200, help="Calls per timing loop.")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](args.repeats)
+        print()
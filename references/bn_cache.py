@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Memoization layer for P(doom) network queries.
+
+Results are keyed by a content hash of the CPT set (so the central,
+optimistic and pessimistic CPTs cache separately), the inference mode, any
+settings the result depends on (e.g. the sampling precision and seed) and a
+canonical frozen evidence tuple. The in-memory tier is a bounded LRU with
+hit / miss / eviction counters; an optional SQLite file adds a second tier
+that survives restarts, also bounded: past disk_max_entries the least
+recently used rows are deleted.
+
+Snapshots (section 3) keep a parsed source file, e.g. the CPT dict built
+from bn_cpts.json, as a pickle keyed by the source's content hash, so a
+restart can skip re-parsing. Snapshots are pickles: only load ones this
+code wrote.
+
+Fingerprints are memoized per CPT dict object: mutate a CPT dict in place
+after querying it and its cached results go stale, so build a new dict instead.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+from collections import OrderedDict
+
+# --- 1. Cache Keys ---
+def canonical_evidence(evidence):
+    """Order-independent, hashable form of an evidence dict (soft evidence values become tuples)."""
+    def value(state):
+        if isinstance(state, dict):
+            return tuple(sorted((s, float(w)) for s, w in state.items()))
+        if isinstance(state, (list, tuple)) or hasattr(state, 'tolist'): # Sequences and NumPy vectors
+            return tuple(float(w) for w in state)
+        return state
+    return tuple(sorted((node, value(state)) for node, state in (evidence or {}).items()))
+
+def canonical_cpts(cpts):
+    """JSON-serializable form of a loaded CPT dict (tuple keys joined as in bn_cpts.json)."""
+    canonical = {}
+    for node, table in cpts.items():
+        if isinstance(table, dict):
+            canonical[node] = {('|'.join(map(str, k)) if isinstance(k, tuple) else str(k)): v for k, v in table.items()}
+        else:
+            canonical[node] = table
+    return canonical
+
+def cpt_fingerprint(cpts):
+    """SHA-256 content hash of a CPT set."""
+    payload = json.dumps(canonical_cpts(cpts), sort_keys=True, default=float)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+FINGERPRINT_CACHE_SIZE = 64 # CPT dicts whose fingerprints are memoized (least recently used are dropped)
+CPT_FINGERPRINTS = OrderedDict() # id(cpt dict) -> (cpt dict, fingerprint); the dict is kept so its id stays unique
+
+def fingerprint_for(cpts):
+    """Memoized cpt_fingerprint for a CPT dict object (the last FINGERPRINT_CACHE_SIZE objects)."""
+    cached = CPT_FINGERPRINTS.get(id(cpts))
+    if cached is None or cached[0] is not cpts:
+        cached = CPT_FINGERPRINTS[id(cpts)] = (cpts, cpt_fingerprint(cpts))
+        while len(CPT_FINGERPRINTS) > FINGERPRINT_CACHE_SIZE:
+            CPT_FINGERPRINTS.popitem(last=False)
+    CPT_FINGERPRINTS.move_to_end(id(cpts))
+    return cached[1]
+
+
+# --- 2. LRU Result Cache ---
+DISK_MAX_ENTRIES = 100000 # Rows kept in the SQLite tier (least recently used are deleted)
+
+class ResultCache:
+    """Bounded LRU of query results with an optional on-disk (SQLite) tier."""
+
+    def __init__(self, max_entries=4096, disk_path=None, disk_max_entries=DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.entries = OrderedDict()
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = sqlite3.connect(disk_path)
+                self.disk.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL DEFAULT 0)")
+                if 'used' not in [row[1] for row in self.disk.execute("PRAGMA table_info(results)")]: # Written before the disk tier was bounded
+                    self.disk.execute("ALTER TABLE results ADD COLUMN used INTEGER NOT NULL DEFAULT 0")
+                self.disk.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+                self.disk.commit()
+                self.clock = self.disk.execute("SELECT COALESCE(MAX(used), 0) FROM results").fetchone()[0] # Last access stamp
+            except sqlite3.Error as e:
+                print(f"Warning: Could not open result cache {disk_path}: {e}. Using memory only.", file=sys.stderr)
+                self.disk = None
+
+    @staticmethod
+    def make_key(fingerprint, mode, evidence, settings=()):
+        return (fingerprint, mode, tuple(settings), canonical_evidence(evidence))
+
+    def get(self, key):
+        """Returns the cached value (a fresh copy) or None."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy_result(value)
+        if self.disk is not None:
+            row = self.disk.execute("SELECT value FROM results WHERE key = ?", (json.dumps(key),)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._touch(json.dumps(key))
+                value = json.loads(row[0])
+                self._remember(key, value)
+                return copy_result(value)
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, copy_result(value))
+        if self.disk is not None:
+            try:
+                self.clock += 1
+                self.disk.execute("INSERT OR REPLACE INTO results (key, value, used) VALUES (?, ?, ?)", (json.dumps(key), json.dumps(value), self.clock))
+                excess = self.disk.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.disk_max_entries
+                if excess > 0:
+                    self.disk.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)", (excess,))
+                    self.disk_evictions += excess
+                self.disk.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write result cache entry: {e}", file=sys.stderr)
+
+    def _touch(self, disk_key):
+        """Marks a disk row as just used, for least-recently-used deletion."""
+        try:
+            self.clock += 1
+            self.disk.execute("UPDATE results SET used = ? WHERE key = ?", (self.clock, disk_key))
+            self.disk.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not update result cache entry: {e}", file=sys.stderr)
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'evictions': self.evictions, 'disk_evictions': self.disk_evictions}
+
+
+def copy_result(result):
+    """Copies a {node: {state: p}} result so callers cannot mutate cached values."""
+    return {node: dict(dist) for node, dist in result.items()}
+
+def cached_query(cache, cpts, mode, evidence, compute, settings=()):
+    """
+    Returns compute() through the cache, keyed by CPT content, mode, evidence
+    and settings (a tuple of JSON-serializable values the result depends on).
+    """
+    key = cache.make_key(fingerprint_for(cpts), mode, evidence, settings)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        if result:
+            cache.put(key, result)
+    return result
+
+
+# --- 3. Parsed-Source Snapshots ---
+SNAPSHOT_FORMAT_VERSION = 1
+
+def snapshot_key(source_sha256, context):
+    """Snapshot key: the source's content hash plus everything else the parse depends on (JSON-serializable)."""
+    payload = json.dumps([SNAPSHOT_FORMAT_VERSION, source_sha256, context], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_snapshot(path, key):
+    """The snapshot value stored at path under key, or None if missing, stale or unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            if pickle.load(f) != key: # The key is stored first, so a stale snapshot is never fully unpickled
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, TypeError, ValueError) as e:
+        print(f"Warning: Could not read snapshot {path}: {e}. Ignoring it.", file=sys.stderr)
+        return None
+
+def save_snapshot(path, key, value):
+    """Writes a snapshot atomically (temp file + rename). Returns False, with a warning, if it cannot."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        return True
+    except (OSError, pickle.PicklingError) as e:
+        print(f"Warning: Could not write snapshot {path}: {e}", file=sys.stderr)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
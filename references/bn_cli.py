@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Shared pieces of the bn_*.py command-line tools.
+
+The query target and its high-risk states, Node=State evidence parsing, and
+compiling vanilla_bn's CPT sets with the usual error exit. vanilla_bn is
+imported inside the functions, as it imports several of the bn_*.py modules
+itself.
+"""
+
+import sys
+
+# --- Configuration ---
+TARGET_NODE = 'P_doom_2035'
+HIGH_RISK_STATES = ('High', 'VeryHigh')
+SCENARIOS = ('optimistic', 'central', 'pessimistic') # vanilla_bn.CPTS_<scenario>
+
+# --- 1. Arguments ---
+def add_evidence_argument(parser, example='Timeline=Early', label='Evidence'):
+    """Positional Node=State evidence arguments."""
+    parser.add_argument('evidence', nargs='*', help=f"{label} as Node=State (e.g. {example}).")
+
+def parse_evidence(parser, items):
+    """{node: state} from Node=State strings; exits through parser.error on a malformed item."""
+    evidence = {}
+    for item in items:
+        node, sep, state = item.partition('=')
+        if not sep:
+            parser.error(f"Evidence must look like Node=State, got '{item}'.")
+        evidence[node] = state
+    return evidence
+
+# --- 2. Networks ---
+def high_states(network, target=TARGET_NODE):
+    """(target index, indices of the HIGH_RISK_STATES the target has) in a compiled network."""
+    t = network.index[target]
+    return t, [network.state_index[t][s] for s in HIGH_RISK_STATES if s in network.state_index[t]]
+
+def compiled_networks(scenarios=('central',)):
+    """Compiled networks for vanilla_bn's CPT sets, in order; exits if any fails to compile."""
+    import vanilla_bn
+    networks = [vanilla_bn.get_compiled_network(getattr(vanilla_bn, f'CPTS_{name}')) for name in scenarios]
+    if any(network is None for network in networks):
+        print("Error: CPTs could not be compiled.", file=sys.stderr)
+        sys.exit(1)
+    return networks
+
+def central_network():
+    """The compiled network for vanilla_bn.CPTS_central; exits if it fails to compile."""
+    return compiled_networks()[0]
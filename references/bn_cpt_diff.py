@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+CPT change impact report: how user-facing results move between two
+bn_cpts.json versions (e.g. before and after editing CPTS_SOURCE in
+generate_cpts.py).
+
+Both versions are evaluated on every reachable quiz answer combination (the
+bn_lookup answer space, skipped questions included) with the batched forward
+engine, spread over a process pool. Per combination the report compares what
+vanilla_bn shows the user: the central 2035 estimate, the 2035 range from the
+optimistic / pessimistic perturbation, the 2050 / 2100 heuristics and the
+nearest expert for each year. It prints
+
+- the distribution of changes (percentiles, mean absolute change, histogram),
+- the answer profiles whose central 2035 estimate moved most,
+- how many profiles get a different nearest expert, with the most common switches.
+
+Profiles are matched by their answers, so both versions must share one
+network structure (PARENTS / STATES). All profiles weigh the same.
+
+Usage: python bn_cpt_diff.py OLD.json NEW.json [--workers N] [--top K]
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+import bn_lookup
+
+# --- Configuration ---
+DEFAULT_TOP = 10 # Most-affected answer profiles to list
+DEFAULT_SWITCHES = 5 # Most common nearest-expert switches to list per year
+DELTA_BINS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0) # |change| histogram edges, percentage points
+PERCENTILES = (0, 1, 5, 25, 50, 75, 95, 99, 100)
+EXPERT_CHUNK_ROWS = 65536 # Rows per chunk when matching experts; bounds working memory
+METRICS = ('central_2035', 'lower_2035', 'upper_2035', 'central_2050', 'central_2100')
+EXPERT_METRICS = {'2035': 'central_2035', '2050': 'central_2050', '2100': 'central_2100'}
+
+# --- 1. User-Facing Results ---
+def answer_space_results(networks, questions_map, workers=None):
+    """(layout, values, columns) over the full answer space for (central, optimistic, pessimistic) networks."""
+    return bn_lookup.build_lookup_table(networks, questions_map, workers)
+
+def user_facing(values, columns, multipliers, increase_2050, increase_2100, default_multiplier=1.0):
+    """
+    {metric: percent per profile} as vanilla_bn displays them: the central
+    2035 estimate, the min / max of the three perturbation runs, and the 2050 /
+    2100 heuristics (central + increase x multiplier of the most likely Timeline).
+    """
+    col = {name: k for k, name in enumerate(columns)}
+    central = values[:, col['p_doom_high_vh']].astype(np.float64) * 100
+    runs = [central] + [values[:, col[name]].astype(np.float64) * 100 for name in ('p_doom_high_vh_optimistic', 'p_doom_high_vh_pessimistic') if name in col]
+    timeline = [name for name in columns if name.startswith('timeline_')]
+    factors = np.array([multipliers.get(name[len('timeline_'):], default_multiplier) for name in timeline])
+    mult = factors[np.argmax(values[:, [col[name] for name in timeline]], axis=1)] # First maximum, like get_most_likely_state
+    return {
+        'central_2035': central,
+        'lower_2035': np.minimum.reduce(runs),
+        'upper_2035': np.maximum.reduce(runs),
+        'central_2050': np.clip(central + increase_2050 * mult, 0.0, 100.0),
+        'central_2100': np.clip(central + (increase_2050 + increase_2100) * mult, 0.0, 100.0),
+    }
+
+def nearest_experts(percent, expert_values):
+    """Index of the nearest expert estimate per profile (the first one on ties, like min() in compare_expert)."""
+    expert_values = np.asarray(expert_values, dtype=np.float64)
+    nearest = np.empty(len(percent), dtype=np.int64)
+    for start in range(0, len(percent), EXPERT_CHUNK_ROWS):
+        chunk = percent[start:start + EXPERT_CHUNK_ROWS, None]
+        nearest[start:start + len(chunk)] = np.abs(chunk - expert_values).argmin(axis=1)
+    return nearest
+
+
+# --- 2. Comparison ---
+def delta_summary(old, new):
+    """Distribution of new - old (percentage points) for one metric."""
+    delta = new - old
+    magnitude = np.abs(delta)
+    edges = (0.0,) + DELTA_BINS + (np.inf,)
+    return {
+        'mean': float(delta.mean()),
+        'mean_abs': float(magnitude.mean()),
+        'changed': int(np.count_nonzero(magnitude >= 0.05)), # Visible at the one-decimal precision vanilla_bn prints
+        'percentiles': dict(zip(PERCENTILES, np.percentile(delta, PERCENTILES).tolist())),
+        'histogram': [(lo, hi, int(np.count_nonzero((magnitude >= lo) & (magnitude < hi)))) for lo, hi in zip(edges[:-1], edges[1:])],
+    }
+
+def expert_changes(old, new, experts, year, top=DEFAULT_SWITCHES):
+    """(profiles whose nearest expert changes, [((old name, new name), count)] most common first) for one year."""
+    key = f'pdoom_{year}_percent'
+    valid = [e for e in experts if e.get(key) is not None]
+    if not valid:
+        return 0, []
+    values = [e[key] for e in valid]
+    before, after = nearest_experts(old, values), nearest_experts(new, values)
+    moved = before != after
+    counts = np.bincount(before[moved] * len(valid) + after[moved], minlength=len(valid) ** 2) # One bin per (old, new) pair
+    order = [k for k in np.argsort(-counts, kind='stable')[:top] if counts[k] > 0]
+    return int(moved.sum()), [((valid[k // len(valid)]['name'], valid[k % len(valid)]['name']), int(counts[k])) for k in order]
+
+def worst_profiles(network, layout, old, new, top=DEFAULT_TOP):
+    """The top profiles by |new - old|, as [(answers {node: state}, old, new)]."""
+    delta = np.abs(new - old)
+    top = min(top, len(delta))
+    indices = np.argpartition(-delta, top - 1)[:top] if top else np.empty(0, dtype=np.int64)
+    indices = indices[np.argsort(-delta[indices], kind='stable')]
+    evidence = bn_lookup.decode_indices(network, layout, indices.astype(np.int64))
+    profiles = []
+    for row, k in zip(evidence, indices):
+        answers = {network.nodes[i]: network.states[i][j] for i, j in enumerate(row) if j >= 0}
+        profiles.append((answers, float(old[k]), float(new[k])))
+    return profiles
+
+def impact_report(old_networks, new_networks, questions_map, experts, multipliers, increase_2050, increase_2100, workers=None, top=DEFAULT_TOP):
+    """
+    Evaluates both (central, optimistic, pessimistic) network triples on the
+    full answer space and returns the report as a dict. Raises ValueError if
+    the versions do not share one answer space.
+    """
+    old_layout, old_values, columns = answer_space_results(old_networks, questions_map, workers)
+    new_layout, new_values, new_columns = answer_space_results(new_networks, questions_map, workers)
+    if old_layout != new_layout or columns != new_columns:
+        raise ValueError("The two CPT versions have different answer spaces (network structure or states changed).")
+    old = user_facing(old_values, columns, multipliers, increase_2050, increase_2100)
+    new = user_facing(new_values, columns, multipliers, increase_2050, increase_2100)
+    return {
+        'profiles': len(old_values),
+        'deltas': {metric: delta_summary(old[metric], new[metric]) for metric in METRICS},
+        'worst': worst_profiles(new_networks[0], new_layout, old['central_2035'], new['central_2035'], top),
+        'experts': {year: expert_changes(old[metric], new[metric], experts, year) for year, metric in EXPERT_METRICS.items()},
+    }
+
+def print_report(report, old_path, new_path):
+    n = report['profiles']
+    print(f"\nCPT change impact: {old_path} -> {new_path} ({n:,} answer profiles)")
+    print(f"\n  {'metric':<14} {'mean':>7} {'mean |d|':>9} {'changed':>9}  " + ' '.join(f"{'p' + str(q):>7}" for q in PERCENTILES))
+    for metric, summary in report['deltas'].items():
+        print(f"  {metric:<14} {summary['mean']:+7.2f} {summary['mean_abs']:9.2f} {summary['changed'] / n:8.1%}  "
+              + ' '.join(f"{v:+7.2f}" for v in summary['percentiles'].values()))
+    print("\n  |change| in central_2035 (percentage points):")
+    for lo, hi, count in report['deltas']['central_2035']['histogram']:
+        label = f">= {lo:g}" if np.isinf(hi) else f"{lo:g} - {hi:g}"
+        print(f"    {label:<10} {count:>10,} {count / n:7.1%}")
+    print("\n  Most affected profiles (central 2035):")
+    for answers, old, new in report['worst']:
+        shown = ', '.join(f"{node}={state}" for node, state in answers.items()) or '(no answers)'
+        print(f"    {old:5.1f}% -> {new:5.1f}% ({new - old:+.1f})  {shown}")
+    print("\n  Nearest-expert matches:")
+    for year, (moved, switches) in report['experts'].items():
+        print(f"    {year}: {moved:,} profiles ({moved / n:.1%}) get a different nearest expert")
+        for (before, after), count in switches:
+            print(f"      {before} -> {after}: {count:,}")
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare user-facing results of two bn_cpts.json versions over every quiz answer combination.")
+    parser.add_argument('old', help="Baseline bn_cpts.json.")
+    parser.add_argument('new', help="Changed bn_cpts.json.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Most affected profiles to list.")
+    args = parser.parse_args()
+
+    import vanilla_bn
+    versions = []
+    for path in (args.old, args.new):
+        try:
+            cpts = vanilla_bn.CPTModel(path, snapshot_path=None, compiled_path=None).build()
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        networks = [vanilla_bn.get_compiled_network(c) for c in cpts]
+        if any(network is None for network in networks):
+            print(f"Error: CPTs in {path} could not be compiled.", file=sys.stderr)
+            sys.exit(1)
+        versions.append(networks)
+    experts = vanilla_bn.load_real_experts(vanilla_bn.EXPERTS_CSV_PATH)
+    start = time.perf_counter()
+    try:
+        report = impact_report(versions[0], versions[1], vanilla_bn.questions_map, experts, vanilla_bn.TIMELINE_MULTIPLIER,
+                               vanilla_bn.BASE_INCREASE_2050, vanilla_bn.BASE_INCREASE_2100, args.workers, args.top)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print_report(report, args.old, args.new)
+    print(f"\n(evaluated in {time.perf_counter() - start:.1f} s)")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Credal (interval) bounds on P(doom).
+
+Each CPT row is replaced by a credal set: every entry gets a lower and
+upper probability, and the row may be any distribution inside those bounds,
+
+    { theta : lower <= theta <= upper, sum(theta) = 1 }
+
+Bounds come from PERTURBATION_DELTA (each entry may move by delta / 2, the
+per-state shift perturb_distribution uses, so the optimistic and pessimistic
+CPTs are vertices of these sets) and/or from per-entry ranges in a JSON file
+shaped like bn_cpts.json:
+
+    {"P_doom_2035": {"Hard|Low|High": {"Low": [0.0, 0.05], ...}, ...}, "Timeline": {"Early": [0.2, 0.4], ...}}
+
+P(P_doom_2035 = High or VeryHigh) is a polynomial in every row, so its
+extremes over the credal sets are attained at vertices of the rows' sets.
+The search enumerates each imprecise row's vertices once per network and
+then runs coordinate ascent: it visits the rows in turn, moves each to its
+best vertex with all other rows fixed, and stops when no row improves. When
+only the target's own rows are imprecise (the PERTURBATION_DELTA default),
+the target probability is linear in each row and the rows are independent,
+so a single sweep reaches the exact bounds (CredalNetwork.is_tight). Soft
+evidence makes the target a ratio of such polynomials, and several
+imprecise nodes make it non-linear across nodes; coordinate ascent may then
+stop at a local optimum, and the result is an inner approximation attained
+by an actual CPT choice inside the intervals.
+Row vertices, the last extreme CPTs (warm starts) and results are cached
+per network, so repeat queries with different evidence stay fast. In exact
+mode, candidate CPTs are scored on uncached junction trees that share every
+clique potential but the changed one.
+
+Usage: python bn_credal.py [--delta D] [--all-nodes] [--intervals FILE] [--mode forward|exact] [Node=State ...]
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import weakref
+from collections import OrderedDict
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+import bn_cache
+import bn_engine
+import bn_exact
+import bn_sensitivity
+
+# --- Configuration ---
+DEFAULT_DELTA = 0.10 # As vanilla_bn.PERTURBATION_DELTA
+DEFAULT_NODES = ('P_doom_2035',) # Nodes whose rows get delta intervals (None = every node)
+MAX_SWEEPS = 20
+TOLERANCE = 1e-12 # Minimum improvement for coordinate ascent to move a row
+RESULT_CACHE_SIZE = 1024
+
+# --- 1. Interval CPTs ---
+def delta_intervals(network, delta, nodes=DEFAULT_NODES):
+    """
+    Per node, per CPT row (bn_sensitivity.table_rows order): (lower, upper)
+    arrays, row -/+ delta / 2 clipped to [0, 1] for the given node names
+    (None = all); rows of other nodes are precise, and so are all-zero
+    (missing) rows, which have no distribution to widen.
+    """
+    intervals = []
+    for i, table in enumerate(network.tables):
+        rows = bn_sensitivity.table_rows(table)
+        half = delta / 2.0 if nodes is None or network.nodes[i] in nodes else 0.0
+        intervals.append([(np.clip(row - half, 0.0, 1.0), np.clip(row + half, 0.0, 1.0)) if row.any() else (row, row) for row in rows])
+    return intervals
+
+def load_json_intervals(path, network, intervals):
+    """
+    Overrides rows of intervals with [lower, upper] ranges from a JSON file
+    (row keys as in bn_cpts.json; root nodes map states directly; states not
+    listed keep their current interval). Raises ValueError if malformed.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must hold a JSON object keyed by node.")
+    for node, rows in data.items():
+        i = network.index.get(node)
+        if i is None:
+            print(f"Warning: Interval node '{node}' is not in the network. Ignoring.", file=sys.stderr)
+            continue
+        labels = bn_sensitivity.row_labels(network, i)
+        if not network.parents[i] and isinstance(network.tables[i], np.ndarray): # Root: {state: [lo, hi]}
+            rows = {'': rows}
+        for key, ranges in rows.items():
+            if key not in labels or not isinstance(ranges, dict):
+                raise ValueError(f"Unknown CPT row '{key}' for node '{node}' in {path}.")
+            r, row = labels.index(key), f"{node} [{key}]" if key else node
+            lower, upper = (bound.copy() for bound in intervals[i][r])
+            for state, bounds in ranges.items():
+                j = network.state_index[i].get(state)
+                if j is None or not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+                    raise ValueError(f"Bad range for {row} -> {state!r} in {path}: expected a known state and [lower, upper].")
+                lo, hi = float(bounds[0]), float(bounds[1])
+                if not 0.0 <= lo <= hi <= 1.0:
+                    raise ValueError(f"Range {bounds} for {row} -> {state} must satisfy 0 <= lower <= upper <= 1.")
+                lower[j], upper[j] = lo, hi
+            intervals[i][r] = (lower, upper)
+    return intervals
+
+def row_vertices(lower, upper, tolerance=1e-9):
+    """
+    Vertices of {lower <= theta <= upper, sum(theta) = 1} as a (V x k)
+    array: every entry but one sits at a bound and the free one takes up
+    the rest. Raises ValueError if the set is empty.
+    """
+    k = len(lower)
+    if np.allclose(lower, upper):
+        return lower[None, :].copy()
+    vertices = []
+    for free in range(k):
+        others = [j for j in range(k) if j != free]
+        for choice in itertools.product((0, 1), repeat=k - 1):
+            theta = np.empty(k)
+            for j, c in zip(others, choice):
+                theta[j] = upper[j] if c else lower[j]
+            theta[free] = 1.0 - theta[others].sum()
+            if lower[free] - tolerance <= theta[free] <= upper[free] + tolerance:
+                theta[free] = min(max(theta[free], lower[free]), upper[free])
+                vertices.append(theta)
+    if not vertices:
+        raise ValueError(f"Empty credal set: bounds {lower.tolist()} .. {upper.tolist()} cannot sum to one.")
+    return np.unique(np.round(np.array(vertices), 12), axis=0)
+
+
+# --- 2. Bound Search ---
+class CredalNetwork:
+    """
+    Interval CPTs over one CompiledNetwork, with cached row vertices, warm
+    starts and results. weak=True holds the network by weak reference (for
+    caches keyed by the network).
+    """
+
+    def __init__(self, network, intervals, mode='forward', target=TARGET_NODE, weak=False):
+        if mode not in ('forward', 'exact'):
+            raise ValueError(f"Unknown inference mode '{mode}'.")
+        self._network = weakref.ref(network) if weak else network
+        self._weak = weak
+        self.mode = mode
+        self.t, self.high = bn_cli.high_states(network, target)
+        self.vertices = [[row_vertices(lower, upper) for lower, upper in node_rows] for node_rows in intervals]
+        upstream = network.ancestors([self.t])
+        # Forward mode: nodes to recompute when node i changes (its descendants that can reach the target), in topological order
+        self.chains = [sorted(network.descendants([i]) & upstream) for i in range(len(network))]
+        self.extremes = {} # sign -> per-node CPT rows of the last optimum (warm start for the next query)
+        self.results = OrderedDict()
+        # Only the target's rows are imprecise: without soft evidence the bounds are exact (see is_tight)
+        self.tight = all(i == self.t for i, node_rows in enumerate(self.vertices) if any(len(v) > 1 for v in node_rows))
+
+    @property
+    def network(self):
+        network = self._network() if self._weak else self._network
+        if network is None:
+            raise ReferenceError("The network of this cached CredalNetwork has been freed.")
+        return network
+
+    def is_tight(self, evidence=None):
+        """Whether bounds(evidence) are exact rather than an inner approximation: only the target's rows are imprecise and there is no soft evidence."""
+        return self.tight and not self.network.encode_likelihoods(evidence)
+
+    def imprecise_rows(self, encoded):
+        """(node, row) pairs with more than one vertex that can affect the target under this evidence."""
+        relevant = self.network.ancestors([self.t]) if self.mode == 'exact' else relevant_forward_nodes(self.network, self.t, encoded)
+        return [(i, r) for i in sorted(relevant) for r, vertices in enumerate(self.vertices[i]) if len(vertices) > 1]
+
+    def value(self, network, evidence, encoded, likelihoods=None, tree=None):
+        """Target value for network; exact mode queries tree (an uncached JunctionTree for network, built if None)."""
+        if self.mode == 'exact':
+            tree = bn_exact.JunctionTree(network) if tree is None else tree
+            return float(tree.query(evidence, [self.t])[self.t][self.high].sum())
+        marginals = [None] * len(network)
+        for i in range(len(network)):
+            marginals[i] = network.node_marginal(i, marginals, encoded, likelihoods)
+        return float(marginals[self.t][self.high].sum())
+
+    def row_values(self, network, evidence, encoded, likelihoods, i, tables, tree=None):
+        """Target value for each candidate table of node i, everything else as in network (tree: its JunctionTree, exact mode)."""
+        if self.mode == 'exact':
+            tree = bn_exact.JunctionTree(network) if tree is None else tree
+            return [self.value(None, evidence, encoded, tree=tree.with_tables({i: table})) for table in tables]
+        marginals = [None] * len(network) # Shared part: computed once for all candidates
+        for j in range(len(network)):
+            marginals[j] = network.node_marginal(j, marginals, encoded, likelihoods)
+        values = []
+        for table in tables:
+            variant, local = network.with_tables({i: table}), list(marginals)
+            for j in self.chains[i]:
+                local[j] = variant.node_marginal(j, local, encoded, likelihoods)
+            values.append(float(local[self.t][self.high].sum()))
+        return values
+
+    def optimize(self, evidence, sign):
+        """Coordinate ascent over row vertices for sign * P(target high). Returns (value, per-node rows)."""
+        net = self.network
+        encoded, likelihoods = net.encode_evidence(evidence), net.encode_likelihoods(evidence)
+        rows = [list(node_rows) for node_rows in self.extremes.get(sign) or [bn_sensitivity.table_rows(t) for t in net.tables]]
+        current = net.with_tables({i: bn_sensitivity.table_from_rows(net.tables[i], rows[i]) for i in range(len(net))})
+        tree = bn_exact.JunctionTree(current) if self.mode == 'exact' else None # Uncached: one per search
+        best = sign * self.value(current, evidence, encoded, likelihoods, tree)
+        candidates = self.imprecise_rows(encoded)
+        for _ in range(MAX_SWEEPS):
+            improved = False
+            for i, r in candidates:
+                vertices = self.vertices[i][r]
+                tables = [bn_sensitivity.table_from_rows(net.tables[i], rows[i][:r] + [v] + rows[i][r + 1:]) for v in vertices]
+                values = sign * np.array(self.row_values(current, evidence, encoded, likelihoods, i, tables, tree))
+                k = int(np.argmax(values))
+                if values[k] > best + TOLERANCE:
+                    best, rows[i][r] = float(values[k]), vertices[k]
+                    if tree is None:
+                        current = current.with_tables({i: tables[k]})
+                    else:
+                        tree = tree.with_tables({i: tables[k]})
+                        current = tree.network
+                    improved = True
+            if not improved:
+                break
+        self.extremes[sign] = rows
+        return sign * best, rows
+
+    def bounds(self, evidence=None):
+        """(lower, upper) P(P_doom_2035 = High or VeryHigh) over the credal sets, cached per evidence."""
+        key = bn_cache.canonical_evidence(evidence)
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+        result = (self.optimize(evidence, -1.0)[0], self.optimize(evidence, 1.0)[0])
+        self.results[key] = result
+        while len(self.results) > RESULT_CACHE_SIZE:
+            self.results.popitem(last=False)
+        return result
+
+def relevant_forward_nodes(network, t, encoded):
+    """Nodes whose CPTs reach the target in the forward pass: its ancestors, not looking past evidence nodes."""
+    seen, stack = set(), [t]
+    while stack:
+        i = stack.pop()
+        if i not in seen:
+            seen.add(i)
+            if i not in encoded:
+                stack.extend(network.parents[i])
+    return seen
+
+CREDAL_NETWORKS = weakref.WeakKeyDictionary() # network -> {interval settings: CredalNetwork}
+
+def credal_network_for(network, delta=DEFAULT_DELTA, nodes=DEFAULT_NODES, intervals_path=None, mode='forward'):
+    """Cached CredalNetwork for a compiled network and interval settings. Raises ValueError / OSError for bad interval files."""
+    source = bn_engine.file_sha256(intervals_path) if intervals_path else None
+    key = (delta, None if nodes is None else tuple(nodes), source, mode)
+    per_network = CREDAL_NETWORKS.setdefault(network, {})
+    credal = per_network.get(key)
+    if credal is None:
+        intervals = delta_intervals(network, delta, nodes)
+        if intervals_path:
+            intervals = load_json_intervals(intervals_path, network, intervals)
+        credal = per_network[key] = CredalNetwork(network, intervals, mode, weak=True)
+    return credal
+
+def pdoom_bounds(network, evidence=None, delta=DEFAULT_DELTA, nodes=DEFAULT_NODES, intervals_path=None, mode='forward'):
+    """(lower, upper) credal bounds on P(P_doom_2035 = High or VeryHigh)."""
+    return credal_network_for(network, delta, nodes, intervals_path, mode).bounds(evidence)
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Credal interval bounds on P(doom by 2035).")
+    bn_cli.add_evidence_argument(parser, 'Timeline=Early')
+    parser.add_argument('--delta', type=float, default=DEFAULT_DELTA, help="Interval width per entry is +/- delta / 2.")
+    parser.add_argument('--all-nodes', action='store_true', help="Apply delta intervals to every node, not just P_doom_2035.")
+    parser.add_argument('--intervals', help="JSON file of per-entry [lower, upper] ranges.")
+    parser.add_argument('--mode', choices=('forward', 'exact'), default='forward')
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+
+    import time
+    network = bn_cli.central_network()
+    try:
+        start = time.perf_counter()
+        credal = credal_network_for(network, args.delta, None if args.all_nodes else DEFAULT_NODES, args.intervals, args.mode)
+        lower, upper = credal.bounds(evidence)
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError, json.JSONDecodeError) as e:
+        print(f"Error: Could not build interval CPTs: {e}", file=sys.stderr)
+        sys.exit(1)
+    kind = "credal bounds" if credal.is_tight(evidence) else "approximate credal bounds (coordinate ascent, inner approximation)"
+    print(f"\nP({TARGET_NODE} = High or VeryHigh), {kind} ({args.mode}, {elapsed * 1000:.0f} ms):")
+    print(f"  lower: {lower * 100:.1f}%")
+    print(f"  upper: {upper * 100:.1f}%")
@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Compiled tensor inference engine for the manual P(doom) Bayesian network.
+
+Turns the PARENTS / STATES / CPT dictionaries used by vanilla_bn.py into
+contiguous NumPy arrays once, then answers forward-pass queries with
+tensor contractions instead of rebuilding itertools parent combinations,
+string-keyed dicts and normalize_dist calls on every query.
+
+The forward pass reproduces calculate_marginal_manual exactly: evidence nodes
+are clamped to a one-hot distribution and every other node is computed from
+the product of its parents' current marginals. Soft (virtual) evidence,
+an evidence value of {state: weight} instead of a state name, multiplies the
+node's marginal by that likelihood vector and renormalizes it.
+
+A compiled network can be saved as a binary artifact (save_compiled) and
+memory-mapped back (load_compiled) without touching the JSON source:
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header | padding | float64 tables
+
+The header holds the node order, states, parent indices, per-tensor offsets and
+shapes, and the SHA-256 of the JSON file the tensors were compiled from.
+
+Besides explicit tables, a node's CPT may be parametric. The supported type is
+noisy-MAX ({"type": "noisy_max", "leak": {...}, "links": {parent: {state: {...}}}}),
+which is evaluated in factorized form, so its cost is linear in the number of
+parents.
+
+CPT variants (optimistic / pessimistic, sweeps, ensembles) can be held as
+LayeredCPTs: a shared base CPT dict plus the few nodes that differ.
+compile_layered() compiles only those nodes and shares every other tensor
+with the base network.
+"""
+
+import copy
+import functools
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import sys
+from collections.abc import Mapping
+import numpy as np
+
+# --- Configuration ---
+DEFAULT_TARGET = 'P_doom_2035'
+DEFAULT_BATCH_CHUNK = 65536 # Rows per chunk in forward_batch; bounds working memory
+COMPILED_MAGIC = b'BNCPT\x00\x00\x02' # Last byte is the artifact format version
+COMPILED_ALIGNMENT = 64 # Tensor data starts on a 64-byte boundary
+
+# --- Helper Functions ---
+def normalize_vector(vec):
+    """Normalizes a probability vector, falling back to uniform when it sums to zero."""
+    total = vec.sum()
+    if total > 0:
+        return vec / total
+    return np.full(vec.shape, 1.0 / vec.shape[-1]) if vec.shape[-1] else vec
+
+def is_soft_evidence(value):
+    """True for soft (virtual) evidence values: {state: weight} or one weight per state, rather than a state name."""
+    return isinstance(value, (dict, list, tuple, np.ndarray))
+
+def distribution_to_vector(dist, node_states, context):
+    """Converts a {state: p} dict into a normalized vector in STATES order."""
+    vec = np.zeros(len(node_states))
+    positions = {state: i for i, state in enumerate(node_states)}
+    for state, prob in dist.items():
+        if state not in positions:
+            print(f"Warning: Unknown state '{state}' in {context}. Ignoring.", file=sys.stderr)
+            continue
+        vec[positions[state]] = float(prob)
+    return normalize_vector(vec)
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's bytes (used to tie artifacts to a CPT file version)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def topological_order(parents_map):
+    """
+    Evaluation order (parents before children) derived from a PARENTS dict.
+    Ties are broken by definition order, so the result is deterministic.
+    Raises ValueError for unknown parents or cycles.
+    """
+    position = {node: k for k, node in enumerate(parents_map)}
+    children = {node: [] for node in parents_map}
+    pending = {}
+    for node, parent_nodes in parents_map.items():
+        for p_node in parent_nodes:
+            if p_node not in position:
+                raise ValueError(f"Parent '{p_node}' of '{node}' is not defined in PARENTS.")
+            children[p_node].append(node)
+        pending[node] = len(parent_nodes)
+    ready = [position[node] for node, count in pending.items() if count == 0]
+    heapq.heapify(ready)
+    nodes = list(parents_map)
+    order = []
+    while ready:
+        node = nodes[heapq.heappop(ready)]
+        order.append(node)
+        for child in children[node]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                heapq.heappush(ready, position[child])
+    if len(order) < len(nodes):
+        raise ValueError(f"Cycle in PARENTS: {' -> '.join(find_cycle(parents_map, set(nodes) - set(order)))}.")
+    return order
+
+def find_cycle(parents_map, candidates):
+    """Returns one cycle (first node repeated at the end) among candidates, which must contain one."""
+    node, path, seen = next(iter(sorted(candidates))), [], {}
+    while node not in seen: # Every unsorted node has an unsorted parent, so walking parents must loop
+        seen[node] = len(path)
+        path.append(node)
+        node = next(p for p in parents_map[node] if p in candidates)
+    cycle = path[seen[node]:] + [node]
+    return cycle[::-1] # Report in parent -> child direction
+
+
+# --- 1. Parametric CPTs ---
+PARAMETRIC_TYPES = ('noisy_max',)
+
+def is_parametric(cpt):
+    """True for a parametric CPT spec ({'type': ..., ...}) rather than an explicit table."""
+    return isinstance(cpt, dict) and isinstance(cpt.get('type'), str)
+
+class NoisyMaxCPT:
+    """
+    Ordinal noisy-MAX CPT. Each parent j in state x contributes an independent
+    child level drawn from links[j][x], the leak contributes one drawn from
+    leak, and the child takes the highest level (STATES order = severity order):
+
+        P(Y <= y | x) = leak_cdf[y] * prod_j link_cdf[j][x_j, y]
+
+    Only O(parents x states) parameters are stored; the full table is built
+    only when expand() is called (exact inference).
+    """
+
+    def __init__(self, leak, links):
+        self.leak = np.ascontiguousarray(leak, dtype=np.float64)
+        self.links = [np.ascontiguousarray(link, dtype=np.float64) for link in links]
+        self.leak_cdf = np.cumsum(self.leak)
+        self.link_cdfs = [np.cumsum(link, axis=1) for link in self.links]
+        for array in [self.leak, self.leak_cdf] + self.links + self.link_cdfs:
+            array.setflags(write=False)
+        self.shape = tuple(link.shape[0] for link in self.links) + (len(self.leak),)
+        # Links grouped by parent cardinality, stacked so marginal() does one batched matmul per group
+        self.groups = []
+        for k in sorted({link.shape[0] for link in self.links}):
+            positions = [j for j, link in enumerate(self.links) if link.shape[0] == k]
+            self.groups.append((positions, np.stack([self.link_cdfs[j] for j in positions])))
+        self.dense = None
+
+    @property
+    def nbytes(self):
+        return self.leak.nbytes + sum(link.nbytes for link in self.links)
+
+    def marginal(self, parent_marginals):
+        """Child distribution for independent parent marginals (vectors, or (N x states) batches)."""
+        cdf = self.leak_cdf
+        for positions, link_cdfs in self.groups: # (P, ..., k) @ (P, k, states) -> product over the P parents
+            stacked = np.stack([parent_marginals[j] for j in positions])
+            contributions = (stacked[:, None, :] @ link_cdfs)[:, 0] if stacked.ndim == 2 else stacked @ link_cdfs
+            cdf = cdf * np.prod(contributions, axis=0)
+        pmf = cdf.copy()
+        pmf[..., 1:] -= cdf[..., :-1]
+        return pmf
+
+    def row_cdfs(self, parent_states):
+        """(N x states) child CDFs for an (parents x N) array of parent state indices."""
+        cdf = np.broadcast_to(self.leak_cdf, (parent_states.shape[1], len(self.leak)))
+        for states, link_cdf in zip(parent_states, self.link_cdfs):
+            cdf = cdf * link_cdf[states]
+        return cdf
+
+    def expand(self):
+        """Full (parents..., node) table, built once on first use."""
+        if self.dense is None:
+            cdf = self.leak_cdf
+            for j, link_cdf in enumerate(self.link_cdfs):
+                shape = [1] * len(self.links) + [len(self.leak)]
+                shape[j] = link_cdf.shape[0]
+                cdf = cdf * link_cdf.reshape(shape)
+            self.dense = np.ascontiguousarray(np.diff(np.broadcast_to(cdf, self.shape), axis=-1, prepend=0.0))
+            self.dense.setflags(write=False)
+        return self.dense
+
+def parametric_cpt_from_dict(node, spec, parent_nodes, states_map):
+    """Builds the compiled form of a parametric CPT spec. Raises ValueError if it is malformed."""
+    if spec.get('type') not in PARAMETRIC_TYPES:
+        raise ValueError(f"Unknown parametric CPT type {spec.get('type')!r} for node '{node}'.")
+    node_states = states_map[node]
+    links_spec = spec.get('links')
+    if not isinstance(links_spec, dict) or set(links_spec) != set(parent_nodes):
+        raise ValueError(f"noisy_max CPT for '{node}' must define 'links' for exactly its parents {list(parent_nodes)}.")
+    leak = distribution_to_vector(spec.get('leak', {node_states[0]: 1.0}), node_states, f"noisy_max leak '{node}'") # Default: no leak
+    links = []
+    for p_node in parent_nodes:
+        rows = links_spec[p_node]
+        missing = [s for s in states_map[p_node] if not isinstance(rows, dict) or not isinstance(rows.get(s), dict)]
+        if missing:
+            raise ValueError(f"noisy_max link '{p_node}' -> '{node}' has no distribution for parent state(s) {missing}.")
+        links.append([distribution_to_vector(rows[s], node_states, f"noisy_max link '{p_node}'={s} -> '{node}'") for s in states_map[p_node]])
+    return NoisyMaxCPT(leak, links)
+
+def expand_parametric_cpt(node, spec, parent_nodes, states_map):
+    """Explicit {parent-state tuple: {state: p}} table for a parametric CPT spec (for dict-based code paths)."""
+    table = parametric_cpt_from_dict(node, spec, parent_nodes, states_map).expand()
+    return {tuple(states_map[p][j] for p, j in zip(parent_nodes, row)): dict(zip(states_map[node], table[row].tolist()))
+            for row in np.ndindex(*table.shape[:-1])}
+
+
+# --- 2. Compiled Network ---
+class CompiledNetwork:
+    """
+    Array form of a discrete BN: one CPT per node, either a tensor with axes
+    (parents..., node) or a NoisyMaxCPT kept in factorized form.
+    """
+
+    def __init__(self, nodes, states, parents, tables, rows_complete=None):
+        self.nodes = tuple(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.states = [tuple(s) for s in states]
+        self.state_index = [{state: j for j, state in enumerate(s)} for s in self.states]
+        self.cardinality = np.array([len(s) for s in self.states], dtype=np.int64)
+        self.parents = [tuple(p) for p in parents]
+        self.tables = [t if isinstance(t, NoisyMaxCPT) else np.ascontiguousarray(t, dtype=np.float64) for t in tables]
+        for table in self.tables:
+            if not isinstance(table, NoisyMaxCPT):
+                table.setflags(write=False)
+        # Per-node precomputation for the single-query hot path
+        self.one_hot = [np.eye(k) for k in self.cardinality]
+        self.contraction_shapes = [[(self.cardinality[p], -1) for p in parent_ids] for parent_ids in self.parents]
+        if rows_complete is None: # Whether every CPT row sums to one (precomputed in compiled artifacts)
+            rows_complete = [isinstance(t, NoisyMaxCPT) or bool(np.allclose(t.sum(axis=-1), 1.0)) for t in self.tables]
+        self.rows_complete = [bool(c) for c in rows_complete]
+        # Parent index arrays and row strides: flat CPT row of a joint parent assignment = states @ strides
+        self.parent_index = [np.array(p, dtype=np.intp) for p in self.parents]
+        self.parent_strides = [np.array([int(np.prod(self.cardinality[list(p[k + 1:])])) for k in range(len(p))], dtype=np.int64)
+                               for p in self.parents]
+        self.cumulative = None # Per-node CDF rows for sampling, built on first use
+        self.children = [[] for _ in self.nodes]
+        for i, parent_ids in enumerate(self.parents):
+            for p in parent_ids:
+                self.children[p].append(i)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def matches_structure(self, parents_map, states_map, order):
+        """True if this network has exactly the given node order, states and parents."""
+        order = tuple(order)
+        return (self.nodes == order
+                and all(self.states[i] == tuple(states_map.get(node, ())) for i, node in enumerate(order))
+                and all(self.parents[i] == tuple(self.index.get(p, -1) for p in parents_map.get(node, ())) for i, node in enumerate(order)))
+
+    def with_tables(self, overrides):
+        """
+        Variant of this network with some CPTs replaced ({node index: table}).
+        Everything else (structure arrays and the other tables) is shared with
+        this network rather than copied.
+        """
+        variant = copy.copy(self)
+        variant.tables = list(self.tables)
+        variant.rows_complete = list(self.rows_complete)
+        for i, table in overrides.items():
+            if not isinstance(table, NoisyMaxCPT):
+                table = np.ascontiguousarray(table, dtype=np.float64)
+                table.setflags(write=False)
+            variant.tables[i] = table
+            variant.rows_complete[i] = isinstance(table, NoisyMaxCPT) or bool(np.allclose(table.sum(axis=-1), 1.0))
+        variant.cumulative = None
+        return variant
+
+    def encode_evidence(self, evidence):
+        """Maps {node: state} evidence onto {node index: state index}; soft entries are left to encode_likelihoods."""
+        encoded = {}
+        for node, state in (evidence or {}).items():
+            if is_soft_evidence(state):
+                continue
+            i = self.index.get(node)
+            if i is None:
+                print(f"Warning: Evidence node '{node}' is not in the network. Ignoring.", file=sys.stderr)
+                continue
+            j = self.state_index[i].get(state)
+            if j is None:
+                print(f"Warning: Evidence state '{state}' is not valid for node '{node}'. Ignoring.", file=sys.stderr)
+                continue
+            encoded[i] = j
+        return encoded
+
+    def encode_likelihoods(self, evidence):
+        """
+        Maps soft evidence entries ({state: weight}, missing states weigh 0, or
+        one weight per state in self.states order) onto {node index: likelihood vector}.
+        """
+        likelihoods = {}
+        for node, value in (evidence or {}).items():
+            if not is_soft_evidence(value):
+                continue
+            i = self.index.get(node)
+            if i is None:
+                print(f"Warning: Evidence node '{node}' is not in the network. Ignoring.", file=sys.stderr)
+                continue
+            if isinstance(value, dict):
+                unknown = [state for state in value if state not in self.state_index[i]]
+                if unknown:
+                    print(f"Warning: Likelihood states {unknown} are not valid for node '{node}'. Ignoring them.", file=sys.stderr)
+                lam = np.array([value.get(state, 0.0) for state in self.states[i]], dtype=np.float64)
+            else:
+                lam = np.asarray(value, dtype=np.float64).ravel()
+            if lam.shape != (self.cardinality[i],) or not np.isfinite(lam).all() or (lam < 0).any() or lam.sum() <= 0:
+                print(f"Warning: Likelihood for node '{node}' must be {self.cardinality[i]} non-negative weights, not all zero. Ignoring.", file=sys.stderr)
+                continue
+            likelihoods[i] = lam
+        return likelihoods
+
+    def forward(self, evidence=None):
+        """Runs the forward pass and returns one marginal vector per node (in self.nodes order)."""
+        encoded = self.encode_evidence(evidence)
+        likelihoods = self.encode_likelihoods(evidence)
+        marginals = [None] * len(self.nodes)
+        for i in range(len(self.nodes)):
+            marginals[i] = self.node_marginal(i, marginals, encoded, likelihoods)
+        return marginals
+
+    def node_marginal(self, i, marginals, encoded, likelihoods=None):
+        """
+        One forward-pass step: node i's marginal from its parents' current
+        marginals, times its soft evidence likelihood (if any) and renormalized.
+        """
+        if i in encoded:
+            return self.one_hot[i][encoded[i]]
+        dist = self.tables[i]
+        if isinstance(dist, NoisyMaxCPT): # Factorized: one (parent states x node states) product per parent
+            dist = dist.marginal([marginals[p] for p in self.parents[i]])
+        else:
+            for p, shape in zip(self.parents[i], self.contraction_shapes[i]): # Contract the leading parent axis each step
+                dist = marginals[p] @ dist.reshape(shape)
+            if not self.rows_complete[i]: # Parent marginals sum to one, so complete CPTs need no renormalization
+                dist = normalize_vector(dist)
+        if likelihoods and i in likelihoods:
+            return normalize_vector(dist * likelihoods[i])
+        return dist
+
+    def ancestors(self, node_ids):
+        """Returns the given node indices plus all of their ancestors."""
+        seen, stack = set(), list(node_ids)
+        while stack:
+            i = stack.pop()
+            if i not in seen:
+                seen.add(i)
+                stack.extend(self.parents[i])
+        return seen
+
+    def descendants(self, node_ids):
+        """Returns the given node indices plus all of their descendants."""
+        seen, stack = set(), list(node_ids)
+        while stack:
+            i = stack.pop()
+            if i not in seen:
+                seen.add(i)
+                stack.extend(self.children[i])
+        return seen
+
+    def encode_evidence_batch(self, evidence_list):
+        """Encodes a sequence of {node: state} dicts as an (N x nodes) int array, -1 = unobserved (soft entries are skipped)."""
+        encoded = np.full((len(evidence_list), len(self.nodes)), -1, dtype=np.int8)
+        for row, evidence in enumerate(evidence_list):
+            for i, j in self.encode_evidence(evidence).items():
+                encoded[row, i] = j
+        return encoded
+
+    def encode_likelihood_batch(self, evidence_list):
+        """Soft entries of a sequence of evidence dicts as {node index: (N x states) likelihoods}, ones where a row has none."""
+        likelihoods = {}
+        for row, evidence in enumerate(evidence_list):
+            for i, lam in self.encode_likelihoods(evidence).items():
+                if i not in likelihoods:
+                    likelihoods[i] = np.ones((len(evidence_list), self.cardinality[i]))
+                likelihoods[i][row] = lam
+        return likelihoods
+
+    def forward_batch(self, evidence, target=DEFAULT_TARGET, extra_nodes=(), chunk_size=DEFAULT_BATCH_CHUNK, likelihoods=None):
+        """
+        Forward pass for many evidence rows at once.
+        evidence is an (N x nodes) integer array of state indices (columns in
+        self.nodes order, -1 = unobserved); it may be a np.memmap. likelihoods
+        optionally adds soft evidence as {node index: (states,) vector shared by
+        all rows, or (N x states) array}. Rows are processed chunk_size at a
+        time with a batch axis, so working memory stays bounded. Returns
+        (N x states) marginals for target and a dict {node: (N x states)} for
+        extra_nodes.
+        """
+        evidence = np.asarray(evidence)
+        if evidence.ndim != 2 or evidence.shape[1] != len(self.nodes):
+            raise ValueError(f"Evidence must have shape (N, {len(self.nodes)}), got {evidence.shape}.")
+        likelihoods = {i: np.asarray(lam, dtype=np.float64) for i, lam in (likelihoods or {}).items()}
+        for i, lam in likelihoods.items():
+            if lam.shape not in ((self.cardinality[i],), (evidence.shape[0], self.cardinality[i])):
+                raise ValueError(f"Likelihood for node '{self.nodes[i]}' must have shape ({self.cardinality[i]},) or "
+                                 f"({evidence.shape[0]}, {self.cardinality[i]}), got {lam.shape}.")
+        outputs = [self.index[target]] + [self.index[n] for n in extra_nodes]
+        needed = sorted(self.ancestors(outputs))
+        results = {i: np.empty((evidence.shape[0], self.cardinality[i])) for i in outputs}
+        for start in range(0, evidence.shape[0], chunk_size):
+            chunk = np.asarray(evidence[start:start + chunk_size], dtype=np.int64)
+            lams = {i: lam if lam.ndim == 1 else lam[start:start + chunk_size] for i, lam in likelihoods.items()}
+            marginals = self._forward_chunk(chunk, needed, lams)
+            for i in outputs:
+                results[i][start:start + len(chunk)] = marginals[i]
+        return results[outputs[0]], {n: results[self.index[n]] for n in extra_nodes}
+
+    def _forward_chunk(self, evidence, needed, likelihoods=None):
+        """Batched forward pass over one chunk; only nodes in needed (ancestor-closed, sorted) are computed."""
+        n = evidence.shape[0]
+        marginals = {}
+        for i in needed:
+            column = evidence[:, i]
+            observed = column >= 0
+            if observed.all():
+                marginals[i] = self.one_hot[i][column]
+                continue
+            parent_ids = self.parents[i]
+            table = self.tables[i]
+            if isinstance(table, NoisyMaxCPT):
+                dist = np.broadcast_to(table.marginal([marginals[p] for p in parent_ids]), (n, self.cardinality[i])).copy()
+            elif not parent_ids:
+                dist = np.broadcast_to(table, (n, self.cardinality[i])).copy()
+            else:
+                # (n, a) @ (a, rest) for the first parent, then batched (n, 1, b) @ (n, b, rest)
+                dist = marginals[parent_ids[0]] @ table.reshape(self.cardinality[parent_ids[0]], -1)
+                for p in parent_ids[1:]:
+                    dist = (marginals[p][:, None, :] @ dist.reshape(n, self.cardinality[p], -1))[:, 0, :]
+                if not self.rows_complete[i]:
+                    totals = dist.sum(axis=1, keepdims=True)
+                    dist = np.where(totals > 0, dist / np.where(totals > 0, totals, 1.0), 1.0 / self.cardinality[i])
+            if likelihoods and i in likelihoods: # Soft evidence: one broadcast multiply and renormalize for the whole chunk
+                dist = dist * likelihoods[i]
+                totals = dist.sum(axis=1, keepdims=True)
+                dist = np.where(totals > 0, dist / np.where(totals > 0, totals, 1.0), 1.0 / self.cardinality[i])
+            if observed.any():
+                dist[observed] = self.one_hot[i][column[observed]]
+            marginals[i] = dist
+        return marginals
+
+    def dense_table(self, i):
+        """Full CPT tensor (parents..., node) for node i; parametric CPTs are expanded."""
+        table = self.tables[i]
+        return table.expand() if isinstance(table, NoisyMaxCPT) else table
+
+    def cumulative_tables(self):
+        """Per-node (rows x states) cumulative CPT rows, normalized (uniform for empty rows; None if parametric)."""
+        if self.cumulative is None:
+            cumulative = []
+            for i, table in enumerate(self.tables):
+                if isinstance(table, NoisyMaxCPT):
+                    cumulative.append(None)
+                    continue
+                rows = table.reshape(-1, self.cardinality[i])
+                totals = rows.sum(axis=1, keepdims=True)
+                rows = np.where(totals > 0, rows / np.where(totals > 0, totals, 1.0), 1.0 / self.cardinality[i])
+                cdf = np.cumsum(rows, axis=1)
+                cdf[:, -1] = 1.0 # Guard against rounding leaving the last bin short
+                cumulative.append(cdf)
+            self.cumulative = cumulative
+        return self.cumulative
+
+    def sample(self, n, rng=None):
+        """
+        Ancestral (forward) sampling from the joint distribution.
+        Returns an (n x nodes) int64 array of state indices; rng is a
+        np.random.Generator or a seed.
+        """
+        return self.weighted_sample(n, {}, rng)[0]
+
+    def weighted_sample(self, n, encoded, rng=None, likelihoods=None):
+        """
+        Likelihood weighting: ancestral sampling with evidence nodes
+        ({node index: state index}) clamped instead of drawn, each sample
+        weighted by P(observed states | its sampled parents). Soft evidence
+        ({node index: likelihood vector}) weights samples by the likelihood
+        of the state drawn.
+        Returns ((n x nodes) int64 states, (n,) float64 weights).
+        """
+        rng = np.random.default_rng(rng)
+        cumulative = self.cumulative_tables()
+        samples = np.empty((len(self.nodes), n), dtype=np.int64) # Node-major, so parent rows are contiguous
+        weights = np.ones(n)
+        for i in range(len(self.nodes)): # Index order is topological
+            if cumulative[i] is None: # Parametric: per-sample CDF rows from the factorized form
+                cdf, rows = self.tables[i].row_cdfs(samples[self.parent_index[i]]), slice(None)
+            else:
+                cdf = cumulative[i]
+                rows = self.parent_strides[i] @ samples[self.parent_index[i]] if self.parents[i] else np.zeros(n, dtype=np.int64)
+            if i in encoded:
+                j = encoded[i]
+                samples[i] = j
+                weights *= cdf[rows, j] - cdf[rows, j - 1] if j else cdf[rows, 0]
+                continue
+            u = rng.random(n)
+            state = (u >= cdf[rows, 0]).astype(np.int64)
+            for j in range(1, self.cardinality[i] - 1): # Inverse-CDF: count the thresholds u has passed
+                state += u >= cdf[rows, j]
+            samples[i] = state
+            if likelihoods and i in likelihoods:
+                weights *= likelihoods[i][state]
+        return samples.T, weights
+
+    def to_dicts(self, marginals):
+        """Converts marginal vectors back into the {node: {state: p}} shape the scripts use."""
+        return {node: dict(zip(self.states[i], marginals[i].tolist())) for i, node in enumerate(self.nodes)}
+
+    def marginals(self, evidence=None):
+        """Forward-pass marginals for every node as {node: {state: p}}."""
+        return self.to_dicts(self.forward(evidence))
+
+
+def compile_table(node, cpt, parent_nodes, states_map):
+    """
+    Array (or NoisyMaxCPT) form of one node's loaded CPT. Missing rows stay
+    zero; a missing CPT becomes uniform. Raises ValueError for malformed CPTs.
+    """
+    node_states = states_map[node]
+    if cpt is None:
+        print(f"Critical Warning: Node '{node}' missing from CPTs. Assigning uniform.", file=sys.stderr)
+        shape = [len(states_map[p]) for p in parent_nodes] + [len(node_states)]
+        return np.full(shape, 1.0 / len(node_states))
+    if not isinstance(cpt, dict):
+        raise ValueError(f"CPT for node '{node}' is not a dict: {type(cpt)}.")
+    if is_parametric(cpt):
+        return parametric_cpt_from_dict(node, cpt, parent_nodes, states_map)
+    if not parent_nodes:
+        return distribution_to_vector(cpt, node_states, f"prior '{node}'")
+    parent_positions = [{s: j for j, s in enumerate(states_map[p])} for p in parent_nodes]
+    table = np.zeros([len(pos) for pos in parent_positions] + [len(node_states)])
+    for key, dist in cpt.items():
+        if not isinstance(key, tuple) or len(key) != len(parent_nodes) or not isinstance(dist, dict):
+            raise ValueError(f"Malformed CPT entry for node '{node}': {key!r}.")
+        try:
+            row = tuple(pos[s] for pos, s in zip(parent_positions, key))
+        except KeyError:
+            print(f"Warning: CPT key {key} for node '{node}' uses unknown parent states. Skipping.", file=sys.stderr)
+            continue
+        table[row] = distribution_to_vector(dist, node_states, f"CPT '{node}' | {key}")
+    return table
+
+def compile_network(parents_map, states_map, cpts, order=None):
+    """
+    Builds a CompiledNetwork from PARENTS / STATES / loaded CPT dicts.
+    Conditional CPT keys are parent-state tuples; missing rows stay zero,
+    exactly like calculate_marginal_manual skipping them. The node order
+    defaults to topological_order(parents_map). Raises ValueError for
+    cycles and structures the array form cannot represent.
+    """
+    if order is None:
+        order = topological_order(parents_map)
+    if set(order) != set(parents_map):
+        raise ValueError("Evaluation order does not match the PARENTS definition.")
+    index = {node: i for i, node in enumerate(order)}
+    states, parents, tables = [], [], []
+    for node in order:
+        node_states = states_map.get(node)
+        if not node_states:
+            raise ValueError(f"No STATES defined for node '{node}'.")
+        parent_nodes = parents_map[node]
+        for p_node in parent_nodes:
+            if index[p_node] >= index[node]:
+                raise ValueError(f"Parent '{p_node}' is evaluated after child '{node}'.")
+        states.append(node_states)
+        parents.append([index[p] for p in parent_nodes])
+        tables.append(compile_table(node, cpts.get(node), parent_nodes, states_map))
+    return CompiledNetwork(order, states, parents, tables)
+
+
+# --- 3. Binary Artifact ---
+def save_compiled(path, network, source_sha256):
+    """Writes network as a memory-mappable binary artifact (atomically, via a temp file)."""
+    kinds, blocks, arrays, offset = [], [], [], 0
+    for table in network.tables:
+        if isinstance(table, NoisyMaxCPT):
+            kinds.append('noisy_max')
+            parts = [table.leak] + table.links
+        else:
+            kinds.append('table')
+            parts = [table]
+        node_blocks = []
+        for array in parts:
+            node_blocks.append([offset, list(array.shape)])
+            arrays.append(array)
+            offset += array.nbytes
+        blocks.append(node_blocks)
+    data = b''.join(array.tobytes() for array in arrays)
+    header = {
+        'source_sha256': source_sha256,
+        'data_sha256': hashlib.sha256(data).hexdigest(),
+        'nodes': list(network.nodes),
+        'states': [list(s) for s in network.states],
+        'parents': [list(p) for p in network.parents],
+        'kinds': kinds, # 'table' (one block) or 'noisy_max' (leak block + one link block per parent)
+        'blocks': blocks, # Per node: [[byte offset into the data section, shape], ...]
+        'rows_complete': network.rows_complete,
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    prefix = len(COMPILED_MAGIC) + 8 + len(header_bytes)
+    padding = -prefix % COMPILED_ALIGNMENT
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(COMPILED_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        f.write(b'\x00' * padding)
+        f.write(data)
+    os.replace(temp_path, path)
+
+def read_compiled_header(path):
+    """Returns (header dict, data offset) of a binary artifact, or None if unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(COMPILED_MAGIC)) != COMPILED_MAGIC:
+                print(f"Warning: {path} is not a compiled CPT artifact of this format version. Ignoring.", file=sys.stderr)
+                return None
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length).decode('utf-8'))
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read compiled CPT artifact {path}: {e}", file=sys.stderr)
+        return None
+    prefix = len(COMPILED_MAGIC) + 8 + header_length
+    return header, prefix + (-prefix % COMPILED_ALIGNMENT)
+
+def load_compiled(path, source_sha256=None, verify=False):
+    """
+    Memory-maps a binary artifact into a CompiledNetwork. Tables are read-only
+    views into the file, so loading does no parsing or copying. Returns None
+    if the file is missing, unreadable, or compiled from another JSON version
+    (when source_sha256 is given). verify=True also checks the tensor bytes.
+    """
+    if not os.path.exists(path):
+        return None
+    parsed = read_compiled_header(path)
+    if parsed is None:
+        return None
+    header, data_offset = parsed
+    if source_sha256 is not None and header.get('source_sha256') != source_sha256:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # The mapping outlives the file handle
+        if verify and hashlib.sha256(memoryview(data)[data_offset:]).hexdigest() != header['data_sha256']:
+            print(f"Warning: Compiled CPT artifact {path} is corrupt. Ignoring.", file=sys.stderr)
+            return None
+        tables = []
+        for kind, node_blocks in zip(header['kinds'], header['blocks']):
+            parts = [np.ndarray(shape, dtype=np.float64, buffer=data, offset=data_offset + offset) for offset, shape in node_blocks]
+            tables.append(NoisyMaxCPT(parts[0], parts[1:]) if kind == 'noisy_max' else parts[0])
+        return CompiledNetwork(header['nodes'], header['states'], header['parents'], tables, header.get('rows_complete'))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: Could not map compiled CPT artifact {path}: {e}", file=sys.stderr)
+        return None
+
+def load_or_compile(artifact_path, json_path, compile_fn, structure=None, write=True):
+    """
+    Returns the network for json_path, memory-mapped from artifact_path when it
+    was built from the current JSON bytes (and, if structure = (parents_map,
+    states_map, order) is given, has that structure). Otherwise calls
+    compile_fn() and, if write is set, refreshes the artifact. Returns None if
+    compile_fn does.
+    """
+    source_sha256 = file_sha256(json_path)
+    network = load_compiled(artifact_path, source_sha256)
+    if network is not None and (structure is None or network.matches_structure(*structure)):
+        return network
+    network = compile_fn()
+    if network is not None and write:
+        try:
+            save_compiled(artifact_path, network, source_sha256)
+        except OSError as e:
+            print(f"Warning: Could not write compiled CPT artifact {artifact_path}: {e}", file=sys.stderr)
+    return network
+
+
+# --- 4. Scenarios ---
+def tables_equal(a, b):
+    """True if two compiled CPTs hold the same parameters."""
+    if a is b:
+        return True
+    if isinstance(a, NoisyMaxCPT) or isinstance(b, NoisyMaxCPT):
+        return (isinstance(a, NoisyMaxCPT) and isinstance(b, NoisyMaxCPT) and np.array_equal(a.leak, b.leak)
+                and len(a.links) == len(b.links) and all(np.array_equal(x, y) for x, y in zip(a.links, b.links)))
+    return a.shape == b.shape and np.array_equal(a, b)
+
+@functools.lru_cache(maxsize=256)
+def divergent_nodes(networks):
+    """
+    Indices of nodes whose CPT differs between any of the networks (a tuple;
+    memoized, as compiled tables are read-only). Raises ValueError if their
+    structures differ.
+    """
+    base = networks[0]
+    for other in networks[1:]:
+        if other.nodes != base.nodes or other.states != base.states or other.parents != base.parents:
+            raise ValueError("Scenario networks must share one structure (nodes, states and parents).")
+    return frozenset(i for i in range(len(base)) if any(not tables_equal(base.tables[i], other.tables[i]) for other in networks[1:]))
+
+def evaluate_scenarios(networks, evidence=None):
+    """
+    Forward-pass marginals for K CPT variants of one network (central /
+    optimistic / pessimistic, sweeps, ensembles). Nodes not downstream of a
+    differing CPT are computed once and shared; only the divergent nodes
+    and their unobserved descendants are evaluated per variant.
+    Returns K marginal lists (in network.nodes order).
+    """
+    base = networks[0]
+    encoded = base.encode_evidence(evidence)
+    likelihoods = base.encode_likelihoods(evidence)
+    affected, stack = set(), list(divergent_nodes(tuple(networks)))
+    while stack: # Clamped evidence nodes stop the divergence
+        i = stack.pop()
+        if i not in affected and i not in encoded:
+            affected.add(i)
+            stack.extend(base.children[i])
+    shared = [None] * len(base)
+    for i in range(len(base)):
+        if i not in affected:
+            shared[i] = base.node_marginal(i, shared, encoded, likelihoods)
+    results = []
+    for network in networks:
+        marginals = list(shared)
+        for i in sorted(affected): # Index order is topological
+            marginals[i] = network.node_marginal(i, marginals, encoded, likelihoods)
+        results.append(marginals)
+    return results
+
+
+# --- 5. Layered CPT Sets ---
+class LayeredCPTs(Mapping):
+    """
+    Read-only CPT set made of a shared base CPT dict and sparse per-variant
+    overrides ({node: CPT}). Lookups fall through to the base, so a variant
+    costs one entry per overridden node instead of a deep copy of the model.
+    Layering a LayeredCPTs flattens onto the same base. The base must not be
+    mutated while variants over it are in use.
+    """
+
+    __slots__ = ('base', 'overrides')
+
+    def __init__(self, base, overrides=None):
+        if isinstance(base, LayeredCPTs):
+            overrides = {**base.overrides, **(overrides or {})}
+            base = base.base
+        self.base = base
+        self.overrides = dict(overrides or {})
+
+    def __getitem__(self, node):
+        if node in self.overrides:
+            return self.overrides[node]
+        return self.base[node]
+
+    def __contains__(self, node):
+        return node in self.overrides or node in self.base
+
+    def __iter__(self):
+        yield from self.base
+        yield from (node for node in self.overrides if node not in self.base)
+
+    def __len__(self):
+        return len(self.base) + sum(1 for node in self.overrides if node not in self.base)
+
+    def __repr__(self):
+        return f"LayeredCPTs({len(self.base)} base nodes, overrides={sorted(self.overrides)})"
+
+    def layer(self, overrides):
+        """Another variant over the same base, with these overrides on top of this one's."""
+        return LayeredCPTs(self, overrides)
+
+def compile_layered(base_network, overrides):
+    """
+    Network for a LayeredCPTs over the CPTs base_network was compiled from:
+    only the overridden nodes are compiled, every other tensor (memory-mapped
+    ones included) is shared with base_network. Raises ValueError for
+    overrides of nodes that are not in the network or malformed CPTs.
+    """
+    states_map = dict(zip(base_network.nodes, base_network.states))
+    tables = {}
+    for node, cpt in overrides.items():
+        i = base_network.index.get(node)
+        if i is None:
+            raise ValueError(f"Override for node '{node}', which is not in the network.")
+        tables[i] = compile_table(node, cpt, [base_network.nodes[p] for p in base_network.parents[i]], states_map)
+    return base_network.with_tables(tables)
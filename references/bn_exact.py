@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Exact posterior inference for compiled P(doom) networks via a junction tree.
+
+The forward pass in bn_engine only pushes beliefs from parents to children,
+so evidence on a child (e.g. ControlLossRisk from Q1_Control) never reaches
+its ancestors. This module compiles the network into a junction tree once
+(moralize, min-fill triangulation, maximum-weight spanning tree over clique
+separators) and answers queries by Shafer-Shenoy message passing in NumPy.
+One calibration gives every posterior marginal, matching pgmpy's
+VariableElimination in bn.py.
+
+Clique structures are cached per network topology, so CPT variants that share
+a structure (central / optimistic / pessimistic) only rebuild potentials.
+All einsum subscripts carry a leading '...' so the same compiled tree answers
+batched queries (one evidence row per leading index).
+"""
+
+import string
+import sys
+import weakref
+import numpy as np
+
+LETTERS = string.ascii_letters
+
+# --- 1. Structure Compilation ---
+def moral_graph(network):
+    """Undirected adjacency sets of the moralized DAG."""
+    adjacency = [set() for _ in network.nodes]
+    for child, parent_ids in enumerate(network.parents):
+        family = list(parent_ids) + [child]
+        for a in family:
+            for b in family:
+                if a != b:
+                    adjacency[a].add(b)
+    return adjacency
+
+def triangulate(adjacency, cardinality):
+    """
+    Greedy min-fill elimination (ties broken by clique weight).
+    Returns the maximal cliques as sorted tuples of node indices.
+    Costs are cached and only refreshed for vertices an elimination can
+    affect (the eliminated vertex's neighbours and their neighbours).
+    """
+    graph = [set(nbrs) for nbrs in adjacency]
+    remaining = set(range(len(graph)))
+    def cost(v):
+        nbrs = graph[v] & remaining
+        fill = sum(1 for a in nbrs for b in nbrs if a < b and b not in graph[a])
+        weight = np.prod([cardinality[u] for u in nbrs | {v}], dtype=float)
+        return fill, weight, v
+    costs = {v: cost(v) for v in remaining}
+    cliques, clique_sets = [], []
+    while remaining:
+        v = min(costs.values())[2]
+        nbrs = graph[v] & remaining
+        for a in nbrs:
+            graph[a] |= nbrs - {a}
+        members = nbrs | {v}
+        if not any(members <= c for c in clique_sets):
+            cliques.append(tuple(sorted(members)))
+            clique_sets.append(members)
+        remaining.remove(v)
+        del costs[v]
+        stale = set(nbrs)
+        for a in nbrs:
+            stale |= graph[a] & remaining
+        for u in stale:
+            costs[u] = cost(u)
+    return cliques
+
+def spanning_tree(cliques, cardinality):
+    """
+    Maximum-weight spanning tree over separator sizes (Kruskal). Returns adjacency lists.
+    Only clique pairs that share a variable are scored; disconnected parts are
+    then joined to clique 0 by empty separators, as a full Kruskal pass would.
+    """
+    containing = {}
+    for c, members in enumerate(cliques):
+        for v in members:
+            containing.setdefault(v, []).append(c)
+    pairs = {(i, j) for cs in containing.values() for i in cs for j in cs if i < j}
+    candidates = []
+    for i, j in pairs:
+        sep = set(cliques[i]) & set(cliques[j])
+        candidates.append((-len(sep), np.prod([cardinality[v] for v in sep], dtype=float), i, j))
+    candidates.sort()
+    candidates.extend((0, 1.0, 0, j) for j in range(1, len(cliques)))
+    root_of = list(range(len(cliques)))
+    def find(x):
+        while root_of[x] != x:
+            root_of[x] = root_of[root_of[x]]
+            x = root_of[x]
+        return x
+    tree = [[] for _ in cliques]
+    for _, _, i, j in candidates:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            root_of[ri] = rj
+            tree[i].append(j)
+            tree[j].append(i)
+    return tree
+
+
+class JunctionTreeStructure:
+    """Clique layout, message schedule and einsum subscripts for one network topology."""
+
+    def __init__(self, parents, cardinality):
+        self.parents = [tuple(p) for p in parents]
+        self.cardinality = np.asarray(cardinality)
+        n = len(self.parents)
+        self.cliques = triangulate(moral_graph(self), self.cardinality)
+        self.tree = spanning_tree(self.cliques, self.cardinality)
+        # Each family goes to the smallest clique containing it; evidence and
+        # marginals for a node use the smallest clique containing that node.
+        size = [np.prod([self.cardinality[v] for v in c], dtype=float) for c in self.cliques]
+        containing = [[] for _ in range(n)]
+        for c, members in enumerate(self.cliques):
+            for v in members:
+                containing[v].append(c)
+        clique_sets = [set(members) for members in self.cliques]
+        self.family_clique = [min((c for c in containing[v] if set(p) <= clique_sets[c]), key=size.__getitem__)
+                              for v, p in enumerate(self.parents)]
+        self.home = [min(containing[v], key=size.__getitem__) for v in range(n)]
+        self.families = [[] for _ in self.cliques]
+        for v, c in enumerate(self.family_clique):
+            self.families[c].append(v)
+        self.max_clique_states = max(size)
+        self._root_clique_order()
+        self._compile_subscripts()
+        self.schedules = {}
+        self.dependents = {}
+
+    @property
+    def nodes(self):
+        return range(len(self.parents))
+
+    def _root_clique_order(self):
+        """BFS order from clique 0 (one BFS per connected component) plus subtree intervals."""
+        self.parent_clique = [-1] * len(self.cliques)
+        self.component = [-1] * len(self.cliques)
+        self.bfs = []
+        seen = set()
+        for root in range(len(self.cliques)):
+            if root in seen:
+                continue
+            seen.add(root)
+            queue = [root]
+            while queue:
+                c = queue.pop(0)
+                self.bfs.append(c)
+                self.component[c] = root
+                for nb in self.tree[c]:
+                    if nb not in seen:
+                        seen.add(nb)
+                        self.parent_clique[nb] = c
+                        queue.append(nb)
+        self.descendants = [set() for _ in self.cliques]
+        for c in reversed(self.bfs):
+            self.descendants[c].add(c)
+            if self.parent_clique[c] >= 0:
+                self.descendants[self.parent_clique[c]] |= self.descendants[c]
+
+    def _compile_subscripts(self):
+        """Precomputes einsum subscripts for every directed message and node marginal."""
+        self.separators = {}
+        self.incoming = {}
+        self.message_subscripts = {}
+        for i in range(len(self.cliques)):
+            for j in self.tree[i]:
+                sep = tuple(sorted(set(self.cliques[i]) & set(self.cliques[j])))
+                self.separators[(i, j)] = sep
+        for (i, j), sep in self.separators.items():
+            incoming = [(k, i) for k in self.tree[i] if k != j]
+            self.incoming[(i, j)] = incoming
+            operands = [self.cliques[i]] + [self.separators[e] for e in incoming]
+            self.message_subscripts[(i, j)] = self._subscripts(operands, sep)
+        self.belief_subscripts = []
+        for c, members in enumerate(self.cliques):
+            operands = [members] + [self.separators[(k, c)] for k in self.tree[c]]
+            self.belief_subscripts.append(self._subscripts(operands, members))
+        # Axes (counted from the end, so batch axes are untouched) to sum out of the home belief
+        self.marginal_axes = []
+        for v in self.nodes:
+            members = self.cliques[self.home[v]]
+            self.marginal_axes.append(tuple(a - len(members) for a, u in enumerate(members) if u != v))
+
+    @staticmethod
+    def _subscripts(operands, output):
+        letters = {}
+        def word(variables):
+            return '...' + ''.join(letters.setdefault(v, LETTERS[len(letters)]) for v in variables)
+        inputs = ','.join(word(vs) for vs in operands)
+        return f"{inputs}->{word(output)}"
+
+    def dependent_edges(self, clique):
+        """Directed edges whose message changes when clique's potential changes (edges pointing away from it)."""
+        if clique not in self.dependents:
+            edges = []
+            for c in self.bfs:
+                p = self.parent_clique[c]
+                if p < 0 or self.component[c] != self.component[clique]:
+                    continue
+                if clique in self.descendants[c]:
+                    edges.append((c, p))
+                else:
+                    edges.append((p, c))
+            self.dependents[clique] = edges
+        return self.dependents[clique]
+
+    def schedule(self, target_cliques):
+        """Directed edges needed to compute beliefs at target_cliques, in dependency order."""
+        key = frozenset(target_cliques)
+        if key not in self.schedules:
+            upward, downward = [], []
+            for c in reversed(self.bfs):
+                p = self.parent_clique[c]
+                if p >= 0 and not key <= self.descendants[c]:
+                    upward.append((c, p))
+            for c in self.bfs:
+                p = self.parent_clique[c]
+                if p >= 0 and key & self.descendants[c]:
+                    downward.append((p, c))
+            self.schedules[key] = upward + downward
+        return self.schedules[key]
+
+
+STRUCTURE_CACHE = {}
+
+def structure_for(network):
+    """Returns the (cached) junction tree structure for a network's topology."""
+    key = (tuple(network.parents), tuple(int(k) for k in network.cardinality))
+    if key not in STRUCTURE_CACHE:
+        STRUCTURE_CACHE[key] = JunctionTreeStructure(network.parents, network.cardinality)
+    return STRUCTURE_CACHE[key]
+
+
+# --- 2. Junction Tree Inference ---
+class JunctionTree:
+    """
+    Compiled junction tree with initial clique potentials for one
+    CompiledNetwork. weak=True holds the network by weak reference (for
+    caches keyed by the network, which must not keep it alive).
+    """
+
+    def __init__(self, network, weak=False):
+        self._network = weakref.ref(network) if weak else network
+        self._weak = weak
+        self.structure = structure_for(network)
+        self.potentials = [self.clique_potential(network, c) for c in range(len(self.structure.cliques))]
+        self.axis = [{v: a for a, v in enumerate(members)} for members in self.structure.cliques]
+
+    @property
+    def network(self):
+        network = self._network() if self._weak else self._network
+        if network is None:
+            raise ReferenceError("The network of this cached JunctionTree has been freed.")
+        return network
+
+    def clique_potential(self, network, c):
+        """Read-only product of the CPTs of the families assigned to clique c."""
+        s = self.structure
+        members = s.cliques[c]
+        operands = [np.ones([network.cardinality[v] for v in members])]
+        words = [members]
+        for v in s.families[c]:
+            operands.append(network.dense_table(v)) # Parametric CPTs are expanded for the clique potential
+            words.append(tuple(network.parents[v]) + (v,))
+        potential = np.einsum(s._subscripts(words, members), *operands)
+        potential.setflags(write=False)
+        return potential
+
+    def with_tables(self, tables):
+        """
+        Uncached JunctionTree for network.with_tables(tables) {node index:
+        table}: only the potentials of the cliques holding those nodes'
+        families are recomputed, the rest are shared.
+        """
+        network = self.network.with_tables(tables)
+        tree = object.__new__(JunctionTree)
+        tree._network, tree._weak = network, False
+        tree.structure, tree.axis = self.structure, self.axis
+        tree.potentials = list(self.potentials)
+        for c in {self.structure.family_clique[i] for i in tables}:
+            tree.potentials[c] = tree.clique_potential(network, c)
+        return tree
+
+    def absorb(self, evidence_vectors):
+        """
+        Multiplies evidence vectors {node index: vector or (N x k) array} into
+        copies of the clique potentials (each node's smallest containing clique).
+        """
+        potentials = list(self.potentials)
+        for v, vec in evidence_vectors.items():
+            c = self.structure.home[v]
+            members = self.structure.cliques[c]
+            shape = [1] * len(members)
+            shape[self.axis[c][v]] = self.network.cardinality[v]
+            vec = np.asarray(vec, dtype=np.float64)
+            potentials[c] = potentials[c] * vec.reshape(vec.shape[:-1] + tuple(shape)) # Leading axes = batch
+        return potentials
+
+    def messages(self, potentials, target_cliques, cache=None):
+        """Runs the message schedule for target_cliques; cache (dict) may hold still-valid messages."""
+        cache = {} if cache is None else cache
+        s = self.structure
+        for edge in s.schedule(target_cliques):
+            if edge not in cache:
+                cache[edge] = np.einsum(s.message_subscripts[edge], potentials[edge[0]], *[cache[e] for e in s.incoming[edge]])
+        return cache
+
+    def belief(self, c, potentials, messages):
+        """Unnormalized clique belief: potential times all incoming messages."""
+        s = self.structure
+        return np.einsum(s.belief_subscripts[c], potentials[c], *[messages[(k, c)] for k in s.tree[c]])
+
+    def unnormalized_marginals(self, nodes, potentials, messages):
+        """{node index: unnormalized marginal}, computing each home clique belief once."""
+        beliefs, result = {}, {}
+        for v in nodes:
+            c = self.structure.home[v]
+            if c not in beliefs:
+                beliefs[c] = self.belief(c, potentials, messages)
+            axes = self.structure.marginal_axes[v]
+            result[v] = beliefs[c].sum(axis=axes) if axes else beliefs[c]
+        return result
+
+    def evidence_vectors(self, evidence):
+        """{node index: vector} for an evidence dict: one-hot for hard states, likelihoods for soft entries."""
+        net = self.network
+        vectors = {i: net.one_hot[i][j] for i, j in net.encode_evidence(evidence).items()}
+        for i, lam in net.encode_likelihoods(evidence).items():
+            vectors[i] = vectors[i] * lam if i in vectors else lam
+        return vectors
+
+    def query(self, evidence=None, nodes=None, likelihoods=None):
+        """
+        Posterior marginals {node index: vector} for the requested node indices
+        (default: all). likelihoods optionally adds {node index: vector} factors.
+        """
+        vectors = self.evidence_vectors(evidence)
+        for i, lam in (likelihoods or {}).items():
+            vectors[i] = vectors[i] * lam if i in vectors else lam
+        nodes = range(len(self.network)) if nodes is None else nodes
+        potentials = self.absorb(vectors)
+        messages = self.messages(potentials, {self.structure.home[v] for v in nodes})
+        result = {}
+        for v, unnormalized in self.unnormalized_marginals(nodes, potentials, messages).items():
+            total = unnormalized.sum()
+            if total <= 0:
+                print("Warning: Evidence has zero probability under the model. Returning uniform marginals.", file=sys.stderr)
+                unnormalized = np.ones_like(unnormalized)
+                total = unnormalized.sum()
+            result[v] = unnormalized / total
+        return result
+
+    def batch_vectors(self, evidence, likelihoods=None):
+        """{node index: (N x states)} evidence vectors for an (N x nodes) evidence index array (-1 = unobserved)."""
+        net = self.network
+        evidence = np.asarray(evidence)
+        n = evidence.shape[0]
+        vectors = {}
+        for i in range(len(net)):
+            column = evidence[:, i]
+            if (column >= 0).any():
+                vec = np.ones((n, net.cardinality[i]))
+                vec[column >= 0] = net.one_hot[i][column[column >= 0]]
+                vectors[i] = vec
+        for i, lam in (likelihoods or {}).items():
+            vectors[i] = vectors[i] * lam if i in vectors else np.broadcast_to(lam, (n, net.cardinality[i]))
+        return vectors
+
+    def query_batch(self, evidence, nodes, likelihoods=None):
+        """
+        Posterior marginals {node index: (N x states)} for an (N x nodes) evidence
+        index array (-1 = unobserved), in one batched calibration. likelihoods
+        optionally adds soft evidence as {node index: (states,) or (N x states)}.
+        """
+        net = self.network
+        n = np.asarray(evidence).shape[0]
+        potentials = self.absorb(self.batch_vectors(evidence, likelihoods))
+        messages = self.messages(potentials, {self.structure.home[v] for v in nodes})
+        result = {}
+        for v, unnormalized in self.unnormalized_marginals(nodes, potentials, messages).items():
+            unnormalized = np.broadcast_to(unnormalized, (n, net.cardinality[v]))
+            totals = unnormalized.sum(axis=-1, keepdims=True)
+            result[v] = np.where(totals > 0, unnormalized / np.where(totals > 0, totals, 1.0), 1.0 / net.cardinality[v])
+        return result
+
+    def family_counts(self, evidence, weights=None):
+        """
+        Expected sufficient statistics for EM from an (N x nodes) evidence index
+        array (-1 = unobserved), in one batched calibration. Returns (counts,
+        log_likelihood, impossible): counts[v] = sum over rows of weight x
+        P(parents(v), v | row), with axes (parents..., v); log_likelihood is the
+        weighted sum of log P(row); impossible counts rows of zero probability,
+        which contribute nothing.
+        """
+        net, s = self.network, self.structure
+        evidence = np.asarray(evidence)
+        n = evidence.shape[0]
+        weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        potentials = self.absorb(self.batch_vectors(evidence))
+        cliques = sorted(set(s.family_clique))
+        messages = self.messages(potentials, set(cliques))
+        totals = {} # Connected component -> P(row restricted to it)
+        beliefs = {}
+        for c in cliques:
+            shape = tuple(int(net.cardinality[v]) for v in s.cliques[c])
+            beliefs[c] = np.broadcast_to(self.belief(c, potentials, messages), (n,) + shape)
+            totals.setdefault(s.component[c], beliefs[c].reshape(n, -1).sum(axis=1))
+        probability = np.prod(list(totals.values()), axis=0)
+        possible = probability > 0
+        counts = [None] * len(net)
+        for c in cliques:
+            total = totals[s.component[c]]
+            scale = np.where(possible, weights / np.where(possible, total, 1.0), 0.0)
+            expected = np.tensordot(scale, beliefs[c], axes=(0, 0))
+            for v in s.families[c]:
+                counts[v] = np.einsum(s._subscripts([s.cliques[c]], tuple(net.parents[v]) + (v,)), expected)
+        log_likelihood = float(weights[possible] @ np.log(probability[possible]))
+        return counts, log_likelihood, int(np.count_nonzero(~possible))
+
+    def marginals(self, evidence=None):
+        """Posterior marginals for every node in the {node: {state: p}} shape the scripts use."""
+        posterior = self.query(evidence)
+        return self.network.to_dicts([posterior[i] for i in range(len(self.network))])
+
+
+JUNCTION_TREES = weakref.WeakKeyDictionary()
+
+def junction_tree_for(network):
+    """
+    Returns the cached JunctionTree for a CompiledNetwork, compiling it on
+    first use. The tree holds the network weakly, so the entry goes away with
+    the network; keep the network referenced while using its tree. Networks
+    used for a single pass (EM iterations, candidate CPTs) should use an
+    uncached JunctionTree(network) instead.
+    """
+    tree = JUNCTION_TREES.get(network)
+    if tree is None:
+        tree = JUNCTION_TREES[network] = JunctionTree(network, weak=True)
+    return tree
+
+
+# --- 3. pgmpy Interop ---
+def to_pgmpy_model(network):
+    """Builds the equivalent pgmpy model (for benchmarks and cross-checks). Requires pgmpy."""
+    try:
+        from pgmpy.models import DiscreteBayesianNetwork as PgmpyNetwork
+    except ImportError:
+        from pgmpy.models import BayesianNetwork as PgmpyNetwork
+    from pgmpy.factors.discrete import TabularCPD
+    model = PgmpyNetwork([(network.nodes[p], network.nodes[v]) for v, ps in enumerate(network.parents) for p in ps])
+    model.add_nodes_from(network.nodes)
+    for v, node in enumerate(network.nodes):
+        parent_names = [network.nodes[p] for p in network.parents[v]]
+        k = int(network.cardinality[v])
+        state_names = {node: list(network.states[v])}
+        state_names.update({network.nodes[p]: list(network.states[p]) for p in network.parents[v]})
+        model.add_cpds(TabularCPD(node, k, network.dense_table(v).reshape(-1, k).T,
+                                  evidence=parent_names or None,
+                                  evidence_card=[int(network.cardinality[p]) for p in network.parents[v]] or None,
+                                  state_names=state_names))
+    return model
+
+def network_from_pgmpy(model):
+    """Compiles a pgmpy model (TabularCPDs with state_names) into a CompiledNetwork."""
+    import networkx
+    from bn_engine import CompiledNetwork
+    order = list(networkx.topological_sort(model))
+    index = {node: i for i, node in enumerate(order)}
+    states, parents, tables = [], [], []
+    for node in order:
+        cpd = model.get_cpds(node)
+        if cpd is None:
+            raise ValueError(f"pgmpy model has no CPD for node '{node}'.")
+        evidence = list(cpd.variables[1:])
+        cards = [int(c) for c in cpd.cardinality]
+        values = np.asarray(cpd.get_values(), dtype=np.float64) # (node states, parent configs)
+        states.append(list(cpd.state_names[node]))
+        parents.append([index[p] for p in evidence])
+        tables.append(values.T.reshape(cards[1:] + [cards[0]]))
+    return CompiledNetwork(order, states, parents, tables)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Learns CPTs from stored respondent answers.
+
+Records are streamed chunk_rows at a time from a CSV file (one column per
+node or question ID, empty = unanswered) or a JSON-lines file (one {node or
+question ID: state or option} object per line). Question answers are mapped
+onto node states through vanilla_bn.questions_map. Prior-belief questions
+(Q15) are ignored, as they are not evidence on a node.
+
+Each CPT row gets Dirichlet pseudo-counts, prior_strength x the hand-authored
+row, so the data refines the authored CPTs rather than replacing them. Fitted
+rows are the posterior means (prior + counts, normalized).
+
+- Complete records add their counts per (node, parent configuration) once,
+  in the first pass.
+- Records with unanswered questions are fitted by EM. Every iteration
+  streams them again and adds the expected family counts from one batched
+  junction-tree calibration per chunk (bn_exact.JunctionTree.family_counts).
+  Identical answer patterns in a chunk are evaluated once.
+
+Working memory is one chunk plus one count table per node, whatever the
+corpus size. The result is written through generate_cpts.generate_json_cpts,
+so it is a bn_cpts.json that the generator's checks and the loaders accept.
+
+Usage: python bn_fit.py RECORDS [--output bn_cpts_fitted.json] [--prior-strength S] [--max-iterations N] [--tolerance T] [--chunk N]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import numpy as np
+import bn_exact
+
+# --- Configuration ---
+FITTED_JSON_PATH = 'bn_cpts_fitted.json'
+DEFAULT_CHUNK = 4096 # Records per chunk; bounds working memory
+PRIOR_STRENGTH = 10.0 # Pseudo-counts per CPT row, spread as the hand-authored row (0 = data only)
+EM_MAX_ITERATIONS = 50
+EM_TOLERANCE = 1e-4 # Stop once no CPT entry moves by more than this
+OUTPUT_DECIMALS = 6
+
+# --- 1. Reading Records ---
+def read_records(path):
+    """Yields one {column: value} dict per record: CSV rows for *.csv, otherwise JSON lines."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            yield from csv.DictReader(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    print(f"Warning: Skipping malformed record on line {line_number} of {path}: {e}", file=sys.stderr)
+
+def answer_codes(network, questions_map):
+    """{question ID: (node index, {option key or text: state index})} for the questions that set a node state."""
+    codes = {}
+    for qid, q_data in questions_map.items():
+        node = q_data.get('node')
+        if q_data.get('is_prior_belief', False) or node not in network.index:
+            continue
+        i = network.index[node]
+        options = {}
+        for key, (text, state) in q_data['options'].items():
+            if state in network.state_index[i]:
+                options[key] = options[text] = network.state_index[i][state]
+        codes[qid] = (i, options)
+    return codes
+
+def encode_record(network, record, codes, ignored):
+    """(nodes,) state indices for one record (-1 = unanswered); unrecognized values are tallied in ignored."""
+    row = np.full(len(network), -1, dtype=np.int64)
+    for key, value in record.items():
+        if value is None or value == '':
+            continue
+        value = str(value).strip()
+        if key in network.index:
+            i = network.index[key]
+            j = network.state_index[i].get(value)
+        elif key in codes:
+            i, options = codes[key]
+            j = options.get(value)
+        else:
+            continue # Other columns (respondent IDs, timestamps, Q15)
+        if j is None:
+            ignored[key] = ignored.get(key, 0) + 1
+            continue
+        row[i] = j # A later question on the same node wins, as in run_quiz
+    return row
+
+def record_chunks(path, network, questions_map, chunk_rows=DEFAULT_CHUNK, ignored=None):
+    """Yields (N x nodes) state index arrays (-1 = unanswered), N <= chunk_rows."""
+    codes = answer_codes(network, questions_map)
+    ignored = {} if ignored is None else ignored
+    rows = []
+    for record in read_records(path):
+        rows.append(encode_record(network, record, codes, ignored))
+        if len(rows) == chunk_rows:
+            yield np.array(rows)
+            rows = []
+    if rows:
+        yield np.array(rows)
+
+
+# --- 2. Sufficient Statistics ---
+def prior_counts(network, strength=PRIOR_STRENGTH):
+    """Dirichlet pseudo-counts per node, shaped (parents..., node): strength x the network's rows (uniform where a row is empty)."""
+    counts = []
+    for i in range(len(network)):
+        table = network.dense_table(i)
+        totals = table.sum(axis=-1, keepdims=True)
+        rows = np.where(totals > 0, table / np.where(totals > 0, totals, 1.0), 1.0 / network.cardinality[i])
+        counts.append(strength * rows)
+    return counts
+
+def complete_counts(network, rows, weights=None):
+    """Family counts per node, shaped (parents..., node), from fully observed rows."""
+    counts = []
+    for i in range(len(network)):
+        k = int(network.cardinality[i])
+        flat = rows[:, network.parent_index[i]] @ network.parent_strides[i] * k + rows[:, i] if len(network.parents[i]) else rows[:, i]
+        size = int(np.prod([network.cardinality[p] for p in network.parents[i]], dtype=np.int64)) * k
+        shape = tuple(int(network.cardinality[p]) for p in network.parents[i]) + (k,)
+        counts.append(np.bincount(flat, weights=weights, minlength=size).reshape(shape))
+    return counts
+
+def normalize_counts(counts):
+    """CPT tables from counts: each row normalized, empty rows uniform."""
+    tables = []
+    for c in counts:
+        totals = c.sum(axis=-1, keepdims=True)
+        tables.append(np.where(totals > 0, c / np.where(totals > 0, totals, 1.0), 1.0 / c.shape[-1]))
+    return tables
+
+
+# --- 3. Fitting ---
+def fit_cpts(network, path, questions_map, prior_strength=PRIOR_STRENGTH, max_iterations=EM_MAX_ITERATIONS,
+             tolerance=EM_TOLERANCE, chunk_rows=DEFAULT_CHUNK, progress=None):
+    """
+    Fits every CPT of network (whose CPTs are the prior) to the records in
+    path. Returns (fitted CompiledNetwork, stats dict). progress, if given,
+    is called with (iteration, log-likelihood of the incomplete records,
+    largest CPT change) after every EM iteration. prior_strength 0 fits the
+    data alone (EM then starts from network's CPTs). Raises ValueError if
+    prior_strength is negative.
+    """
+    if prior_strength < 0:
+        raise ValueError(f"Prior strength must be non-negative, got {prior_strength}.")
+    prior = prior_counts(network, prior_strength)
+    observed = [np.zeros_like(c) for c in prior]
+    ignored = {}
+    stats = {'records': 0, 'complete': 0, 'iterations': 0, 'converged': True, 'impossible': 0}
+    for rows in record_chunks(path, network, questions_map, chunk_rows, ignored):
+        complete = (rows >= 0).all(axis=1)
+        stats['records'] += len(rows)
+        stats['complete'] += int(complete.sum())
+        if complete.any():
+            for total, counts in zip(observed, complete_counts(network, rows[complete])):
+                total += counts
+    for key, count in ignored.items():
+        print(f"Warning: Ignored {count:,} unrecognized value(s) for '{key}'.", file=sys.stderr)
+    base = [p + o for p, o in zip(prior, observed)]
+    tables = normalize_counts(base)
+    if stats['complete'] == stats['records']:
+        return network.with_tables(dict(enumerate(tables))), stats # Nothing is missing: counting is exact, no EM needed
+    if prior_strength == 0: # Complete-record counts alone leave unvisited rows empty or one-hot, where EM gets stuck
+        tables = normalize_counts(prior_counts(network, 1.0))
+    current = network.with_tables(dict(enumerate(tables)))
+    stats['converged'] = False
+    for iteration in range(1, max_iterations + 1):
+        tree = bn_exact.JunctionTree(current) # Used for this pass only, so not cached
+        expected = [np.zeros_like(c) for c in prior]
+        log_likelihood, impossible = 0.0, 0
+        for rows in record_chunks(path, network, questions_map, chunk_rows):
+            rows = rows[(rows < 0).any(axis=1)]
+            if not len(rows):
+                continue
+            patterns, repeats = np.unique(rows, axis=0, return_counts=True)
+            counts, chunk_log_likelihood, chunk_impossible = tree.family_counts(patterns, repeats)
+            for total, c in zip(expected, counts):
+                total += c
+            log_likelihood += chunk_log_likelihood
+            impossible += chunk_impossible
+        new_tables = normalize_counts([b + e for b, e in zip(base, expected)])
+        change = max(float(np.abs(new - old).max()) for new, old in zip(new_tables, tables))
+        tables = new_tables
+        current = network.with_tables(dict(enumerate(tables)))
+        stats.update(iterations=iteration, impossible=impossible, log_likelihood=log_likelihood)
+        if progress is not None:
+            progress(iteration, log_likelihood, change)
+        if change <= tolerance:
+            stats['converged'] = True
+            break
+    return current, stats
+
+def fitted_source(network, decimals=OUTPUT_DECIMALS):
+    """The network's CPTs in the CPTS_SOURCE shape generate_cpts.py exports ({state: p} priors, {parent-state tuple: {state: p}} rows)."""
+    source = {}
+    for i, node in enumerate(network.nodes):
+        table = np.round(network.dense_table(i), decimals)
+        if not network.parents[i]:
+            source[node] = dict(zip(network.states[i], table.tolist()))
+            continue
+        source[node] = {tuple(network.states[p][j] for p, j in zip(network.parents[i], combo)): dict(zip(network.states[i], table[combo].tolist()))
+                        for combo in np.ndindex(*table.shape[:-1])}
+    return source
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the P(doom) CPTs to stored respondent answers.")
+    parser.add_argument('records', help="Respondent records: *.csv (one column per node or question ID) or JSON lines.")
+    parser.add_argument('--output', default=FITTED_JSON_PATH)
+    parser.add_argument('--prior-strength', type=float, default=PRIOR_STRENGTH, help="Pseudo-counts per CPT row from the current CPTs.")
+    parser.add_argument('--max-iterations', type=int, default=EM_MAX_ITERATIONS)
+    parser.add_argument('--tolerance', type=float, default=EM_TOLERANCE)
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help="Records per chunk.")
+    args = parser.parse_args()
+
+    import generate_cpts
+    import vanilla_bn
+    network = vanilla_bn.get_compiled_network(vanilla_bn.CPTS_central)
+    if network is None:
+        print("Error: CPTs could not be compiled.", file=sys.stderr)
+        sys.exit(1)
+
+    def show(iteration, log_likelihood, change):
+        print(f"  EM iteration {iteration:>3}: log-likelihood {log_likelihood:14.2f}, largest CPT change {change:.2e}")
+
+    print(f"\nFitting CPTs to {args.records} (prior strength {args.prior_strength:g})...")
+    start = time.perf_counter()
+    try:
+        fitted, stats = fit_cpts(network, args.records, vanilla_bn.questions_map, args.prior_strength, args.max_iterations,
+                                 args.tolerance, args.chunk, show)
+    except OSError as e:
+        print(f"Error: Could not read {args.records}: {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{stats['records']:,} records ({stats['complete']:,} complete), {stats['iterations']} EM iteration(s)"
+          f"{'' if stats['converged'] else ' (stopped at --max-iterations)'} in {time.perf_counter() - start:.1f} s.")
+    if stats['impossible']:
+        print(f"Warning: {stats['impossible']:,} answer pattern(s) have zero probability under the model and were skipped.", file=sys.stderr)
+    generate_cpts.generate_json_cpts(fitted_source(fitted), vanilla_bn.PARENTS, args.output, vanilla_bn.KEY_DELIMITER, vanilla_bn.STATES)
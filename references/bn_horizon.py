@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+P(doom by year) over an arbitrary grid of horizon years.
+
+vanilla_bn.py extrapolates 2050 / 2100 from the 2035 result by adding
+BASE_INCREASE points scaled by the multiplier of the single most likely
+Timeline state. Here the same ingredients become a cumulative curve per
+Timeline state, mixed over the full Timeline distribution:
+
+    F_t(y) = p35_t * (y - START_YEAR) / (2035 - START_YEAR)          y <= 2035
+           = min(1, p35_t + TIMELINE_MULTIPLIER[t] * increase(y))     y >= 2035
+    P(doom by y) = sum_t P(Timeline = t | answers) * F_t(y)
+
+where p35_t = P(P_doom_2035 = High or VeryHigh | answers, Timeline = t) and
+increase(y) interpolates the BASE_INCREASE anchors linearly (continuing the
+last slope past 2100). Every F_t is non-decreasing in y and the mixture
+weights do not depend on y, so the curve is monotone by construction. With
+the Timeline known, 2050 and 2100 reproduce the old heuristic. The anchors
+and multipliers are always passed in from vanilla_bn (HORIZON_INCREASES,
+TIMELINE_MULTIPLIER) rather than defined here.
+
+Usage: python bn_horizon.py [--years 2025:2100] [--mode forward|exact] [Node=State ...]
+"""
+
+import argparse
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+import bn_voi
+
+# --- Configuration ---
+TIMELINE_NODE = 'Timeline'
+TARGET_YEAR = 2035
+START_YEAR = 2025 # Cumulative P(doom) is zero here and ramps linearly to the 2035 value
+DEFAULT_MULTIPLIER = 1.0 # For Timeline states missing from the multipliers passed in
+
+# --- 1. Curves ---
+def increase_anchors(increases):
+    """(years, cumulative points) anchors from {end year: points added since the previous anchor}."""
+    years, points = [TARGET_YEAR], [0.0]
+    for year in sorted(increases):
+        years.append(year)
+        points.append(points[-1] + max(0.0, increases[year])) # Negative increases would break monotonicity
+    return np.array(years, dtype=np.float64), np.array(points)
+
+def cumulative_increase(years, increases):
+    """Points added after 2035 by each year: piecewise linear through the anchors, last slope extended."""
+    anchor_years, anchor_points = increase_anchors(increases)
+    years = np.asarray(years, dtype=np.float64)
+    result = np.interp(years, anchor_years, anchor_points)
+    if len(anchor_years) > 1:
+        slope = (anchor_points[-1] - anchor_points[-2]) / (anchor_years[-1] - anchor_years[-2])
+        beyond = years > anchor_years[-1]
+        result[beyond] = anchor_points[-1] + slope * (years[beyond] - anchor_years[-1])
+    return np.where(years > TARGET_YEAR, result, 0.0)
+
+def state_curves(years, p35, multipliers, increases):
+    """(states x years) cumulative P(doom by year) per Timeline state, for per-state 2035 probabilities p35."""
+    years = np.asarray(years, dtype=np.float64)
+    p35 = np.asarray(p35, dtype=np.float64)[:, None]
+    ramp = np.clip((years - START_YEAR) / (TARGET_YEAR - START_YEAR), 0.0, 1.0)
+    later = p35 + np.asarray(multipliers, dtype=np.float64)[:, None] * cumulative_increase(years, increases) / 100.0
+    return np.clip(np.where(years <= TARGET_YEAR, p35 * ramp, later), 0.0, 1.0)
+
+def horizon_curve(years, timeline_probs, p35, multipliers, increases):
+    """P(doom by year) for every year in years: the Timeline-weighted mixture of state_curves."""
+    return np.asarray(timeline_probs) @ state_curves(years, p35, multipliers, increases)
+
+
+# --- 2. Network Queries ---
+def timeline_conditionals(network, evidence=None, mode='forward'):
+    """(P(Timeline | evidence), P(P_doom_2035 high | evidence, Timeline = t) per state), in one batched query."""
+    _, high = bn_cli.high_states(network)
+    _, (timeline_probs,), (outcomes,) = bn_voi.answer_outcomes(network, evidence, [network.index[TIMELINE_NODE]], mode, TARGET_NODE)
+    return timeline_probs, outcomes[:, high].sum(axis=1)
+
+def pdoom_by_year(network, years, evidence, mode, multipliers, increases):
+    """P(doom by year) over a vector of years for one compiled network and one set of answers."""
+    timeline_probs, p35 = timeline_conditionals(network, evidence, mode)
+    states = network.states[network.index[TIMELINE_NODE]]
+    return horizon_curve(years, timeline_probs, p35, [multipliers.get(s, DEFAULT_MULTIPLIER) for s in states], increases)
+
+def parse_years(text):
+    """'2040,2060' or '2025:2100' (inclusive) or a mix -> sorted int array."""
+    years = set()
+    for part in text.split(','):
+        start, sep, stop = part.partition(':')
+        years.update(range(int(start), int(stop) + 1) if sep else [int(start)])
+    return np.array(sorted(years))
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="P(doom by year) over a grid of horizon years.")
+    bn_cli.add_evidence_argument(parser, 'Timeline=Early', 'Answers')
+    parser.add_argument('--years', default='2030,2035,2040,2050,2060,2070,2080,2090,2100', help="e.g. 2040,2060 or 2025:2100")
+    parser.add_argument('--mode', choices=('forward', 'exact'), default='forward')
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+    try:
+        years = parse_years(args.years)
+    except ValueError:
+        parser.error(f"Could not parse --years '{args.years}'.")
+
+    import vanilla_bn
+    networks = bn_cli.compiled_networks(bn_cli.SCENARIOS)
+    curves = {name: pdoom_by_year(network, years, evidence, args.mode, vanilla_bn.TIMELINE_MULTIPLIER, vanilla_bn.HORIZON_INCREASES)
+              for name, network in zip(bn_cli.SCENARIOS, networks)}
+    print(f"\nP(doom by year), mixed over the Timeline distribution ({args.mode} inference):")
+    print(f"  {'year':>6} {'lower':>8} {'central':>8} {'upper':>8}")
+    for k, year in enumerate(years):
+        values = [curves[name][k] * 100 for name in ('optimistic', 'central', 'pessimistic')]
+        print(f"  {year:>6} {min(values):7.1f}% {values[1]:7.1f}% {max(values):7.1f}%")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Precomputed answer-space lookup table for O(1) quiz results.
+
+Every question in vanilla_bn.questions_map maps an answer onto one node state,
+so the reachable evidence space is finite. This module enumerates every
+combination (including skipped questions), evaluates it once with the batched
+forward engine for the central / optimistic / pessimistic CPTs, and stores the
+results as a float32 array addressed by a mixed-radix perfect hash:
+
+    index = sum(code[node] * stride[node]),  code 0 = skipped, 1..r = reachable states
+
+Only question nodes that can influence the stored outputs (ancestors of
+P_doom_2035 and Timeline) are part of the key; answers to the others cannot
+change the forward-pass result and are ignored at lookup time.
+
+Usage: python bn_lookup.py [--workers N] [--output bn_lookup.npz]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+from bn_engine import file_sha256, is_soft_evidence
+
+# --- Configuration ---
+LOOKUP_TABLE_PATH = 'bn_lookup.npz'
+LOOKUP_FORMAT_VERSION = 1
+LOOKUP_CHUNK_ROWS = 65536
+TIMELINE_NODE = 'Timeline'
+
+# --- 1. Answer Space ---
+def build_answer_space(network, questions_map, output_nodes):
+    """
+    Returns the key layout: a list of (node, reachable_states) in network order,
+    restricted to question nodes that are ancestors of output_nodes.
+    """
+    relevant = network.ancestors([network.index[n] for n in output_nodes])
+    reachable = {}
+    for q_data in questions_map.values():
+        if q_data.get('is_prior_belief', False):
+            continue # Q15-style intuition answers are not evidence
+        node = q_data['node']
+        if node not in network.index or network.index[node] not in relevant:
+            continue
+        states = reachable.setdefault(node, set())
+        states.update(state for _, state in q_data['options'].values() if state in network.state_index[network.index[node]])
+    return [(node, [s for s in network.states[network.index[node]] if s in reachable[node]])
+            for node in network.nodes if node in reachable]
+
+def answer_space_strides(layout):
+    """Radix and stride per key node, plus the total number of combinations."""
+    radices = np.array([len(states) + 1 for _, states in layout], dtype=np.int64)
+    strides = np.ones(len(layout), dtype=np.int64)
+    for k in range(1, len(layout)):
+        strides[k] = strides[k - 1] * radices[k - 1]
+    return radices, strides, int(np.prod(radices))
+
+def decode_indices(network, layout, indices):
+    """Turns table indices back into an (N x nodes) evidence index array (-1 = unobserved)."""
+    radices, strides, _ = answer_space_strides(layout)
+    evidence = np.full((len(indices), len(network)), -1, dtype=np.int8)
+    for k, (node, states) in enumerate(layout):
+        code_to_state = np.array([-1] + [network.state_index[network.index[node]][s] for s in states], dtype=np.int8)
+        evidence[:, network.index[node]] = code_to_state[(indices // strides[k]) % radices[k]]
+    return evidence
+
+
+# --- 2. Parallel Build ---
+WORKER_STATE = {}
+
+def init_worker(networks, layout):
+    WORKER_STATE['networks'] = networks
+    WORKER_STATE['layout'] = layout
+
+def evaluate_rows(start, stop, networks=None, layout=None):
+    """Evaluates table rows [start, stop) and returns (start, float32 values)."""
+    networks = networks or WORKER_STATE['networks']
+    layout = layout or WORKER_STATE['layout']
+    central = networks[0]
+    evidence = decode_indices(central, layout, np.arange(start, stop, dtype=np.int64))
+    _, high = bn_cli.high_states(central)
+    pdoom, extra = central.forward_batch(evidence, TARGET_NODE, [TIMELINE_NODE])
+    columns = [pdoom[:, high].sum(axis=1), extra[TIMELINE_NODE]]
+    for network in networks[1:]:
+        columns.append(network.forward_batch(evidence, TARGET_NODE)[0][:, high].sum(axis=1))
+    return start, np.column_stack(columns).astype(np.float32)
+
+def build_lookup_table(networks, questions_map, workers=None, chunk_rows=LOOKUP_CHUNK_ROWS):
+    """
+    Enumerates the full answer space for (central, optimistic, pessimistic)
+    compiled networks across a process pool. Returns (layout, values, columns).
+    """
+    central = networks[0]
+    layout = build_answer_space(central, questions_map, [TARGET_NODE, TIMELINE_NODE])
+    _, _, total = answer_space_strides(layout)
+    columns = (['p_doom_high_vh'] + [f'timeline_{s}' for s in central.states[central.index[TIMELINE_NODE]]]
+               + ['p_doom_high_vh_optimistic', 'p_doom_high_vh_pessimistic'][:len(networks) - 1])
+    values = np.empty((total, len(columns)), dtype=np.float32)
+    ranges = [(start, min(start + chunk_rows, total)) for start in range(0, total, chunk_rows)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for start, stop in ranges:
+            values[start:stop] = evaluate_rows(start, stop, networks, layout)[1]
+    else:
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(networks, layout)) as pool:
+            for start, chunk in pool.starmap(evaluate_rows, ranges):
+                values[start:start + len(chunk)] = chunk
+    return layout, values, columns
+
+
+# --- 3. Versioned Artifact ---
+def save_lookup_table(path, layout, values, columns, cpt_sha256, perturbation_delta):
+    header = {
+        'format_version': LOOKUP_FORMAT_VERSION,
+        'cpt_sha256': cpt_sha256,
+        'perturbation_delta': perturbation_delta,
+        'layout': layout,
+        'columns': columns,
+    }
+    np.savez(path, values=values, header=np.array(json.dumps(header)))
+
+def load_lookup_table(path, cpt_sha256=None, perturbation_delta=None):
+    """
+    Loads a lookup table artifact. Returns None (with a warning) if it is
+    missing, from another format version, or built from different CPTs.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            header = json.loads(str(data['header']))
+            values = data['values']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not read lookup table {path}: {e}", file=sys.stderr)
+        return None
+    if header.get('format_version') != LOOKUP_FORMAT_VERSION:
+        print(f"Warning: Lookup table {path} has format {header.get('format_version')}, expected {LOOKUP_FORMAT_VERSION}. Ignoring.", file=sys.stderr)
+        return None
+    if cpt_sha256 is not None and header.get('cpt_sha256') != cpt_sha256:
+        print(f"Warning: Lookup table {path} was built from different CPTs. Rebuild it.", file=sys.stderr)
+        return None
+    if perturbation_delta is not None and header.get('perturbation_delta') != perturbation_delta:
+        print(f"Warning: Lookup table {path} was built with a different perturbation delta. Rebuild it.", file=sys.stderr)
+        return None
+    return LookupTable(header['layout'], values, header['columns'])
+
+
+class LookupTable:
+    """Loaded answer-space table: evidence dict -> row of precomputed results."""
+
+    def __init__(self, layout, values, columns):
+        self.layout = [(node, list(states)) for node, states in layout]
+        self.values = values
+        self.columns = list(columns)
+        radices, strides, _ = answer_space_strides(self.layout)
+        self.codes = {node: ({s: c + 1 for c, s in enumerate(states)}, int(strides[k])) for k, (node, states) in enumerate(self.layout)}
+
+    def index_of(self, evidence):
+        """Perfect-hash index for an evidence dict, or None if it contains an unreachable state or soft evidence."""
+        index = 0
+        for node, state in evidence.items():
+            if is_soft_evidence(state): # The table holds hard answers only
+                return None
+            if node in self.codes:
+                codes, stride = self.codes[node]
+                if state not in codes:
+                    return None
+                index += codes[state] * stride
+        return index
+
+    def lookup(self, evidence):
+        """Returns {column: value} for the evidence, or None if it is outside the table."""
+        index = self.index_of(evidence)
+        if index is None:
+            return None
+        return dict(zip(self.columns, self.values[index].tolist()))
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the precomputed quiz answer-space lookup table.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument('--output', default=LOOKUP_TABLE_PATH)
+    args = parser.parse_args()
+
+    import vanilla_bn
+    networks = bn_cli.compiled_networks(('central', 'optimistic', 'pessimistic'))
+    cpt_hash = file_sha256(vanilla_bn.CPTS_JSON_PATH)
+    existing = load_lookup_table(args.output, cpt_hash, vanilla_bn.PERTURBATION_DELTA)
+    if existing is not None:
+        print(f"Lookup table {args.output} is up to date (CPT sha256 {cpt_hash[:12]}).")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    layout, values, columns = build_lookup_table(networks, vanilla_bn.questions_map, args.workers)
+    save_lookup_table(args.output, layout, values, columns, cpt_hash, vanilla_bn.PERTURBATION_DELTA)
+    print(f"Wrote {args.output}: {len(values):,} answer combinations x {len(columns)} columns "
+          f"({values.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.1f} s.")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Sampling-based approximate inference for P(doom) networks.
+
+Without evidence this is forward (ancestral) sampling; with evidence it is
+likelihood weighting: evidence nodes are clamped and each sample is weighted
+by P(observed states | sampled parents), times the likelihood of the drawn
+state for soft evidence. Unlike the forward pass, this
+converges to the exact posterior, so evidence on a child also informs its
+ancestors.
+
+Samples are drawn chunk_size at a time by the compiled engine. Running
+estimates and standard errors come from per-chunk sufficient statistics,
+and sampling stops once every queried probability's standard error is below
+target_se (or max_samples is reached). Every chunk uses its own RNG stream
+spawned from one np.random.SeedSequence, so a seed reproduces the same
+estimate and chunks can run in worker processes without sharing a stream.
+
+Usage: python bn_sampling.py [--target-se SE] [--max-samples N] [--chunk N] [--workers W] [--seed S] [Node=State ...]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+import bn_engine
+
+# --- Configuration ---
+DEFAULT_CHUNK = 16384 # Samples per chunk; bounds working memory
+DEFAULT_TARGET_SE = 0.005 # Stop once every queried probability has a standard error below this
+DEFAULT_MAX_SAMPLES = 1000000
+
+# --- 1. Running Estimates ---
+class RunningEstimate:
+    """
+    Weighted marginal estimates for a set of nodes, updated chunk by chunk.
+    Standard errors are those of the self-normalized (ratio) estimator,
+    which reduce to sqrt(p (1 - p) / n) when all weights are one.
+    """
+
+    def __init__(self, network, nodes):
+        self.network = network
+        self.nodes = list(nodes)
+        self.samples = 0
+        self.sum_w = self.sum_w2 = 0.0
+        self.sum_wx = {i: np.zeros(network.cardinality[i]) for i in self.nodes}
+        self.sum_w2x = {i: np.zeros(network.cardinality[i]) for i in self.nodes}
+        self.converged = False
+
+    def update(self, statistics):
+        """Adds one chunk's statistics, as returned by chunk_statistics()."""
+        count, sum_w, sum_w2, sum_wx, sum_w2x = statistics
+        self.samples += count
+        self.sum_w += sum_w
+        self.sum_w2 += sum_w2
+        for i in self.nodes:
+            self.sum_wx[i] += sum_wx[i]
+            self.sum_w2x[i] += sum_w2x[i]
+
+    @property
+    def effective_samples(self):
+        """Kish effective sample size, (sum w)^2 / sum w^2."""
+        return self.sum_w ** 2 / self.sum_w2 if self.sum_w2 > 0 else 0.0
+
+    def marginal(self, i):
+        if self.sum_w <= 0: # No sample is consistent with the evidence (yet)
+            return np.full(self.network.cardinality[i], 1.0 / self.network.cardinality[i])
+        return self.sum_wx[i] / self.sum_w
+
+    def standard_error(self, i):
+        if self.sum_w <= 0:
+            return np.full(self.network.cardinality[i], np.inf)
+        p = self.marginal(i)
+        variance = (self.sum_w2x[i] * (1.0 - 2.0 * p) + p ** 2 * self.sum_w2) / self.sum_w ** 2
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def event_probability(self, i, states):
+        """(p, standard error) of node i being in any of the given state indices."""
+        if self.sum_w <= 0:
+            return len(states) / self.network.cardinality[i], np.inf
+        p = float(self.sum_wx[i][states].sum()) / self.sum_w
+        variance = (float(self.sum_w2x[i][states].sum()) * (1.0 - 2.0 * p) + p ** 2 * self.sum_w2) / self.sum_w ** 2
+        return p, float(np.sqrt(max(variance, 0.0)))
+
+    def max_standard_error(self):
+        return max(float(self.standard_error(i).max()) for i in self.nodes)
+
+    def marginals(self):
+        """Current estimates in the {node: {state: p}} shape the scripts use."""
+        net = self.network
+        return {net.nodes[i]: dict(zip(net.states[i], self.marginal(i).tolist())) for i in self.nodes}
+
+
+# --- 2. Chunked Sampling ---
+def chunk_statistics(network, encoded, nodes, size, seed, likelihoods=None):
+    """Draws one chunk and returns (count, sum w, sum w^2, {node: sum w x}, {node: sum w^2 x})."""
+    samples, weights = network.weighted_sample(size, encoded, np.random.default_rng(seed), likelihoods)
+    squared = weights * weights
+    k = network.cardinality
+    sum_wx = {i: np.bincount(samples[:, i], weights=weights, minlength=k[i]) for i in nodes}
+    sum_w2x = {i: np.bincount(samples[:, i], weights=squared, minlength=k[i]) for i in nodes}
+    return size, float(weights.sum()), float(squared.sum()), sum_wx, sum_w2x
+
+WORKER_STATE = {}
+
+def init_worker(network, encoded, nodes, likelihoods):
+    WORKER_STATE.update(network=network, encoded=encoded, nodes=nodes, likelihoods=likelihoods)
+
+def worker_chunk(size, seed):
+    return chunk_statistics(WORKER_STATE['network'], WORKER_STATE['encoded'], WORKER_STATE['nodes'], size, seed, WORKER_STATE['likelihoods'])
+
+def stream(network, evidence=None, nodes=None, chunk_size=DEFAULT_CHUNK, max_samples=DEFAULT_MAX_SAMPLES, seed=None, workers=1):
+    """
+    Yields the RunningEstimate (updated in place) after each round of chunks:
+    one chunk per round, or one per worker when workers > 1. nodes are
+    names (default: TARGET_NODE).
+    """
+    encoded = network.encode_evidence(evidence)
+    likelihoods = network.encode_likelihoods(evidence)
+    node_ids = [network.index[node] for node in (nodes or [TARGET_NODE])]
+    estimate = RunningEstimate(network, node_ids)
+    root = np.random.SeedSequence(seed)
+    workers = max(1, workers or 1)
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(network, encoded, node_ids, likelihoods)) if workers > 1 else None
+    try:
+        while estimate.samples < max_samples:
+            sizes = []
+            for _ in range(workers):
+                size = min(chunk_size, max_samples - estimate.samples - sum(sizes))
+                if size > 0:
+                    sizes.append(size)
+            seeds = root.spawn(len(sizes)) # Chunk c always gets the c-th child stream
+            if pool is None:
+                parts = [chunk_statistics(network, encoded, node_ids, size, s, likelihoods) for size, s in zip(sizes, seeds)]
+            else:
+                parts = pool.starmap(worker_chunk, zip(sizes, seeds))
+            for part in parts:
+                estimate.update(part)
+            yield estimate
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+def estimate_marginals(network, evidence=None, nodes=None, target_se=DEFAULT_TARGET_SE, max_samples=DEFAULT_MAX_SAMPLES,
+                       chunk_size=DEFAULT_CHUNK, seed=None, workers=1, progress=None):
+    """
+    Samples until every queried probability's standard error is at most
+    target_se, or max_samples are drawn. progress, if given, is called with
+    the RunningEstimate after every round. Returns the RunningEstimate
+    (converged tells which condition stopped it).
+    """
+    estimate = None
+    for estimate in stream(network, evidence, nodes, chunk_size, max_samples, seed, workers):
+        if progress is not None:
+            progress(estimate)
+        if estimate.max_standard_error() <= target_se:
+            estimate.converged = True
+            break
+    if estimate is not None and estimate.sum_w <= 0:
+        print("Warning: No sample was consistent with the evidence. Returning uniform marginals.", file=sys.stderr)
+    return estimate
+
+def sampled_marginals(evidence, parents_map, states_map, cpts, nodes=None, target_se=DEFAULT_TARGET_SE,
+                      max_samples=DEFAULT_MAX_SAMPLES, seed=None, workers=1):
+    """
+    {node: {state: p}} estimates from the PARENTS / STATES / CPT inputs
+    update_all_probabilities_manual takes (default: every node).
+    Raises ValueError if the CPTs cannot be compiled.
+    """
+    network = bn_engine.compile_network(parents_map, states_map, cpts)
+    return estimate_marginals(network, evidence, nodes or list(network.nodes), target_se, max_samples,
+                              seed=seed, workers=workers).marginals()
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Likelihood-weighted sampling estimate of P(doom by 2035).")
+    bn_cli.add_evidence_argument(parser, 'ControlLossRisk=High')
+    parser.add_argument('--target-se', type=float, default=DEFAULT_TARGET_SE, help="Stop once every standard error is below this.")
+    parser.add_argument('--max-samples', type=int, default=DEFAULT_MAX_SAMPLES)
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help="Samples per chunk.")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes.")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+
+    network = bn_cli.central_network()
+    t, high = bn_cli.high_states(network)
+
+    def show(estimate):
+        p, se = estimate.marginal(t), estimate.standard_error(t)
+        print(f"  n = {estimate.samples:>9,}  ESS = {estimate.effective_samples:>11,.0f}  P(High or VeryHigh) = {p[high].sum() * 100:5.2f}%  max SE = {se.max() * 100:.3f}%")
+
+    print(f"\nSampling {TARGET_NODE} (target SE {args.target_se * 100:g}% points):")
+    start = time.perf_counter()
+    result = estimate_marginals(network, evidence, [TARGET_NODE], args.target_se, args.max_samples, args.chunk, args.seed, args.workers, show)
+    elapsed = time.perf_counter() - start
+    print(f"{'Converged' if result.converged else 'Stopped at --max-samples'} after {result.samples:,} samples ({elapsed * 1000:.0f} ms).")
+    import bn_exact
+    exact = bn_exact.junction_tree_for(network).query(evidence, [t])[t]
+    print(f"Exact posterior (junction tree): {exact[high].sum() * 100:.2f}%")
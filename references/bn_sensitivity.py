@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+CPT sensitivity analysis for the P(doom) network.
+
+gradients() differentiates P(P_doom_2035 = High or VeryHigh), as computed by
+the compiled forward pass, with respect to every CPT entry in one reverse
+sweep: the forward pass is run once, then adjoints are pushed from the
+target back through each node's contraction to its CPT and its parents.
+Entries are treated as free parameters (rows are not renormalized), so the
+effect of moving mass from state a to state b within a row is
+gradient[b] - gradient[a].
+
+Noisy-MAX nodes are differentiated in factorized form, with respect to
+their leak and link rows.
+
+sensitivity_sweep() is the one-at-a-time counterpart: it applies the
+optimistic / pessimistic shift vanilla_bn.py uses for P_doom_2035 to each
+node in turn (or to each (node, parent row) pair), evaluates every variant
+for one or many evidence sets across a process pool, and ranks them by
+swing in P_doom for a tornado chart. Variants share all unchanged tables
+with the base network (CompiledNetwork.with_tables); only the shifted CPT is
+copied.
+
+Usage: python bn_sensitivity.py [--top N] [--centered] [--output FILE] [Node=State ...]
+       python bn_sensitivity.py --tornado [--per-row] [--delta D] [--workers W] [--batch answers.json] [--output FILE] [Node=State ...]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import numpy as np
+import bn_cli
+from bn_cli import HIGH_RISK_STATES, TARGET_NODE
+import bn_engine
+
+# --- Configuration ---
+KEY_DELIMITER = '|' # Parent-row labels match the bn_cpts.json keys
+DEFAULT_TOP = 25
+DEFAULT_DELTA = 0.10 # Total mass moved per CPT row, as vanilla_bn.PERTURBATION_DELTA
+GRADIENT_DTYPE = np.dtype([('node', 'U32'), ('row', 'U128'), ('state', 'U16'), ('value', 'f8'), ('gradient', 'f8')])
+TORNADO_DTYPE = np.dtype([('node', 'U32'), ('row', 'U128'), ('optimistic', 'f8'), ('pessimistic', 'f8'), ('swing', 'f8')])
+
+# --- 1. Reverse-Mode Gradients ---
+def einsum_operands(vectors, skip=None):
+    """Interleaves vectors with their axis labels (0, 1, ...) for np.einsum's sublist form, leaving out index skip."""
+    operands = []
+    for axis, vector in enumerate(vectors):
+        if axis != skip:
+            operands += [vector, [axis]]
+    return operands
+
+def table_backward(table, parent_marginals, adjoint):
+    """Adjoints of a dense (parents..., node) table and of each parent marginal for an output adjoint."""
+    k = len(parent_marginals)
+    table_grad = np.einsum(*einsum_operands(parent_marginals), adjoint, [k], list(range(k + 1)))
+    parent_grads = [np.einsum(table, list(range(k + 1)), *einsum_operands(parent_marginals, skip=j), adjoint, [k], [j])
+                    for j in range(k)]
+    return table_grad, parent_grads
+
+def noisy_max_backward(cpt, parent_marginals, adjoint):
+    """Adjoints of a NoisyMaxCPT's leak and link rows and of each parent marginal."""
+    contributions = [m @ link_cdf for m, link_cdf in zip(parent_marginals, cpt.link_cdfs)]
+    cdf_adjoint = adjoint.copy() # pmf = diff(cdf), so d/d cdf[s] = adjoint[s] - adjoint[s + 1]
+    cdf_adjoint[:-1] -= adjoint[1:]
+    before = [np.ones_like(cpt.leak_cdf)] # Products of the contributions before / after each parent (no division by zero)
+    for u in contributions[:-1]:
+        before.append(before[-1] * u)
+    after = np.ones_like(cpt.leak_cdf)
+    link_grads, parent_grads = [None] * len(contributions), [None] * len(contributions)
+    for j in reversed(range(len(contributions))):
+        u_adjoint = cdf_adjoint * cpt.leak_cdf * before[j] * after
+        link_grads[j] = np.cumsum(np.outer(parent_marginals[j], u_adjoint)[:, ::-1], axis=1)[:, ::-1] # cdf = cumsum(pmf)
+        parent_grads[j] = cpt.link_cdfs[j] @ u_adjoint
+        after = after * contributions[j]
+    leak_grad = np.cumsum((cdf_adjoint * before[-1] * contributions[-1] if contributions else cdf_adjoint)[::-1])[::-1]
+    return (leak_grad, link_grads), parent_grads
+
+def zero_gradient(table):
+    if isinstance(table, bn_engine.NoisyMaxCPT):
+        return (np.zeros_like(table.leak), [np.zeros_like(link) for link in table.links])
+    return np.zeros(table.shape)
+
+def gradients(network, evidence=None, target=TARGET_NODE, target_states=HIGH_RISK_STATES):
+    """
+    Returns (probability, grads): P(target in target_states) from the forward
+    pass and, per node (network.nodes order), its gradient. Gradients have the
+    table's (parents..., node) shape, or are (leak, [link per parent]) for
+    noisy-MAX nodes. Evidence nodes are clamped, so their CPTs get zero gradient.
+    """
+    encoded = network.encode_evidence(evidence)
+    marginals = [None] * len(network)
+    for i in range(len(network)):
+        marginals[i] = network.node_marginal(i, marginals, encoded)
+    t = network.index[target]
+    high = [network.state_index[t][s] for s in target_states if s in network.state_index[t]]
+    adjoints = [None] * len(network)
+    adjoints[t] = np.zeros(network.cardinality[t])
+    adjoints[t][high] = 1.0
+    grads = [zero_gradient(table) for table in network.tables]
+    for i in reversed(range(len(network))): # Index order is topological: every child is done before its parents
+        adjoint = adjoints[i]
+        if adjoint is None or i in encoded:
+            continue
+        table = network.tables[i]
+        parent_marginals = [marginals[p] for p in network.parents[i]]
+        if isinstance(table, bn_engine.NoisyMaxCPT):
+            grads[i], parent_grads = noisy_max_backward(table, parent_marginals, adjoint)
+        else:
+            if not network.rows_complete[i]: # Back through normalize_vector
+                raw = table
+                for m, shape in zip(parent_marginals, network.contraction_shapes[i]):
+                    raw = m @ raw.reshape(shape)
+                total = raw.sum()
+                adjoint = (adjoint - adjoint @ marginals[i]) / total if total > 0 else np.zeros_like(adjoint)
+            grads[i], parent_grads = table_backward(table, parent_marginals, adjoint)
+        for p, parent_grad in zip(network.parents[i], parent_grads):
+            adjoints[p] = parent_grad if adjoints[p] is None else adjoints[p] + parent_grad
+    return float(marginals[t][high].sum()), grads
+
+
+# --- 2. CPT Rows ---
+def row_labels(network, i):
+    """Labels of node i's CPT rows: bn_cpts.json parent keys ('' for roots), or 'leak' and 'link:Parent=state' for noisy-MAX."""
+    if isinstance(network.tables[i], bn_engine.NoisyMaxCPT):
+        return ['leak'] + [f"link:{network.nodes[p]}={s}" for p in network.parents[i] for s in network.states[p]]
+    parent_states = [network.states[p] for p in network.parents[i]]
+    return [KEY_DELIMITER.join(s[x] for s, x in zip(parent_states, combo)) for combo in np.ndindex(*map(len, parent_states))]
+
+def flat_rows(table, values):
+    """Rows of a CPT-shaped array: values.reshape(-1, states), or leak + link rows when values is a noisy-MAX (leak, links) pair."""
+    if isinstance(table, bn_engine.NoisyMaxCPT):
+        leak, links = values
+        return [leak] + [row for link in links for row in link]
+    return list(values.reshape(-1, values.shape[-1]))
+
+def table_rows(table):
+    return flat_rows(table, (table.leak, table.links) if isinstance(table, bn_engine.NoisyMaxCPT) else table)
+
+def table_from_rows(table, rows):
+    """Inverse of table_rows: a new CPT of table's kind and shape built from replacement rows."""
+    if isinstance(table, bn_engine.NoisyMaxCPT):
+        links, start = [], 1
+        for link in table.links:
+            links.append(np.array(rows[start:start + len(link)]))
+            start += len(link)
+        return bn_engine.NoisyMaxCPT(rows[0], links)
+    return np.array(rows).reshape(table.shape)
+
+
+# --- 3. Reports ---
+def gradient_array(network, grads):
+    """Flattens gradients into a structured array (node, row, state, value, gradient), one record per CPT entry."""
+    records = []
+    for i, (table, grad) in enumerate(zip(network.tables, grads)):
+        node, states = network.nodes[i], network.states[i]
+        for label, values, row_grad in zip(row_labels(network, i), table_rows(table), flat_rows(table, grad)):
+            records += [(node, label, state, value, g) for state, value, g in zip(states, values, row_grad)]
+    return np.array(records, dtype=GRADIENT_DTYPE)
+
+def row_centered(array):
+    """
+    Copy of array with each CPT row's mean gradient subtracted: the
+    derivative along mass-preserving shifts within the row, which drops the
+    common "scale the whole row" component that dominates raw partials.
+    """
+    centered = array.copy()
+    keys = np.char.add(np.char.add(array['node'], '/'), array['row'])
+    _, rows = np.unique(keys, return_inverse=True)
+    means = np.bincount(rows, weights=array['gradient']) / np.bincount(rows)
+    centered['gradient'] -= means[rows]
+    return centered
+
+def print_report(probability, array, top=DEFAULT_TOP):
+    """Prints the top CPT entries by |gradient|."""
+    order = np.argsort(-np.abs(array['gradient']), kind='stable')
+    print(f"\nP({TARGET_NODE} = High or VeryHigh) = {probability * 100:.1f}%")
+    print(f"Top {min(top, len(order))} of {len(order)} CPT entries by |dP/dtheta|:")
+    for record in array[order[:top]]:
+        row = f" [{record['row']}]" if record['row'] else ""
+        print(f"  {record['gradient']:+9.4f}  {record['node']}{row} -> {record['state']} (theta = {record['value']:.3f})")
+
+def save_array(path, array):
+    """Writes a structured result array as .npy, or as CSV when path ends in .csv."""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(array.dtype.names)
+            writer.writerows(array.tolist())
+    else:
+        np.save(path, array)
+
+
+# --- 4. One-at-a-Time Sweep ---
+def shift_row(row, risky, delta, pessimistic=True):
+    """
+    Moves up to delta of probability mass onto the risky states
+    (pessimistic) or off them (optimistic). Each source state gives up
+    delta / n of its mass (clipped at zero) and the total is spread evenly
+    over the receiving states, as perturb_distribution does for P_doom_2035.
+    """
+    sources, targets = (~risky, risky) if pessimistic else (risky, ~risky)
+    if not sources.any() or not targets.any():
+        return row
+    shifted = np.array(row, dtype=np.float64)
+    taken = np.minimum(shifted[sources], delta / sources.sum())
+    shifted[sources] -= taken
+    shifted[targets] += taken.sum() / targets.sum()
+    return shifted
+
+def risky_states(network, target=TARGET_NODE, target_states=HIGH_RISK_STATES):
+    """
+    Per node, per CPT row: boolean mask of the states whose extra mass raises
+    P(target in target_states), i.e. a positive row-centred prior gradient.
+    For P_doom_2035 itself these are exactly High and VeryHigh.
+    """
+    _, grads = gradients(network, None, target, target_states)
+    return [[row - row.mean() > 1e-12 for row in flat_rows(table, grad)] for table, grad in zip(network.tables, grads)]
+
+def sweep_variants(network, masks, per_row=False):
+    """(node index, row index or None) for every node (whole CPT) or every (node, row) pair whose shift can change the target."""
+    variants = []
+    for i, node_masks in enumerate(masks):
+        rows = [r for r, risky in enumerate(node_masks) if risky.any()]
+        if rows:
+            variants += [(i, r) for r in rows] if per_row else [(i, None)]
+    return variants
+
+def variant_network(network, masks, variant, delta, pessimistic):
+    """network with one node's CPT (variant = (i, None)) or one CPT row (variant = (i, row)) shifted."""
+    i, only = variant
+    table = network.tables[i]
+    rows = [shift_row(row, masks[i][r], delta, pessimistic) if only is None or r == only else row
+            for r, row in enumerate(table_rows(table))]
+    return network.with_tables({i: table_from_rows(table, rows)})
+
+WORKER_STATE = {}
+
+def init_worker(state):
+    """Stores the sweep state dict (network, masks, evidence, delta, target, target_states) for evaluate_variants."""
+    WORKER_STATE.update(state)
+
+def evaluate_variants(variants, state=None):
+    """(len(variants) x 2 x N) P(target high) for the optimistic and pessimistic version of each variant."""
+    state = state or WORKER_STATE
+    network = state['network']
+    t = network.index[state['target']]
+    high = [network.state_index[t][s] for s in state['target_states'] if s in network.state_index[t]]
+    values = np.empty((len(variants), 2, len(state['evidence'])))
+    for k, variant in enumerate(variants):
+        for side, pessimistic in enumerate((False, True)):
+            shifted = variant_network(network, state['masks'], variant, state['delta'], pessimistic)
+            values[k, side] = shifted.forward_batch(state['evidence'], state['target'])[0][:, high].sum(axis=1)
+    return values
+
+def sensitivity_sweep(network, evidence=None, per_row=False, delta=DEFAULT_DELTA, workers=1,
+                      target=TARGET_NODE, target_states=HIGH_RISK_STATES):
+    """
+    One-at-a-time sensitivity sweep. evidence is one {node: state} dict or a
+    list of them. Returns (base, tornado, values): base is the (N,) central
+    P(target high) per evidence set, tornado a TORNADO_DTYPE array (means over
+    the evidence sets) sorted by swing, largest first, and values the raw
+    (variants x 2 x N) optimistic / pessimistic results in tornado order.
+    """
+    evidence_list = evidence if isinstance(evidence, (list, tuple)) else [evidence or {}]
+    encoded = network.encode_evidence_batch(evidence_list)
+    masks = risky_states(network, target, target_states)
+    variants = sweep_variants(network, masks, per_row)
+    state = dict(network=network, masks=masks, evidence=encoded, delta=delta, target=target, target_states=target_states)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(variants)))
+    if workers == 1:
+        values = evaluate_variants(variants, state)
+    else: # Forked workers inherit the network copy-on-write; each builds its own shallow variants
+        chunks = [variants[k::workers] for k in range(workers)]
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(state,)) as pool:
+            parts = pool.map(evaluate_variants, chunks)
+        values = np.empty((len(variants), 2, len(encoded)))
+        for k, part in enumerate(parts):
+            values[k::workers] = part
+    t = network.index[target]
+    high = [network.state_index[t][s] for s in target_states if s in network.state_index[t]]
+    base = network.forward_batch(encoded, target)[0][:, high].sum(axis=1)
+    labels = [row_labels(network, i) for i in range(len(network))]
+    tornado = np.array([(network.nodes[i], '' if r is None else labels[i][r], v[0].mean(), v[1].mean(), (v[1] - v[0]).mean())
+                        for (i, r), v in zip(variants, values)], dtype=TORNADO_DTYPE)
+    order = np.argsort(-tornado['swing'], kind='stable')
+    return base, tornado[order], values[order]
+
+def print_tornado(base, tornado, delta, top=DEFAULT_TOP):
+    """Prints tornado rows: P_doom with each CPT shifted optimistically / pessimistically."""
+    print(f"\nP({TARGET_NODE} = High or VeryHigh) = {base.mean() * 100:.1f}% (mean over {len(base)} evidence set(s))")
+    print(f"One-at-a-time shift of {delta * 100:.0f}% points, top {min(top, len(tornado))} of {len(tornado)} by swing:")
+    for record in tornado[:top]:
+        label = record['node'] + (f" [{record['row']}]" if record['row'] else "")
+        print(f"  {label:<45} {record['optimistic'] * 100:5.1f}% .. {record['pessimistic'] * 100:5.1f}%  (swing {record['swing'] * 100:4.1f} pts)")
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gradients and one-at-a-time sensitivity of P(doom by 2035) to the CPTs.")
+    bn_cli.add_evidence_argument(parser, 'Timeline=Early')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Entries to print.")
+    parser.add_argument('--centered', action='store_true', help="Report row-centred gradients (mass-preserving shifts).")
+    parser.add_argument('--tornado', action='store_true', help="Run the one-at-a-time sweep instead of gradients.")
+    parser.add_argument('--per-row', action='store_true', help="Sweep (node, parent row) pairs instead of whole nodes.")
+    parser.add_argument('--delta', type=float, default=DEFAULT_DELTA, help="Mass shifted per CPT row in the sweep.")
+    parser.add_argument('--workers', type=int, default=None, help="Sweep worker processes (default: all cores).")
+    parser.add_argument('--batch', help="JSON file with a list of {node: state} evidence sets for the sweep.")
+    parser.add_argument('--output', help="Write all results to a .npy (structured array) or .csv file.")
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+    if args.batch:
+        try:
+            with open(args.batch, 'r', encoding='utf-8') as f:
+                evidence = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error: Could not read evidence batch {args.batch}: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not isinstance(evidence, list) or not all(isinstance(e, dict) for e in evidence):
+            print(f"Error: {args.batch} must hold a JSON list of {{node: state}} objects.", file=sys.stderr)
+            sys.exit(1)
+
+    network = bn_cli.central_network()
+    if args.tornado:
+        base, array, _ = sensitivity_sweep(network, evidence, args.per_row, args.delta, args.workers)
+        print_tornado(base, array, args.delta, args.top)
+    else:
+        if isinstance(evidence, list):
+            parser.error("--batch is only supported with --tornado.")
+        probability, grads = gradients(network, evidence)
+        array = gradient_array(network, grads)
+        if args.centered:
+            array = row_centered(array)
+        print_report(probability, array, args.top)
+    if args.output:
+        try:
+            save_array(args.output, array)
+            print(f"\nWrote {len(array)} records to {args.output}")
+        except OSError as e:
+            print(f"Error: Could not write {args.output}: {e}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Value-of-information question ordering for the P(doom) quiz.
+
+For every unanswered question, the expected reduction in uncertainty about
+P_doom_2035 from hearing its answer, given the answers so far:
+
+    VOI(q) = U(P_doom | e) - sum_s P(node_q = s | e) * U(P_doom | e, node_q = s)
+
+where U is the entropy of the P_doom_2035 distribution (bits) or the
+variance of the High-or-VeryHigh indicator. All (question, answer) pairs are
+scored in one batched pass: one forward_batch call in forward mode, or one
+batched junction-tree calibration in exact mode. next_best_question() is the
+quiz-facing API.
+
+Usage: python bn_voi.py [--criterion entropy|variance] [--mode forward|exact] [Node=State ...]
+"""
+
+import argparse
+import numpy as np
+import bn_cli
+from bn_cli import TARGET_NODE
+import bn_exact
+
+# --- Configuration ---
+CRITERIA = ('entropy', 'variance')
+
+# --- 1. Uncertainty Measures ---
+def entropy(dist):
+    """Shannon entropy in bits along the last axis."""
+    dist = np.asarray(dist)
+    logs = np.log2(np.where(dist > 0, dist, 1.0))
+    return -(dist * logs).sum(axis=-1)
+
+def high_risk_variance(dist, high):
+    """Variance of the 'P_doom is High or VeryHigh' indicator, p * (1 - p), along the last axis."""
+    p = np.asarray(dist)[..., high].sum(axis=-1)
+    return p * (1.0 - p)
+
+
+# --- 2. Batched Answer Outcomes ---
+def candidate_questions(network, questions_map, evidence, asked=()):
+    """(qid, node index) for questions whose node is in the network and not yet observed (prior-belief questions excluded)."""
+    candidates = []
+    for qid, q_data in questions_map.items():
+        node = q_data.get('node')
+        if qid in asked or q_data.get('is_prior_belief', False) or node in (evidence or {}) or node not in network.index:
+            continue
+        candidates.append((qid, network.index[node]))
+    return candidates
+
+def answer_outcomes(network, evidence, nodes, mode='forward', target=TARGET_NODE):
+    """
+    For the current evidence and each candidate node index, returns
+    (current, answer_probs, outcomes): the current target distribution, the
+    per-node answer distributions, and one (states x target states) array per
+    node of target distributions after each possible answer.
+    """
+    t = network.index[target]
+    sizes = [int(network.cardinality[i]) for i in nodes]
+    offsets = np.cumsum([0] + sizes)
+    if mode == 'forward':
+        marginals = network.forward(evidence)
+        current, answer_probs = marginals[t], [marginals[i] for i in nodes]
+        rows = np.repeat(network.encode_evidence_batch([evidence or {}]), offsets[-1], axis=0)
+        for k, i in enumerate(nodes):
+            rows[offsets[k]:offsets[k + 1], i] = np.arange(sizes[k])
+        target_rows = network.forward_batch(rows, target, likelihoods=network.encode_likelihoods(evidence))[0]
+    elif mode == 'exact':
+        tree = bn_exact.junction_tree_for(network)
+        posterior = tree.query(evidence, sorted(set(nodes) | {t}))
+        current, answer_probs = posterior[t], [posterior[i] for i in nodes]
+        vectors = tree.evidence_vectors(evidence)
+        for k, i in enumerate(nodes): # Row r clamps one candidate to one state; every other candidate gets a vector of ones
+            batch = np.ones((offsets[-1], sizes[k]))
+            batch[offsets[k]:offsets[k + 1]] = network.one_hot[i]
+            vectors[i] = batch
+        potentials = tree.absorb(vectors)
+        messages = tree.messages(potentials, {tree.structure.home[t]})
+        unnormalized = tree.unnormalized_marginals([t], potentials, messages)[t]
+        totals = unnormalized.sum(axis=-1, keepdims=True)
+        target_rows = unnormalized / np.where(totals > 0, totals, 1.0) # Impossible answers have zero weight below
+    else:
+        raise ValueError(f"Unknown inference mode '{mode}'.")
+    return current, answer_probs, [target_rows[offsets[k]:offsets[k + 1]] for k in range(len(nodes))]
+
+
+# --- 3. Question Ranking ---
+def question_values(network, questions_map, evidence=None, criterion='entropy', mode='forward', asked=(), target=TARGET_NODE):
+    """Expected uncertainty reduction for every candidate question, as [(qid, value)] sorted best first."""
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown VOI criterion '{criterion}'. Expected one of {CRITERIA}.")
+    candidates = candidate_questions(network, questions_map, evidence, asked)
+    if not candidates:
+        return []
+    t, high = bn_cli.high_states(network, target)
+    measure = entropy if criterion == 'entropy' else lambda dist: high_risk_variance(dist, high)
+    current, answer_probs, outcomes = answer_outcomes(network, evidence, [i for _, i in candidates], mode, target)
+    before = float(measure(current))
+    values = [(qid, before - float(probs @ measure(after))) for (qid, _), probs, after in zip(candidates, answer_probs, outcomes)]
+    return sorted(values, key=lambda item: -item[1])
+
+def next_best_question(network, questions_map, evidence=None, criterion='entropy', mode='forward', asked=(), target=TARGET_NODE):
+    """Returns (qid, expected reduction) of the most informative unanswered question, or (None, 0.0) if none is left."""
+    values = question_values(network, questions_map, evidence, criterion, mode, asked, target)
+    return values[0] if values else (None, 0.0)
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank quiz questions by expected information about P(doom by 2035).")
+    bn_cli.add_evidence_argument(parser, 'Timeline=Early', 'Answers so far')
+    parser.add_argument('--criterion', choices=CRITERIA, default='entropy')
+    parser.add_argument('--mode', choices=('forward', 'exact'), default='forward')
+    args = parser.parse_args()
+    evidence = bn_cli.parse_evidence(parser, args.evidence)
+
+    import vanilla_bn
+    network = bn_cli.central_network()
+    unit = 'bits' if args.criterion == 'entropy' else 'variance'
+    print(f"\nExpected reduction in P_doom_2035 {args.criterion} ({args.mode} inference):")
+    for qid, value in question_values(network, vanilla_bn.questions_map, evidence, args.criterion, args.mode):
+        print(f"  {qid:<12} {vanilla_bn.questions_map[qid]['node']:<22} {value:8.4f} {unit}")
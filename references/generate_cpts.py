@@ -3,9 +3,11 @@
 import json
 import os
 import sys
+import bn_engine
 
 # --- Configuration ---
 OUTPUT_JSON_PATH = 'bn_cpts.json'
+OUTPUT_COMPILED_PATH = 'bn_cpts.bnc' # Memory-mappable tensors compiled from the JSON (see bn_engine.py)
 KEY_DELIMITER = '|' # Delimiter for joining parent states in JSON keys
 
 # --- Network Structure (Needed to identify priors vs conditionals) ---
@@ -45,6 +47,17 @@ STATES = {
 # --- SOURCE CPT Data ---
 # This dictionary holds the probability tables before JSON export.
 # Modifications are primarily focused on P_doom_2035 based on feedback.
+#
+# A conditional node may instead use a parametric CPT, whose size grows linearly
+# with the number of parents. Noisy-MAX: each parent state contributes a child
+# level drawn from its link distribution, the leak adds one more, and the child
+# takes the highest level (child states ordered least to most severe, as in STATES):
+#   CPTS_SOURCE['ControlLossRisk'] = {
+#       'type': 'noisy_max',
+#       'leak': {'Low': 0.8, 'Med': 0.15, 'High': 0.05},
+#       'links': {'Timeline': {'Early': {'Low': 0.3, 'Med': 0.3, 'High': 0.4}, 'Mid': {...}, 'Late': {...}},
+#                 'MisusePotential': {...}, 'DeceptionRisk': {...}},
+#   }
 CPTS_SOURCE = {}
 
 # Priors (Unchanged)
@@ -164,8 +177,21 @@ def validate_distribution(dist, context_msg):
         return False
     return True
 
+def validate_parametric_cpt(node_name, spec, parent_nodes, states_map):
+    """Checks a parametric CPT spec (e.g. noisy-MAX) for structure and per-distribution sums."""
+    try:
+        bn_engine.parametric_cpt_from_dict(node_name, spec, parent_nodes, states_map)
+    except ValueError as e:
+        print(f"  Error: {e}", file=sys.stderr)
+        return False
+    valid = validate_distribution(spec['leak'], f"noisy_max leak of '{node_name}'") if 'leak' in spec else True
+    for p_node in parent_nodes:
+        for p_state, dist in spec['links'][p_node].items():
+            valid = validate_distribution(dist, f"noisy_max link '{p_node}'={p_state} -> '{node_name}'") and valid
+    return valid
+
 # --- Main Generation Logic ---
-def generate_json_cpts(source_cpts, parents_map, output_path, delimiter):
+def generate_json_cpts(source_cpts, parents_map, output_path, delimiter, states_map=STATES):
     """Converts the Python CPT dict to a JSON-compatible format and saves it."""
     cpts_for_json = {}
     validation_passed = True
@@ -217,6 +243,16 @@ def generate_json_cpts(source_cpts, parents_map, output_path, delimiter):
                 validation_passed = False
                 continue # Skip processing this malformed node CPT
 
+            if bn_engine.is_parametric(cpt_data):
+                # --- Parametric Node (written as-is; loaders compile it in factorized form) ---
+                if not validate_parametric_cpt(node_name, cpt_data, parent_nodes, states_map):
+                    validation_passed = False
+                    print(f"    -> Added parametric '{node_name}' ({cpt_data['type']}) to JSON despite validation warning.")
+                else:
+                    print(f"    -> Added parametric '{node_name}' ({cpt_data['type']}) to JSON.")
+                cpts_for_json[node_name] = cpt_data
+                continue
+
             for parent_states_tuple, child_distribution in cpt_data.items():
                 # Ensure the key is actually a tuple (as defined in the source)
                 if not isinstance(parent_states_tuple, tuple):
@@ -287,6 +323,40 @@ def generate_json_cpts(source_cpts, parents_map, output_path, delimiter):
     else:
         print("\nAll basic CPT definition and validation checks passed.")
 
+# --- Compiled Binary Artifact ---
+def generate_compiled_cpts(json_path, parents_map, states_map, output_path, delimiter):
+    """
+    Compiles the written JSON into the binary tensor artifact. The JSON stays the
+    editable source; the artifact is only rebuilt when the JSON's SHA-256 (or the
+    network structure) changes.
+    """
+    try:
+        order = bn_engine.topological_order(parents_map)
+        source_sha256 = bn_engine.file_sha256(json_path)
+        existing = bn_engine.load_compiled(output_path, source_sha256)
+        if existing is not None and existing.matches_structure(parents_map, states_map, order):
+            print(f"\nCompiled artifact {output_path} is up to date (JSON sha256 {source_sha256[:12]}).")
+            return True
+        print(f"\nCompiling {json_path} into {output_path}...")
+        with open(json_path, 'r', encoding='utf-8') as f:
+            raw_cpts = json.load(f)
+        cpts = {}
+        for node_name, node_data in raw_cpts.items():
+            if node_name not in parents_map:
+                continue
+            if parents_map[node_name] and not bn_engine.is_parametric(node_data):
+                cpts[node_name] = {tuple(key.split(delimiter)): dist for key, dist in node_data.items()}
+            else:
+                cpts[node_name] = node_data
+        network = bn_engine.compile_network(parents_map, states_map, cpts, order)
+        bn_engine.save_compiled(output_path, network, source_sha256)
+    except (OSError, ValueError, AttributeError) as e: # ValueError includes cycles in parents_map
+        print(f"Error compiling CPT artifact {output_path}: {e}", file=sys.stderr)
+        return False
+    print(f"Successfully wrote compiled artifact ({os.path.getsize(output_path)} bytes).")
+    return True
+
 # --- Run the generator ---
 if __name__ == "__main__":
-    generate_json_cpts(CPTS_SOURCE, PARENTS, OUTPUT_JSON_PATH, KEY_DELIMITER)
\ No newline at end of file
+    generate_json_cpts(CPTS_SOURCE, PARENTS, OUTPUT_JSON_PATH, KEY_DELIMITER)
+    generate_compiled_cpts(OUTPUT_JSON_PATH, PARENTS, STATES, OUTPUT_COMPILED_PATH, KEY_DELIMITER)
\ No newline at end of file
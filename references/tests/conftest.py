@@ -0,0 +1,37 @@
+"""Shared fixtures: the scripts in references/ are flat modules, so their directory goes on sys.path."""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def vanilla():
+    import vanilla_bn
+    return vanilla_bn
+
+@pytest.fixture(scope='session')
+def network(vanilla):
+    """The compiled network for bn_cpts.json."""
+    network = vanilla.get_compiled_network(vanilla.MODEL.central)
+    assert network is not None
+    return network
+
+@pytest.fixture
+def high(network):
+    """(target index, state indices of P_doom_2035 = High or VeryHigh)."""
+    t = network.index['P_doom_2035']
+    return t, [network.state_index[t][s] for s in ('High', 'VeryHigh')]
+
+@pytest.fixture(scope='session')
+def evidence_sets(network):
+    """No evidence plus 20 seeded random hard-evidence sets over 1-4 nodes."""
+    rng = np.random.default_rng(0)
+    sets = [{}]
+    for _ in range(20):
+        nodes = rng.choice(len(network), size=rng.integers(1, 5), replace=False)
+        sets.append({network.nodes[i]: network.states[i][rng.integers(len(network.states[i]))] for i in nodes})
+    return sets
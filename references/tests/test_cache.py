@@ -0,0 +1,65 @@
+import bn_cache
+import bn_engine
+
+
+def counting(result):
+    """compute() stand-in that records how often it runs."""
+    calls = []
+    def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+def test_hit_after_miss_returns_a_copy():
+    cache = bn_cache.ResultCache(8)
+    compute, calls = counting({'A': {'x': 0.5, 'y': 0.5}})
+    cpts = {'A': {'x': 0.5, 'y': 0.5}}
+    first = bn_cache.cached_query(cache, cpts, 'forward', {'B': 'y'}, compute)
+    first['A']['x'] = 1.0
+    second = bn_cache.cached_query(cache, cpts, 'forward', {'B': 'y'}, compute)
+    assert len(calls) == 1 and second['A']['x'] == 0.5
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_evidence_order_does_not_matter():
+    cache = bn_cache.ResultCache(8)
+    compute, calls = counting({'A': {'x': 1.0}})
+    cpts = {'A': {'x': 1.0}}
+    bn_cache.cached_query(cache, cpts, 'forward', {'B': 'y', 'C': {'u': 0.2, 'v': 0.8}}, compute)
+    bn_cache.cached_query(cache, cpts, 'forward', {'C': {'v': 0.8, 'u': 0.2}, 'B': 'y'}, compute)
+    assert len(calls) == 1
+
+def test_changed_cpts_mode_or_settings_miss():
+    cache = bn_cache.ResultCache(8)
+    compute, calls = counting({'A': {'x': 1.0}})
+    bn_cache.cached_query(cache, {'A': {'x': 1.0}}, 'sampling', {}, compute, (0.005, 1000, 0))
+    bn_cache.cached_query(cache, {'A': {'x': 0.9}}, 'sampling', {}, compute, (0.005, 1000, 0)) # New CPT content
+    bn_cache.cached_query(cache, {'A': {'x': 1.0}}, 'exact', {}, compute)
+    bn_cache.cached_query(cache, {'A': {'x': 1.0}}, 'sampling', {}, compute, (0.001, 1000, 0)) # Tighter target SE
+    bn_cache.cached_query(cache, {'A': {'x': 1.0}}, 'sampling', {}, compute, (0.005, 1000, 1)) # Other seed
+    assert len(calls) == 5
+
+def test_memory_tier_is_lru_bounded():
+    cache = bn_cache.ResultCache(2)
+    for k in range(3):
+        cache.put(cache.make_key('f', 'forward', {'A': str(k)}), {'A': {'x': k}})
+    assert cache.get(cache.make_key('f', 'forward', {'A': '0'})) is None
+    assert cache.stats()['evictions'] == 1
+
+def test_disk_tier_survives_restart_and_is_bounded(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = bn_cache.ResultCache(8, path, disk_max_entries=3)
+    keys = [cache.make_key('f', 'forward', {'A': str(k)}) for k in range(4)]
+    for k, key in enumerate(keys[:3]):
+        cache.put(key, {'A': {'x': float(k)}})
+    reopened = bn_cache.ResultCache(8, path, disk_max_entries=3)
+    assert reopened.get(keys[0]) == {'A': {'x': 0.0}} # Disk hit; now the most recently used row
+    reopened.put(keys[3], {'A': {'x': 3.0}})
+    fresh = bn_cache.ResultCache(8, path, disk_max_entries=3)
+    assert fresh.get(keys[1]) is None # Least recently used row was deleted
+    assert fresh.get(keys[0]) is not None and fresh.get(keys[3]) is not None
+
+def test_fingerprint_follows_content_not_identity():
+    a, b = {'A': {'x': 0.25, 'y': 0.75}}, {'A': {'x': 0.25, 'y': 0.75}}
+    assert bn_cache.fingerprint_for(a) == bn_cache.fingerprint_for(b)
+    layered = bn_engine.LayeredCPTs(a, {'A': {'x': 0.5, 'y': 0.5}})
+    assert bn_cache.fingerprint_for(layered) != bn_cache.fingerprint_for(a)
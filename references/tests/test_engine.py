@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+
+def test_forward_matches_reference(vanilla, network, evidence_sets):
+    for evidence in evidence_sets:
+        compiled = network.marginals(evidence)
+        reference = vanilla.update_all_probabilities_reference(evidence, vanilla.MODEL.central)
+        assert compiled.keys() == reference.keys()
+        for node, dist in reference.items():
+            assert compiled[node] == pytest.approx(dist, abs=1e-12), (evidence, node)
+
+def test_forward_batch_matches_forward(network, evidence_sets, high):
+    t, _ = high
+    extra = ['Timeline', 'ControlLossRisk']
+    rows = np.full((len(evidence_sets), len(network)), -1, dtype=np.int64)
+    for k, evidence in enumerate(evidence_sets):
+        for i, j in network.encode_evidence(evidence).items():
+            rows[k, i] = j
+    target, extras = network.forward_batch(rows, 'P_doom_2035', extra, chunk_size=7)
+    for k, evidence in enumerate(evidence_sets):
+        single = network.forward(evidence)
+        np.testing.assert_allclose(target[k], single[t], atol=1e-12)
+        for node in extra:
+            np.testing.assert_allclose(extras[node][k], single[network.index[node]], atol=1e-12)
+
+def test_forward_batch_soft_evidence_matches_forward(network, high):
+    t, _ = high
+    soft = {'Timeline': {'Early': 0.2, 'Mid': 0.5, 'Late': 0.3}}
+    rows = np.full((3, len(network)), -1, dtype=np.int64)
+    rows[1, network.index['Regulation']] = 0
+    likelihoods = network.encode_likelihoods(soft)
+    target, _ = network.forward_batch(rows, 'P_doom_2035', likelihoods=likelihoods)
+    np.testing.assert_allclose(target[0], network.forward(soft)[t], atol=1e-12)
+    regulation = {'Regulation': network.states[network.index['Regulation']][0], **soft}
+    np.testing.assert_allclose(target[1], network.forward(regulation)[t], atol=1e-12)
+
+def test_forward_batch_rejects_bad_shapes(network):
+    with pytest.raises(ValueError):
+        network.forward_batch(np.full((2, len(network) - 1), -1), 'P_doom_2035')
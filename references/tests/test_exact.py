@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import bn_exact
+
+
+@pytest.fixture(scope='module')
+def inference(network):
+    pytest.importorskip('pgmpy')
+    from pgmpy.inference import VariableElimination
+    return VariableElimination(bn_exact.to_pgmpy_model(network))
+
+def test_junction_tree_matches_variable_elimination(network, evidence_sets, inference):
+    tree = bn_exact.junction_tree_for(network)
+    for evidence in evidence_sets:
+        posterior = tree.query(evidence)
+        for i, node in enumerate(network.nodes):
+            if node in evidence:
+                continue
+            factor = inference.query([node], evidence=evidence, show_progress=False)
+            expected = [factor.get_value(**{node: s}) for s in network.states[i]]
+            np.testing.assert_allclose(posterior[i], expected, atol=1e-10, err_msg=f"{node} | {evidence}")
+
+def test_soft_evidence_mixes_the_hard_evidence_posteriors(network):
+    """P(t | soft) is proportional to sum_s lam[s] P(Timeline = s) P(t | Timeline = s)."""
+    tree = bn_exact.junction_tree_for(network)
+    soft = {'Timeline': {'Early': 0.2, 'Mid': 0.5, 'Late': 0.3}}
+    tl, t = network.index['Timeline'], network.index['P_doom_2035']
+    lam = network.encode_likelihoods(soft)[tl]
+    prior = tree.query({}, [tl])[tl]
+    expected = sum(lam[k] * prior[k] * tree.query({'Timeline': s}, [t])[t] for k, s in enumerate(network.states[tl]))
+    np.testing.assert_allclose(tree.query(soft, [t])[t], expected / expected.sum(), atol=1e-12)
@@ -0,0 +1,52 @@
+import csv
+import numpy as np
+import pytest
+import bn_fit
+
+
+def write_records(path, network, samples, missing, rng):
+    """CSV with one column per node; a `missing` fraction of the cells is left empty."""
+    mask = rng.random(samples.shape) < missing
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(network.nodes)
+        for row, hidden in zip(samples, mask):
+            writer.writerow(['' if hidden[i] else network.states[i][row[i]] for i in range(len(network))])
+
+@pytest.fixture(scope='module')
+def truth(network):
+    """The central network with a sharpened P_doom_2035 table to recover."""
+    t = network.index['P_doom_2035']
+    table = network.dense_table(t) ** 2
+    return network.with_tables({t: table / table.sum(axis=-1, keepdims=True)})
+
+def well_observed_error(fitted, truth, samples, i, minimum=200):
+    """Mean |fitted - true| over the CPT rows of node i visited by at least minimum samples."""
+    visits = bn_fit.complete_counts(truth, samples)[i].sum(axis=-1) >= minimum
+    return np.abs(fitted.dense_table(i) - truth.dense_table(i))[visits].mean()
+
+@pytest.mark.parametrize('strength', [0.0, 10.0])
+def test_em_recovers_the_generating_cpt(vanilla, network, truth, tmp_path, strength):
+    rng = np.random.default_rng(0)
+    samples, _ = truth.weighted_sample(10000, {}, rng)
+    path = str(tmp_path / 'records.csv')
+    write_records(path, network, samples, 0.3, rng)
+    fitted, stats = bn_fit.fit_cpts(network, path, vanilla.questions_map, strength, tolerance=1e-3)
+    t = network.index['P_doom_2035']
+    assert stats['records'] == 10000 and stats['impossible'] == 0
+    assert well_observed_error(fitted, truth, samples, t) < well_observed_error(network, truth, samples, t) / 2
+
+def test_complete_records_are_counted_exactly(vanilla, network, tmp_path):
+    rng = np.random.default_rng(1)
+    samples, _ = network.weighted_sample(500, {}, rng)
+    path = str(tmp_path / 'records.csv')
+    write_records(path, network, samples, 0.0, rng)
+    fitted, stats = bn_fit.fit_cpts(network, path, vanilla.questions_map, 0.0)
+    assert stats['iterations'] == 0
+    counts = bn_fit.complete_counts(network, samples)
+    for i, expected in enumerate(bn_fit.normalize_counts(counts)):
+        assert np.allclose(fitted.dense_table(i), expected)
+
+def test_negative_prior_strength_is_rejected(vanilla, network, tmp_path):
+    with pytest.raises(ValueError):
+        bn_fit.fit_cpts(network, str(tmp_path / 'unused.csv'), vanilla.questions_map, -1.0)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import bn_exact
+import bn_incremental
+
+
+def from_scratch(network, mode, evidence):
+    if mode == 'forward':
+        return network.forward(evidence)
+    posterior = bn_exact.junction_tree_for(network).query(evidence)
+    return [posterior[i] for i in range(len(network))]
+
+def assert_matches(belief, network, mode):
+    expected = from_scratch(network, mode, belief.evidence)
+    current = belief.query(range(len(network)))
+    for i in range(len(network)):
+        np.testing.assert_allclose(current[i], expected[i], atol=1e-12, err_msg=f"{network.nodes[i]} | {belief.evidence}")
+
+@pytest.mark.parametrize('mode', ['forward', 'exact'])
+def test_matches_from_scratch_after_set_and_retract(network, mode):
+    rng = np.random.default_rng(1)
+    belief = bn_incremental.IncrementalBelief(network, mode)
+    assert_matches(belief, network, mode)
+    for _ in range(30):
+        i = int(rng.integers(len(network)))
+        node = network.nodes[i]
+        if node in belief.evidence and rng.random() < 0.5:
+            belief.retract(node)
+        elif rng.random() < 0.2:
+            weights = rng.dirichlet(np.ones(len(network.states[i])))
+            belief.set_evidence(node, dict(zip(network.states[i], weights.tolist())))
+        else:
+            belief.set_evidence(node, network.states[i][rng.integers(len(network.states[i]))])
+        assert_matches(belief, network, mode)
+
+@pytest.mark.parametrize('mode', ['forward', 'exact'])
+def test_retracting_everything_restores_the_prior(network, mode):
+    belief = bn_incremental.IncrementalBelief(network, mode, {'Timeline': 'Early', 'Regulation': network.states[network.index['Regulation']][0]})
+    belief.query(range(len(network)))
+    belief.retract('Timeline')
+    belief.retract('Regulation')
+    assert belief.evidence == {}
+    assert_matches(belief, network, mode)
+
+def test_forward_query_only_recomputes_descendants(network):
+    belief = bn_incremental.IncrementalBelief(network, 'forward')
+    belief.query(range(len(network)))
+    belief.set_evidence('P_doom_2035', 'Low')
+    belief.query(range(len(network)))
+    assert belief.last_recomputed == len(network.descendants([network.index['P_doom_2035']]))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import bn_lookup
+
+
+@pytest.fixture(scope='module')
+def table(vanilla, network):
+    """A LookupTable over the real answer space with a random sample of rows evaluated (the rest stay NaN)."""
+    layout = bn_lookup.build_answer_space(network, vanilla.questions_map, [bn_lookup.TARGET_NODE, bn_lookup.TIMELINE_NODE])
+    _, _, total = bn_lookup.answer_space_strides(layout)
+    columns = ['p_doom_high_vh'] + [f'timeline_{s}' for s in network.states[network.index[bn_lookup.TIMELINE_NODE]]]
+    values = np.full((total, len(columns)), np.nan, dtype=np.float32)
+    rows = np.random.default_rng(0).choice(total, 200, replace=False)
+    for k in rows:
+        values[k] = bn_lookup.evaluate_rows(int(k), int(k) + 1, [network], layout)[1]
+    return bn_lookup.LookupTable(layout, values, columns), rows
+
+def as_dict(network, row):
+    return {network.nodes[i]: network.states[i][j] for i, j in enumerate(row) if j >= 0}
+
+def test_perfect_hash_round_trips(network, table):
+    lookup, rows = table
+    evidence = bn_lookup.decode_indices(network, lookup.layout, rows)
+    assert [lookup.index_of(as_dict(network, row)) for row in evidence] == rows.tolist()
+    assert len(set(rows.tolist())) == len(rows)
+
+def test_lookup_matches_the_forward_pass(network, high, table):
+    lookup, rows = table
+    t, states = high
+    for row in bn_lookup.decode_indices(network, lookup.layout, rows[:50]):
+        evidence = as_dict(network, row)
+        assert lookup.lookup(evidence)['p_doom_high_vh'] == pytest.approx(network.forward(evidence)[t][states].sum(), abs=1e-6)
+
+def test_no_answers_is_index_zero(table):
+    assert table[0].index_of({}) == 0
+
+def test_unreachable_or_soft_evidence_is_not_in_the_table(table):
+    lookup, _ = table
+    node, states = lookup.layout[0]
+    assert lookup.lookup({node: 'NotAState'}) is None
+    assert lookup.lookup({node: {states[0]: 0.9, states[-1]: 0.1}}) is None
+    assert lookup.lookup({'P_doom_2035': [0.1, 0.2, 0.3, 0.4]}) is None
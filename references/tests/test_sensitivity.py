@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import bn_engine
+import bn_sensitivity
+
+EPS = 1e-6
+
+
+def probability(network, evidence):
+    return bn_sensitivity.gradients(network, evidence)[0]
+
+def shifted(array, rng):
+    """Direction moving mass between two entries of one random row, so row sums stay one."""
+    direction = np.zeros(array.shape)
+    row = tuple(rng.integers(n) for n in array.shape[:-1])
+    a, b = rng.choice(array.shape[-1], size=2, replace=False)
+    direction[row + (a,)], direction[row + (b,)] = 1.0, -1.0
+    return direction
+
+@pytest.mark.parametrize('evidence', [{}, {'Timeline': 'Early', 'Regulation': 'High'}])
+def test_dense_gradients_match_finite_differences(network, evidence, high):
+    rng = np.random.default_rng(2)
+    value, grads = bn_sensitivity.gradients(network, evidence)
+    t, states = high
+    assert value == pytest.approx(network.forward(evidence)[t][states].sum(), abs=1e-12)
+    for i, table in enumerate(network.tables):
+        for _ in range(5):
+            d = shifted(table, rng)
+            up = probability(network.with_tables({i: table + EPS * d}), evidence)
+            down = probability(network.with_tables({i: table - EPS * d}), evidence)
+            assert (up - down) / (2 * EPS) == pytest.approx(float((grads[i] * d).sum()), abs=1e-7), network.nodes[i]
+
+def test_evidence_nodes_get_zero_gradient(network):
+    _, grads = bn_sensitivity.gradients(network, {'Timeline': 'Early'})
+    assert not grads[network.index['Timeline']].any()
+
+def test_noisy_max_gradients_match_finite_differences(network):
+    rng = np.random.default_rng(3)
+    t = network.index['P_doom_2035']
+    k = network.cardinality[t]
+    leak = rng.dirichlet(np.ones(k))
+    links = [rng.dirichlet(np.ones(k), size=network.cardinality[p]) for p in network.parents[t]]
+    noisy = network.with_tables({t: bn_engine.NoisyMaxCPT(leak, links)})
+    _, grads = bn_sensitivity.gradients(noisy, {})
+    leak_grad, link_grads = grads[t]
+    for _ in range(5):
+        d = shifted(leak, rng)
+        up = probability(noisy.with_tables({t: bn_engine.NoisyMaxCPT(leak + EPS * d, links)}), {})
+        down = probability(noisy.with_tables({t: bn_engine.NoisyMaxCPT(leak - EPS * d, links)}), {})
+        assert (up - down) / (2 * EPS) == pytest.approx(float(leak_grad @ d), abs=1e-7)
+    for j, link in enumerate(links):
+        d = shifted(link, rng)
+        varied = lambda sign: links[:j] + [link + sign * EPS * d] + links[j + 1:]
+        up = probability(noisy.with_tables({t: bn_engine.NoisyMaxCPT(leak, varied(1))}), {})
+        down = probability(noisy.with_tables({t: bn_engine.NoisyMaxCPT(leak, varied(-1))}), {})
+        assert (up - down) / (2 * EPS) == pytest.approx(float((link_grads[j] * d).sum()), abs=1e-7)
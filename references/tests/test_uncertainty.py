@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import bn_uncertainty
+
+
+@pytest.mark.parametrize('belief', [0.01, 0.5, 0.9])
+def test_soft_evidence_range_contains_central(vanilla, network, high, belief):
+    t, states = high
+    evidence = {'Timeline': 'Early', 'P_doom_2035': vanilla.prior_belief_likelihood(belief)}
+    central = network.forward(evidence)[t][states].sum()
+    summary = bn_uncertainty.summarize(bn_uncertainty.cpt_uncertainty(network, evidence, 4000, seed=0))
+    assert summary['q5'] <= central <= summary['q95']
+
+def test_draws_concentrate_on_the_central_cpts(network, high):
+    t, states = high
+    central = network.forward({})[t][states].sum()
+    values = bn_uncertainty.cpt_uncertainty(network, {}, 2000, concentration=1e6, seed=0)
+    assert np.abs(values - central).max() < 0.01
+
+def test_seed_reproduces_draws(network):
+    a = bn_uncertainty.cpt_uncertainty(network, {'Timeline': 'Mid'}, 500, seed=7)
+    b = bn_uncertainty.cpt_uncertainty(network, {'Timeline': 'Mid'}, 500, seed=7)
+    assert np.array_equal(a, b)
+
+def test_aggregated_target_rows_match_full_draws(network):
+    # A flat likelihood on the target leaves the result unchanged but forces full (non-aggregated) target rows
+    evidence = {'Timeline': 'Late'}
+    flat = dict(evidence, P_doom_2035=[1.0] * network.cardinality[network.index['P_doom_2035']])
+    aggregated = bn_uncertainty.summarize(bn_uncertainty.cpt_uncertainty(network, evidence, 40000, seed=1))
+    full = bn_uncertainty.summarize(bn_uncertainty.cpt_uncertainty(network, flat, 40000, seed=2))
+    for key in ('mean', 'q5', 'q50', 'q95'):
+        assert aggregated[key] == pytest.approx(full[key], abs=0.003)
+    assert aggregated['std'] == pytest.approx(full['std'], rel=0.03)
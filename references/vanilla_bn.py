@@ -3,6 +3,23 @@
 # --- Manual Simplified Bayesian Network P(doom) Example - Expanded ---
 # Recreates BN logic without pgmpy library.
 # NOTE: Uses simplified forward-pass inference. CPTs loaded from JSON.
+# MODIFIED: Forward pass runs on the compiled NumPy engine in bn_engine.py.
+# ADDED: Optional exact posterior inference (junction tree, bn_exact.py) via INFERENCE_MODE.
+# ADDED: LRU result cache (bn_cache.py) behind update_all_probabilities_manual.
+# ADDED: Parametric (noisy-MAX) CPTs in bn_cpts.json, evaluated in factorized form by bn_engine.
+# MODIFIED: Evaluation order is derived from PARENTS (topological sort with cycle detection).
+# ADDED: Compiled CPT tensors are memory-mapped from bn_cpts.bnc when it matches bn_cpts.json.
+# ADDED: Optional Dirichlet Monte Carlo CPT uncertainty (bn_uncertainty.py) for the 2035 range via UNCERTAINTY_MODE.
+# ADDED: Optional value-of-information question ordering (bn_voi.py) via QUESTION_ORDER.
+# ADDED: Likelihood-weighted sampling inference (bn_sampling.py) as INFERENCE_MODE = 'sampling'.
+# MODIFIED: Central / optimistic / pessimistic runs share every marginal upstream of the perturbed CPT.
+# ADDED: Optional horizon curves over the full Timeline distribution (bn_horizon.py) via HORIZON_MODEL.
+# ADDED: Optional credal interval bounds on the 2035 result (bn_credal.py) as UNCERTAINTY_MODE = 'credal'.
+# ADDED: Parsed CPTs are snapshotted next to the JSON (bn_cache) and reused while the JSON's hash matches.
+# ADDED: Soft (likelihood) evidence, {state: weight} in place of a state; Q15 can be applied as soft evidence via PRIOR_BELIEF_MODE.
+# MODIFIED: CPTs load lazily through CPTModel (MODEL); importing the module reads and prints nothing.
+# MODIFIED: Optimistic / pessimistic CPTs are copy-on-write layers (bn_engine.LayeredCPTs) over the loaded CPTs, not deep copies.
+# MODIFIED: Horizon curve output names the uncertainty model its ranges come from.
 # MODIFIED: Target year changed to 2035. CPTs may need recalibration.
 # MODIFIED: Displays final probability as a range based on simplified sensitivity analysis.
 # ADDED: Heuristic calculation for P(doom) by 2050 and 2100 based on 2035 result and Timeline.
@@ -12,20 +29,52 @@ import csv
 import os
 import sys
 import json
-import copy
+from collections import OrderedDict
+from collections.abc import Mapping
+import hashlib
+import time
 import numpy as np
+import bn_cache
+import bn_credal
+import bn_engine
+import bn_exact
+import bn_horizon
+import bn_incremental
+import bn_sampling
+import bn_uncertainty
+import bn_voi
 
 # --- Configuration ---
 EXPERTS_CSV_PATH = 'experts_pdoom.csv'
 CPTS_JSON_PATH = 'bn_cpts.json'
+CPTS_SNAPSHOT_PATH = 'bn_cpts.snapshot' # Parsed CPTs keyed by the JSON's SHA-256, reused on restart (None = always parse)
+COMPILED_CPTS_PATH = 'bn_cpts.bnc' # Memory-mapped tensors compiled from CPTS_JSON_PATH (rebuilt when the JSON changes)
 KEY_DELIMITER = '|'
 PERTURBATION_DELTA = 0.10 # For sensitivity analysis on 2035 CPT
+UNCERTAINTY_MODE = 'perturbation' # 'perturbation' (+/- PERTURBATION_DELTA on P_doom), 'dirichlet' (resample every CPT row) or 'credal' (interval bounds)
+DIRICHLET_SAMPLES = 10000 # Sampled CPT sets for UNCERTAINTY_MODE = 'dirichlet'
+DIRICHLET_CONCENTRATION = 50.0 # Higher = tighter rows around the loaded CPTs
+UNCERTAINTY_WORKERS = 1 # Processes for Dirichlet sampling
+CREDAL_NODES = ['P_doom_2035'] # UNCERTAINTY_MODE = 'credal': nodes whose CPT entries get +/- PERTURBATION_DELTA / 2 intervals (None = every node)
+CREDAL_INTERVALS_PATH = None # e.g. 'bn_cpt_intervals.json': per-entry [lower, upper] ranges overriding the delta intervals
+INFERENCE_MODE = 'forward' # 'forward' (top-down pass), 'exact' (junction tree posteriors) or 'sampling' (likelihood weighting)
+SAMPLING_TARGET_SE = 0.005 # INFERENCE_MODE = 'sampling': stop once every marginal's standard error is below this
+SAMPLING_MAX_SAMPLES = 1000000
+SAMPLING_SEED = 0 # Fixed so repeated queries (and cached results) agree
+RESULT_CACHE_SIZE = 4096 # Max in-memory cached query results (LRU)
+COMPILED_CACHE_SIZE = 32 # Max CPT sets kept compiled (LRU); each entry pins its CPT dict and network
+RESULT_CACHE_PATH = None # e.g. 'bn_results.sqlite' to keep cached results across restarts
+QUESTION_ORDER = 'level' # 'level' (fixed order) or 'voi' (ask the most informative remaining question next)
+VOI_CRITERION = 'entropy' # 'entropy' or 'variance' of P_doom_2035, for QUESTION_ORDER = 'voi'
+VOI_STOP_THRESHOLD = None # e.g. 0.005: with 'voi', finish early once no question is expected to reduce uncertainty more
+PRIOR_BELIEF_MODE = 'ignore' # 'ignore' (Q15 is only noted) or 'likelihood' (Q15 becomes soft evidence on P_doom_2035)
 
 # --- Heuristic Configuration ---
 # Base percentage points to add from 2035 -> 2050 and 2050 -> 2100
 # Represents general risk increase over time if unresolved
 BASE_INCREASE_2050 = 7.5  # Add 7.5 points (e.g., 20% -> 27.5%)
 BASE_INCREASE_2100 = 12.5 # Add another 12.5 points (e.g., 27.5% -> 40%)
+HORIZON_INCREASES = {2050: BASE_INCREASE_2050, 2100: BASE_INCREASE_2100} # The same anchors in the form bn_horizon takes
 
 # Multipliers based on the most likely Timeline outcome from the BN
 TIMELINE_MULTIPLIER = {
@@ -34,6 +83,8 @@ TIMELINE_MULTIPLIER = {
     'Late':  1.5  # More added increase if risk manifests late
 }
 DEFAULT_TIMELINE_FOR_HEURISTIC = 'Mid' # Use if Timeline calculation fails
+HORIZON_MODEL = 'heuristic' # 'heuristic' (most likely Timeline, 2050/2100) or 'timeline_mixture' (full Timeline distribution, HORIZON_YEARS)
+HORIZON_YEARS = [2040, 2050, 2060, 2100] # Years reported with HORIZON_MODEL = 'timeline_mixture'
 
 # --- Helper Functions ---
 def safe_float(value, default=None):
@@ -155,30 +206,49 @@ STATES = {
 }
 
 # --- 3. Load CPTs from JSON File ---
-def load_cpts_from_json(json_path, parents_map, delimiter):
-    """Loads CPTs from JSON, converting string keys back to tuples."""
-    # [Function mostly unchanged, minor warning refinement]
+def load_cpts_from_json(json_path, parents_map, delimiter, snapshot_path=None):
+    """
+    Loads CPTs from JSON, converting string keys back to tuples.
+    With snapshot_path, a clean parse is snapshotted there, keyed by the
+    JSON's SHA-256 (plus PARENTS / STATES / delimiter), and reused while
+    that hash matches.
+    """
     print(f"Loading CPTs from {json_path}...")
     if not os.path.exists(json_path):
         print(f"Error: CPTs file not found at {json_path}", file=sys.stderr)
         return None
 
+    start = time.perf_counter()
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            raw_cpts = json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {json_path}: {e}", file=sys.stderr)
-        return None
+        with open(json_path, 'rb') as f:
+            raw_bytes = f.read() # Hash and parse the same bytes, so a concurrent edit cannot mismatch them
     except IOError as e:
         print(f"Error reading file {json_path}: {e}", file=sys.stderr)
         return None
+    if snapshot_path:
+        key = bn_cache.snapshot_key(hashlib.sha256(raw_bytes).hexdigest(), [parents_map, STATES, delimiter])
+        snapshot = bn_cache.load_snapshot(snapshot_path, key)
+        if snapshot is not None:
+            print(f"Successfully loaded CPTs for {len(snapshot)} nodes from snapshot {snapshot_path} "
+                  f"(hash match, {(time.perf_counter() - start) * 1000:.1f} ms).")
+            return snapshot
+    try:
+        raw_cpts = json.loads(raw_bytes.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"Error decoding JSON from {json_path}: {e}", file=sys.stderr)
+        return None
+
+    warnings_seen = []
+    def warn(message):
+        warnings_seen.append(message)
+        print(f"Warning: {message}", file=sys.stderr)
 
     reconstructed_cpts = {}
     nodes_processed = set()
     for node_name, node_data in raw_cpts.items():
         nodes_processed.add(node_name)
         if node_name not in parents_map:
-            print(f"Warning: Node '{node_name}' found in JSON but not in PARENTS definition. Skipping.", file=sys.stderr)
+            warn(f"Node '{node_name}' found in JSON but not in PARENTS definition. Skipping.")
             continue
 
         parent_nodes = parents_map.get(node_name, [])
@@ -187,22 +257,30 @@ def load_cpts_from_json(json_path, parents_map, delimiter):
             if isinstance(node_data, dict):
                  reconstructed_cpts[node_name] = node_data
             else:
-                 print(f"Warning: Invalid format for prior node '{node_name}' in JSON. Expected dict, got {type(node_data)}. Skipping.", file=sys.stderr)
+                 warn(f"Invalid format for prior node '{node_name}' in JSON. Expected dict, got {type(node_data)}. Skipping.")
         else: # Conditional
             if not isinstance(node_data, dict):
-                 print(f"Warning: Invalid format for conditional node '{node_name}' in JSON. Expected dict, got {type(node_data)}. Skipping.", file=sys.stderr)
+                 warn(f"Invalid format for conditional node '{node_name}' in JSON. Expected dict, got {type(node_data)}. Skipping.")
                  continue
+            if bn_engine.is_parametric(node_data): # e.g. noisy-MAX: kept as a spec, compiled in factorized form
+                try:
+                    bn_engine.parametric_cpt_from_dict(node_name, node_data, parent_nodes, STATES)
+                except ValueError as e:
+                    warn(f"Invalid parametric CPT for node '{node_name}': {e} Skipping.")
+                    continue
+                reconstructed_cpts[node_name] = node_data
+                continue
 
             converted_conditional_cpt = {}
             num_expected_parents = len(parent_nodes)
             for joined_key, child_distribution in node_data.items():
                 parent_states_list = joined_key.split(delimiter)
                 if len(parent_states_list) != num_expected_parents:
-                    print(f"Warning: Key '{joined_key}' for node '{node_name}' has {len(parent_states_list)} states, but expected {num_expected_parents} based on PARENTS {parent_nodes}. Skipping entry.", file=sys.stderr)
+                    warn(f"Key '{joined_key}' for node '{node_name}' has {len(parent_states_list)} states, but expected {num_expected_parents} based on PARENTS {parent_nodes}. Skipping entry.")
                     continue
                 tuple_key = tuple(parent_states_list)
                 if not isinstance(child_distribution, dict):
-                     print(f"Warning: Invalid child distribution format for node '{node_name}', key '{joined_key}'. Expected dict, got {type(child_distribution)}. Skipping entry.", file=sys.stderr)
+                     warn(f"Invalid child distribution format for node '{node_name}', key '{joined_key}'. Expected dict, got {type(child_distribution)}. Skipping entry.")
                      continue
                 converted_conditional_cpt[tuple_key] = child_distribution
             reconstructed_cpts[node_name] = converted_conditional_cpt
@@ -210,17 +288,17 @@ def load_cpts_from_json(json_path, parents_map, delimiter):
     # Final check: Ensure all nodes defined in PARENTS are present in the loaded CPTs
     missing_nodes = set(parents_map.keys()) - nodes_processed
     if missing_nodes:
-        print(f"Warning: The following nodes defined in PARENTS were NOT found in {json_path}: {missing_nodes}", file=sys.stderr)
+        warn(f"The following nodes defined in PARENTS were NOT found in {json_path}: {missing_nodes}")
 
     print(f"Successfully loaded and processed CPTs for {len(reconstructed_cpts)} nodes found in JSON.")
+    if snapshot_path:
+        if warnings_seen: # Only clean parses are snapshotted, so a hit never hides a warning
+            print(f"(parsed in {(time.perf_counter() - start) * 1000:.1f} ms; not snapshotted because of the warnings above)")
+        else:
+            saved = bn_cache.save_snapshot(snapshot_path, key, reconstructed_cpts)
+            print(f"(parsed in {(time.perf_counter() - start) * 1000:.1f} ms; {'snapshot written to ' + snapshot_path if saved else 'snapshot not written'})")
     return reconstructed_cpts
 
-# --- Load the CPTs ---
-LOADED_CPTS = load_cpts_from_json(CPTS_JSON_PATH, PARENTS, KEY_DELIMITER)
-if LOADED_CPTS is None:
-    print("Exiting due to CPT loading failure.", file=sys.stderr)
-    sys.exit(1)
-
 # --- Perturbation Helper Function (Unchanged from previous version) ---
 def perturb_distribution(dist, delta, pessimistic=True):
     """
@@ -228,7 +306,7 @@ def perturb_distribution(dist, delta, pessimistic=True):
     High/VeryHigh states by a total amount delta for P_doom_2035 node.
     Handles clipping and normalization.
     """
-    is_pdoom_node = list(dist.keys()) == STATES['P_doom_2035']
+    is_pdoom_node = set(dist.keys()) == set(STATES['P_doom_2035'])
     if not is_pdoom_node: return dist # Only perturb P_doom_2035 for now
 
     new_dist = dist.copy()
@@ -260,13 +338,15 @@ def perturb_distribution(dist, delta, pessimistic=True):
     return normalize_dist(new_dist)
 
 # --- Create Perturbed CPTs based on Loaded Data ---
-CPTS_central = LOADED_CPTS
-CPTS_optimistic = copy.deepcopy(LOADED_CPTS)
-CPTS_pessimistic = copy.deepcopy(LOADED_CPTS)
-
-target_node_for_perturbation = 'P_doom_2035'
-if target_node_for_perturbation in CPTS_central:
-    original_pdoom_cpt = CPTS_central[target_node_for_perturbation]
+def perturbed_cpts(loaded_cpts, delta=PERTURBATION_DELTA):
+    """(optimistic, pessimistic) layers over loaded_cpts with P_doom_2035 shifted by delta (both are loaded_cpts if it cannot be perturbed)."""
+    target_node_for_perturbation = 'P_doom_2035'
+    if target_node_for_perturbation not in loaded_cpts:
+        print(f"Warning: Node '{target_node_for_perturbation}' not found in loaded CPTs. Sensitivity analysis based on perturbation will not run.", file=sys.stderr)
+        return loaded_cpts, loaded_cpts # Fallback
+    original_pdoom_cpt = loaded_cpts[target_node_for_perturbation]
+    if bn_engine.is_parametric(original_pdoom_cpt): # Perturb the explicit rows of a parametric CPT
+        original_pdoom_cpt = bn_engine.expand_parametric_cpt(target_node_for_perturbation, original_pdoom_cpt, PARENTS[target_node_for_perturbation], STATES)
     perturbed_pdoom_optimistic = {}
     perturbed_pdoom_pessimistic = {}
     if isinstance(original_pdoom_cpt, dict):
@@ -274,19 +354,17 @@ if target_node_for_perturbation in CPTS_central:
         for condition, dist in original_pdoom_cpt.items():
              if isinstance(condition, tuple) and isinstance(dist, dict):
                   normalized_original_dist = normalize_dist(dist)
-                  perturbed_pdoom_optimistic[condition] = perturb_distribution(normalized_original_dist, PERTURBATION_DELTA, pessimistic=False)
-                  perturbed_pdoom_pessimistic[condition] = perturb_distribution(normalized_original_dist, PERTURBATION_DELTA, pessimistic=True)
+                  perturbed_pdoom_optimistic[condition] = perturb_distribution(normalized_original_dist, delta, pessimistic=False)
+                  perturbed_pdoom_pessimistic[condition] = perturb_distribution(normalized_original_dist, delta, pessimistic=True)
              else: # Keep original if format is wrong
                  perturbed_pdoom_optimistic[condition] = dist
                  perturbed_pdoom_pessimistic[condition] = dist
-        CPTS_optimistic[target_node_for_perturbation] = perturbed_pdoom_optimistic
-        CPTS_pessimistic[target_node_for_perturbation] = perturbed_pdoom_pessimistic
         print(f"Finished perturbing CPT for {target_node_for_perturbation}.")
-    else: print(f"Error: Expected CPT for '{target_node_for_perturbation}' to be dict. Cannot perturb.", file=sys.stderr)
-else:
-    print(f"Warning: Node '{target_node_for_perturbation}' not found in loaded CPTs. Sensitivity analysis based on perturbation will not run.", file=sys.stderr)
-    CPTS_optimistic = CPTS_central # Fallback
-    CPTS_pessimistic = CPTS_central # Fallback
+        # Only P_doom_2035 differs: every other node is shared with loaded_cpts (and its compiled tensors)
+        return (bn_engine.LayeredCPTs(loaded_cpts, {target_node_for_perturbation: perturbed_pdoom_optimistic}),
+                bn_engine.LayeredCPTs(loaded_cpts, {target_node_for_perturbation: perturbed_pdoom_pessimistic}))
+    print(f"Error: Expected CPT for '{target_node_for_perturbation}' to be dict. Cannot perturb.", file=sys.stderr)
+    return loaded_cpts, loaded_cpts
 
 # --- 4. Simplified Inference Logic ---
 def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
@@ -321,6 +399,8 @@ def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
     if not cpt or not isinstance(cpt, dict):
         print(f"Error: CPT missing or invalid type for node '{node}'.", file=sys.stderr)
         return node_dist
+    if bn_engine.is_parametric(cpt): # This dict-based pass needs explicit rows
+        cpt = bn_engine.expand_parametric_cpt(node, cpt, parent_nodes, STATES)
 
     parent_states_list = [STATES.get(p_node) for p_node in parent_nodes]
     if not all(parent_states_list): return node_dist
@@ -358,24 +438,19 @@ def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
     return normalized_node_dist
 
 
-def update_all_probabilities_manual(evidence, master_cpt_dict):
-    """Updates probabilities for all nodes using a manual forward pass. Uses provided CPT dict."""
-    # [Function unchanged internally, relies on calculate_marginal_manual]
-    # [Includes robustness checks added in previous step]
-    calculation_order = [
-        'Timeline', 'Coordination', 'Interpretability', 'MisusePotential',
-        'AlignmentSolvability', 'Competition', 'WarningShot', 'SelfReplication',
-        'Regulation', 'DeceptionRisk', 'PowerConcentration',
-        'ControlLossRisk',
-        'P_doom_2035'
-    ]
-    defined_nodes = set(PARENTS.keys())
-    ordered_nodes = set(calculation_order)
-    if defined_nodes != ordered_nodes: # Basic check
-         print(f"Warning: Mismatch PARENTS vs calculation_order!")
+# Evaluation order for the forward pass (parents before children), derived from PARENTS
+try:
+    CALCULATION_ORDER = bn_engine.topological_order(PARENTS)
+except ValueError as e:
+    print(f"Error: Invalid network structure: {e}", file=sys.stderr)
+    sys.exit(1)
 
+def update_all_probabilities_reference(evidence, master_cpt_dict):
+    """Updates probabilities for all nodes using the original dict-based forward pass."""
+    # [Kept as the reference implementation for the compiled engine and its benchmark]
+    calculation_order = CALCULATION_ORDER
     current_probabilities = {}
-    if not master_cpt_dict or not isinstance(master_cpt_dict, dict):
+    if not master_cpt_dict or not isinstance(master_cpt_dict, Mapping):
         print("Error: Invalid master_cpt_dict provided to update_all_probabilities_manual. Returning empty.", file=sys.stderr)
         return {}
 
@@ -390,6 +465,167 @@ def update_all_probabilities_manual(evidence, master_cpt_dict):
 
     return current_probabilities
 
+# Memoized query results keyed by CPT content hash, inference mode and evidence
+RESULT_CACHE = bn_cache.ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_PATH)
+
+# Compiled networks keyed by id() of the CPT dict they were built from, least recently used first.
+# The dict itself is kept alongside so its id cannot be reused while cached.
+COMPILED_NETWORKS = OrderedDict()
+
+def cache_compiled_network(master_cpt_dict, network):
+    """Stores a compiled network for a CPT dict, dropping the least recently used beyond COMPILED_CACHE_SIZE."""
+    COMPILED_NETWORKS[id(master_cpt_dict)] = (master_cpt_dict, network)
+    COMPILED_NETWORKS.move_to_end(id(master_cpt_dict))
+    while len(COMPILED_NETWORKS) > COMPILED_CACHE_SIZE:
+        COMPILED_NETWORKS.popitem(last=False)
+
+def get_compiled_network(master_cpt_dict):
+    """Returns the compiled tensor form of a CPT dict, compiling it on first use (None if not compilable)."""
+    cached = COMPILED_NETWORKS.get(id(master_cpt_dict))
+    if cached is not None and cached[0] is master_cpt_dict:
+        COMPILED_NETWORKS.move_to_end(id(master_cpt_dict))
+        return cached[1]
+    try:
+        base_network = get_compiled_network(master_cpt_dict.base) if isinstance(master_cpt_dict, bn_engine.LayeredCPTs) else None
+        if base_network is not None: # Compile only the overridden nodes and share the base tensors
+            network = bn_engine.compile_layered(base_network, master_cpt_dict.overrides)
+        else:
+            network = bn_engine.compile_network(PARENTS, STATES, master_cpt_dict, CALCULATION_ORDER)
+    except ValueError as e:
+        print(f"Warning: Could not compile CPTs ({e}). Using dict-based forward pass.", file=sys.stderr)
+        network = None
+    cache_compiled_network(master_cpt_dict, network)
+    return network
+
+# --- Lazy CPT Model ---
+class CPTModel:
+    """
+    The central / optimistic / pessimistic CPT sets from one JSON file.
+    Nothing is read at construction: the JSON is loaded on first use of any
+    variant (or by build()) and the perturbed copies the first time one of
+    them is needed, then both are cached. Raises ValueError if the JSON
+    cannot be loaded.
+    """
+
+    def __init__(self, cpts_json_path=CPTS_JSON_PATH, snapshot_path=CPTS_SNAPSHOT_PATH, compiled_path=COMPILED_CPTS_PATH, delta=PERTURBATION_DELTA):
+        self.cpts_json_path = cpts_json_path
+        self.snapshot_path = snapshot_path
+        self.compiled_path = compiled_path
+        self.delta = delta
+        self._central = None
+        self._perturbed = None
+
+    @property
+    def central(self):
+        if self._central is None:
+            cpts = load_cpts_from_json(self.cpts_json_path, PARENTS, KEY_DELIMITER, self.snapshot_path)
+            if cpts is None:
+                raise ValueError(f"Could not load CPTs from {self.cpts_json_path}.")
+            if self.compiled_path: # Serve the JSON CPTs from the memory-mapped artifact when it was built from the current JSON
+                cache_compiled_network(cpts, bn_engine.load_or_compile(
+                    self.compiled_path, self.cpts_json_path, lambda: get_compiled_network(cpts), (PARENTS, STATES, CALCULATION_ORDER)))
+            self._central = cpts
+        return self._central
+
+    @property
+    def optimistic(self):
+        return self.perturbed()[0]
+
+    @property
+    def pessimistic(self):
+        return self.perturbed()[1]
+
+    def perturbed(self):
+        if self._perturbed is None:
+            self._perturbed = perturbed_cpts(self.central, self.delta)
+        return self._perturbed
+
+    def build(self):
+        """Builds every variant now and returns (central, optimistic, pessimistic)."""
+        return (self.central,) + self.perturbed()
+
+# Default model for bn_cpts.json. Built on first use, not on import.
+MODEL = CPTModel()
+
+def __getattr__(name):
+    """Lazy module attributes: LOADED_CPTS / CPTS_central / CPTS_optimistic / CPTS_pessimistic come from MODEL."""
+    if name in ('LOADED_CPTS', 'CPTS_central'):
+        return MODEL.central
+    if name == 'CPTS_optimistic':
+        return MODEL.optimistic
+    if name == 'CPTS_pessimistic':
+        return MODEL.pessimistic
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def has_unknown_states(evidence):
+    """True if some hard evidence state is not in STATES (soft {state: weight} entries are checked by the engine)."""
+    return any(node in STATES and not bn_engine.is_soft_evidence(state) and state not in STATES[node] for node, state in evidence.items())
+
+def prior_belief_likelihood(p_high):
+    """Soft evidence on P_doom_2035 from a Q15 answer: weight p_high on High / VeryHigh, 1 - p_high on Low / Medium."""
+    return {state: (p_high if state in ('High', 'VeryHigh') else 1.0 - p_high) for state in STATES['P_doom_2035']}
+
+def update_all_probabilities_manual(evidence, master_cpt_dict):
+    """Updates probabilities for all nodes using the compiled forward pass. Uses provided CPT dict."""
+    if not master_cpt_dict or not isinstance(master_cpt_dict, Mapping):
+        print("Error: Invalid master_cpt_dict provided to update_all_probabilities_manual. Returning empty.", file=sys.stderr)
+        return {}
+    if has_unknown_states(evidence):
+        return update_all_probabilities_reference(evidence, master_cpt_dict) # Keeps legacy handling of odd states
+    network = get_compiled_network(master_cpt_dict)
+    if network is None:
+        return update_all_probabilities_reference(evidence, master_cpt_dict)
+    if INFERENCE_MODE == 'exact':
+        compute = lambda: bn_exact.junction_tree_for(network).marginals(evidence)
+    elif INFERENCE_MODE == 'sampling':
+        compute = lambda: bn_sampling.estimate_marginals(network, evidence, network.nodes, SAMPLING_TARGET_SE,
+                                                         SAMPLING_MAX_SAMPLES, seed=SAMPLING_SEED).marginals()
+    else:
+        compute = lambda: network.marginals(evidence)
+    settings = (SAMPLING_TARGET_SE, SAMPLING_MAX_SAMPLES, SAMPLING_SEED) if INFERENCE_MODE == 'sampling' else () # Sampled results depend on these
+    return bn_cache.cached_query(RESULT_CACHE, master_cpt_dict, INFERENCE_MODE, evidence, compute, settings)
+
+def update_scenarios_manual(evidence, cpt_dicts):
+    """
+    Marginals for several CPT variants at once (e.g. central / optimistic / pessimistic).
+    In forward mode, nodes whose CPTs agree across the variants are computed
+    once (bn_engine.evaluate_scenarios); otherwise each variant is queried on its own.
+    """
+    networks = [get_compiled_network(c) if c and isinstance(c, Mapping) else None for c in cpt_dicts]
+    if (INFERENCE_MODE != 'forward' or any(n is None for n in networks)
+            or has_unknown_states(evidence)):
+        return [update_all_probabilities_manual(evidence, c) for c in cpt_dicts]
+    computed = []
+    def compute(k): # Evaluated at most once, and only if some variant misses the cache
+        if not computed:
+            computed.extend(n.to_dicts(m) for n, m in zip(networks, bn_engine.evaluate_scenarios(networks, evidence)))
+        return computed[k]
+    return [bn_cache.cached_query(RESULT_CACHE, c, INFERENCE_MODE, evidence, lambda k=k: compute(k)) for k, c in enumerate(cpt_dicts)]
+
+def update_probabilities_batch(evidence_rows, master_cpt_dict, extra_nodes=(), chunk_size=bn_engine.DEFAULT_BATCH_CHUNK, likelihoods=None):
+    """
+    Scores many answer sets in one call. evidence_rows is either a list of
+    evidence dicts (soft {state: weight} entries included) or an (N x nodes)
+    index array in CALCULATION_ORDER columns (-1 = unobserved). likelihoods
+    optionally adds soft evidence as {node: (states,) or (N x states)}.
+    Uses the junction tree when INFERENCE_MODE = 'exact', else the forward
+    pass. Returns (N x 4) P_doom_2035 marginals and a dict of (N x states)
+    marginals for extra_nodes.
+    """
+    network = get_compiled_network(master_cpt_dict)
+    if network is None:
+        raise ValueError("Batch scoring requires CPTs that compile to the tensor engine.")
+    lams = {network.index[node]: lam for node, lam in (likelihoods or {}).items()}
+    if not isinstance(evidence_rows, np.ndarray):
+        for i, lam in network.encode_likelihood_batch(evidence_rows).items():
+            lams[i] = lams[i] * lam if i in lams else lam
+        evidence_rows = network.encode_evidence_batch(evidence_rows)
+    if INFERENCE_MODE == 'exact':
+        t = network.index['P_doom_2035']
+        posterior = bn_exact.junction_tree_for(network).query_batch(evidence_rows, [t] + [network.index[n] for n in extra_nodes], lams)
+        return posterior[t], {n: posterior[network.index[n]] for n in extra_nodes}
+    return network.forward_batch(evidence_rows, 'P_doom_2035', extra_nodes, chunk_size, lams)
+
 # --- 5. Define Questions and Mapping (Unchanged) ---
 questions_map = {
     'Q14': {'level': 1, 'text': "Broadly, when do you expect AI systems to significantly surpass human cognitive abilities?", 'node': 'Timeline', 'options': {'1': ('Before 2035', 'Early'), '2': ('2035-2050', 'Mid'), '3': ('2050-2070', 'Late'), '4': ('After 2070 / Never', 'Late')}},
@@ -410,6 +646,35 @@ sorted_qids = sorted(questions_map.keys(), key=lambda q: (questions_map[q]['leve
 
 
 # --- 6. Run the Quiz ---
+def print_live_update(updated_prob_dist):
+    """Prints the intermediate P(doom by 2035) distribution after an answer."""
+    print("\n   Updated P(doom by 2035) Distribution (Approximate Ranges - Central Estimate):")
+    if updated_prob_dist and isinstance(updated_prob_dist, dict):
+        total_check = 0
+        for state in STATES['P_doom_2035']:
+            prob = updated_prob_dist.get(state, 0.0)
+            print(f"     P(Doom={state}) = {format_prob_range(prob)}")
+            total_check += prob
+        pdoom_high_vh = updated_prob_dist.get('High', 0.0) + updated_prob_dist.get('VeryHigh', 0.0)
+        print(f"   Current P(Doom=High or VeryHigh): {pdoom_high_vh * 100:.1f}% (point estimate)")
+        if abs(total_check - 1.0) > 0.01: print(f"   (Note: Sum {total_check:.3f})")
+    else: print("     Error: Could not calculate updated distribution.")
+
+def go_back_one_question(answered, user_evidence, live_belief):
+    """Retracts the most recent answer and returns the position of its question."""
+    position, node, previous_state = answered.pop()
+    if node is not None:
+        if previous_state is None:
+            user_evidence.pop(node, None)
+            if live_belief is not None: live_belief.retract(node)
+        else:
+            user_evidence[node] = previous_state
+            if live_belief is not None: live_belief.set_evidence(node, previous_state)
+        print(f" <- Going back: retracted answer for {node}")
+    else:
+        print(" <- Going back")
+    return position
+
 def run_quiz(initial_cpts):
     """Gets user evidence through questions."""
     user_evidence = {}
@@ -421,7 +686,7 @@ def run_quiz(initial_cpts):
     print("      Includes heuristic estimates for 2050 & 2100.")
 
     # Initial state calculation (using central CPTs)
-    if not initial_cpts or not isinstance(initial_cpts, dict):
+    if not initial_cpts or not isinstance(initial_cpts, Mapping):
          print("Error: Central CPTs invalid. Cannot calculate initial state.", file=sys.stderr)
          initial_prob_dist = {}
     else:
@@ -442,61 +707,98 @@ def run_quiz(initial_cpts):
         if abs(pdoom_sum_check - 1.0) > 0.01:
               print(f"  (Note: Underlying point probabilities sum to {pdoom_sum_check:.3f})")
 
-    print("\nPlease answer the following questions:")
+    print("\nPlease answer the following questions (enter 'b' to go back one question):")
     prior_belief_adjustment = None
 
-    for qid in sorted_qids:
+    # Live meter: incremental belief state, so each answer only recomputes what it affects
+    network = get_compiled_network(initial_cpts) if initial_cpts and isinstance(initial_cpts, Mapping) else None
+    live_belief = bn_incremental.IncrementalBelief(network, INFERENCE_MODE) if network is not None and INFERENCE_MODE != 'sampling' else None
+    answered = [] # Stack of (position, node, previous_state) so answers can be retracted
+    position = 0
+    quiz_order = list(sorted_qids) # With QUESTION_ORDER = 'voi', the question asked at each position is chosen on arrival
+
+    while position < len(quiz_order):
+        if QUESTION_ORDER == 'voi' and network is not None and not questions_map[quiz_order[position]].get('is_prior_belief', False):
+            remaining = {q: questions_map[q] for q in quiz_order[position:]}
+            best_qid, best_value = bn_voi.next_best_question(network, remaining, user_evidence, VOI_CRITERION,
+                                                               'forward' if INFERENCE_MODE == 'forward' else 'exact')
+            if best_qid is not None and VOI_STOP_THRESHOLD is not None and best_value < VOI_STOP_THRESHOLD:
+                print("\nThe remaining questions would barely change the estimate. Finishing early.")
+                break
+            if best_qid is not None:
+                j = quiz_order.index(best_qid)
+                quiz_order[position], quiz_order[j] = quiz_order[j], quiz_order[position]
+        qid = quiz_order[position]
         q_data = questions_map[qid]
         if q_data.get('is_prior_belief', False): # Q15 Handling
             print(f"\n{qid}: {q_data['text']} (Provides baseline intuition)")
             for key, val in q_data['options'].items(): print(f"  {key}. {val[0]}")
             while True:
                 choice = input("Enter your choice (number): ")
+                if choice == 'b' and answered: break
                 if choice in q_data['options']:
                     prior_belief_adjustment = q_data['options'][choice][1]
-                    print(f" -> Baseline intuition noted (~{prior_belief_adjustment*100:.0f}% High/VH range). Not used in calculation.")
+                    if PRIOR_BELIEF_MODE == 'likelihood':
+                        node = q_data['node']
+                        answered.append((position, node, user_evidence.get(node)))
+                        user_evidence[node] = prior_belief_likelihood(prior_belief_adjustment)
+                        print(f" -> Baseline intuition (~{prior_belief_adjustment*100:.0f}% High/VH) applied as soft evidence on {node}.")
+                        if live_belief is not None:
+                            live_belief.set_evidence(node, user_evidence[node])
+                            print_live_update(live_belief.marginal('P_doom_2035'))
+                    else:
+                        print(f" -> Baseline intuition noted (~{prior_belief_adjustment*100:.0f}% High/VH range). Not used in calculation.")
                     break
                 else: print("Invalid choice.")
+            if choice == 'b' and answered:
+                position = go_back_one_question(answered, user_evidence, live_belief)
+                continue
+            if PRIOR_BELIEF_MODE != 'likelihood':
+                answered.append((position, None, None))
+            position += 1
             continue
 
         # Standard Question
-        if q_data['level'] > current_level:
+        if q_data['level'] != current_level:
             current_level = q_data['level']; print(f"\n--- LEVEL {current_level} ---")
         print(f"\n{qid}: {q_data['text']}")
         for key, val in q_data['options'].items(): print(f"  {key}. {val[0]}")
 
         while True:
             choice = input("Enter your choice (number): ")
+            if choice == 'b' and answered:
+                break
             if choice in q_data['options']:
                 chosen_text, chosen_state = q_data['options'][choice]
                 node = q_data['node']
                 if node not in STATES:
                     print(f"!! Internal Error: Node '{node}' map Q:{qid} not in STATES. Skip evidence.")
+                    answered.append((position, None, None))
                     break
                 if chosen_state not in STATES[node]:
                     print(f"!! Warn: State '{chosen_state}' map Q:{qid} inconsistent node '{node}' STATES: {STATES[node]}. Proceed.")
 
+                answered.append((position, node, user_evidence.get(node)))
                 user_evidence[node] = chosen_state
                 print(f" -> Setting Evidence: {node} = {chosen_state}")
 
                 # Intermediate feedback using CENTRAL estimate
-                if initial_cpts: # Check CPTs valid
+                if live_belief is not None:
+                    live_belief.set_evidence(node, chosen_state)
+                    print_live_update(live_belief.marginal('P_doom_2035'))
+                elif initial_cpts: # Check CPTs valid
                     all_probs_updated = update_all_probabilities_manual(user_evidence, initial_cpts)
-                    updated_prob_dist = all_probs_updated.get('P_doom_2035', {})
-                    print("\n   Updated P(doom by 2035) Distribution (Approximate Ranges - Central Estimate):")
-                    if updated_prob_dist and isinstance(updated_prob_dist, dict):
-                        total_check = 0
-                        for state in STATES['P_doom_2035']:
-                            prob = updated_prob_dist.get(state, 0.0)
-                            print(f"     P(Doom={state}) = {format_prob_range(prob)}")
-                            total_check += prob
-                        pdoom_high_vh = updated_prob_dist.get('High', 0.0) + updated_prob_dist.get('VeryHigh', 0.0)
-                        print(f"   Current P(Doom=High or VeryHigh): {pdoom_high_vh * 100:.1f}% (point estimate)")
-                        if abs(total_check - 1.0) > 0.01: print(f"   (Note: Sum {total_check:.3f})")
-                    else: print("     Error: Could not calculate updated distribution.")
+                    print_live_update(all_probs_updated.get('P_doom_2035', {}))
                 else: print("     Skipping intermediate update due to invalid initial CPTs.")
                 break # Question answered, move to next
             else: print("Invalid choice, please try again.")
+
+        if choice == 'b' and answered:
+            position = go_back_one_question(answered, user_evidence, live_belief)
+            if live_belief is not None:
+                print_live_update(live_belief.marginal('P_doom_2035'))
+        else:
+            position += 1
     return user_evidence
 
 # --- 7. Heuristic Calculation for Later Years ---
@@ -531,6 +833,20 @@ def calculate_heuristic_pdoom(pdoom_start_percent, most_likely_timeline, target_
     return np.clip(pdoom_adjusted, 0.0, 100.0)
 
 
+def calculate_horizon_ranges(evidence, cpt_dicts, years):
+    """
+    {year: (lower, central, upper)} P(doom by year) in percent from bn_horizon,
+    using the full Timeline distribution. The first CPT dict is the central
+    estimate; lower / upper span all variants. None if a variant does not compile.
+    """
+    networks = [get_compiled_network(c) if c and isinstance(c, Mapping) else None for c in cpt_dicts]
+    if any(n is None for n in networks):
+        return None
+    mode = 'exact' if INFERENCE_MODE == 'exact' else 'forward'
+    curves = np.array([bn_horizon.pdoom_by_year(n, years, evidence, mode, TIMELINE_MULTIPLIER, HORIZON_INCREASES) for n in networks]) * 100
+    return {year: (curves[:, k].min(), curves[0, k], curves[:, k].max()) for k, year in enumerate(years)}
+
+
 # --- 8. Final Results & Comparison ---
 
 def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
@@ -546,28 +862,30 @@ def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
     final_probs_central = {} # Store central probabilities for heuristic input
 
     print(f"Calculating 2035 range using P(doom) CPT perturbation delta: +/- {PERTURBATION_DELTA*100:.0f}% points...")
+    scenarios = [c for c in (cpts_c, cpts_o, cpts_p) if c and isinstance(c, Mapping)]
+    scenario_results = dict(zip(map(id, scenarios), update_scenarios_manual(user_evidence, scenarios))) # Shared upstream marginals
 
-    if cpts_c and isinstance(cpts_c, dict):
+    if cpts_c and isinstance(cpts_c, Mapping):
         print("Running central estimate...")
-        final_probs_central = update_all_probabilities_manual(user_evidence, cpts_c)
+        final_probs_central = scenario_results[id(cpts_c)]
         p_doom_dist_c = final_probs_central.get('P_doom_2035', {})
         if p_doom_dist_c and isinstance(p_doom_dist_c, dict):
             pdoom_high_vh_central = p_doom_dist_c.get('High', 0.0) + p_doom_dist_c.get('VeryHigh', 0.0)
         else: print("  Warning: Central estimate failed or returned invalid type.")
     else: print("  Warning: Central CPTs invalid. Skipping central estimate.")
 
-    if cpts_o and isinstance(cpts_o, dict) and cpts_o != cpts_c: # Check if different from central
+    if cpts_o and isinstance(cpts_o, Mapping) and cpts_o != cpts_c: # Check if different from central
         print("Running optimistic estimate...")
-        final_probs_o = update_all_probabilities_manual(user_evidence, cpts_o)
+        final_probs_o = scenario_results[id(cpts_o)]
         p_doom_dist_o = final_probs_o.get('P_doom_2035', {})
         if p_doom_dist_o and isinstance(p_doom_dist_o, dict):
             pdoom_high_vh_optimistic = p_doom_dist_o.get('High', 0.0) + p_doom_dist_o.get('VeryHigh', 0.0)
         else: print("  Warning: Optimistic estimate failed or returned invalid type.")
     else: print("  Skipping optimistic estimate (CPTs invalid or same as central).")
 
-    if cpts_p and isinstance(cpts_p, dict) and cpts_p != cpts_c: # Check if different from central
+    if cpts_p and isinstance(cpts_p, Mapping) and cpts_p != cpts_c: # Check if different from central
         print("Running pessimistic estimate...")
-        final_probs_p = update_all_probabilities_manual(user_evidence, cpts_p)
+        final_probs_p = scenario_results[id(cpts_p)]
         p_doom_dist_p = final_probs_p.get('P_doom_2035', {})
         if p_doom_dist_p and isinstance(p_doom_dist_p, dict):
             pdoom_high_vh_pessimistic = p_doom_dist_p.get('High', 0.0) + p_doom_dist_p.get('VeryHigh', 0.0)
@@ -576,6 +894,7 @@ def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
 
     # --- Determine 2035 Bounds ---
     valid_results_2035 = []
+    range_method = 'perturbation' # Uncertainty model behind the displayed 2035 range
     if pdoom_high_vh_central is not None: valid_results_2035.append(pdoom_high_vh_central)
     if pdoom_high_vh_optimistic is not None: valid_results_2035.append(pdoom_high_vh_optimistic)
     if pdoom_high_vh_pessimistic is not None: valid_results_2035.append(pdoom_high_vh_pessimistic)
@@ -589,15 +908,45 @@ def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
     else:
         final_pdoom_lower_2035 = min(valid_results_2035) * 100
         final_pdoom_upper_2035 = max(valid_results_2035) * 100
+        lower_label, upper_label = "Optimistic Sensitivity", "Pessimistic Sensitivity"
+        if UNCERTAINTY_MODE == 'dirichlet':
+            network = get_compiled_network(cpts_c) if cpts_c else None
+            if network is None:
+                print("  Warning: Dirichlet uncertainty needs compiled central CPTs. Using perturbation bounds.", file=sys.stderr)
+            else:
+                print(f"Sampling {DIRICHLET_SAMPLES:,} CPT sets (Dirichlet concentration {DIRICHLET_CONCENTRATION:g})...")
+                summary = bn_uncertainty.summarize(bn_uncertainty.cpt_uncertainty(
+                    network, user_evidence, DIRICHLET_SAMPLES, DIRICHLET_CONCENTRATION, UNCERTAINTY_WORKERS))
+                final_pdoom_lower_2035, final_pdoom_upper_2035 = summary['q5'] * 100, summary['q95'] * 100
+                lower_label, upper_label = "Dirichlet 5th Percentile", "Dirichlet 95th Percentile"
+                range_method = 'dirichlet'
+        elif UNCERTAINTY_MODE == 'credal':
+            network = get_compiled_network(cpts_c) if cpts_c else None
+            if network is None:
+                print("  Warning: Credal bounds need compiled central CPTs. Using perturbation bounds.", file=sys.stderr)
+            else:
+                try:
+                    print("Computing credal bounds over the CPT intervals...")
+                    credal = bn_credal.credal_network_for(network, PERTURBATION_DELTA, CREDAL_NODES, CREDAL_INTERVALS_PATH,
+                                                          'forward' if INFERENCE_MODE == 'forward' else 'exact')
+                    lower, upper = credal.bounds(user_evidence)
+                    final_pdoom_lower_2035, final_pdoom_upper_2035 = lower * 100, upper * 100
+                    if credal.is_tight(user_evidence):
+                        lower_label, upper_label = "Credal Lower Bound", "Credal Upper Bound"
+                    else: # Several imprecise nodes or soft evidence: coordinate ascent gives an inner approximation of the interval
+                        lower_label, upper_label = "Credal (approx.) Lower", "Credal (approx.) Upper"
+                    range_method = 'credal'
+                except (OSError, ValueError) as e:
+                    print(f"  Warning: Could not compute credal bounds ({e}). Using perturbation bounds.", file=sys.stderr)
         central_point_2035_percent = (pdoom_high_vh_central * 100) if pdoom_high_vh_central is not None else (final_pdoom_lower_2035 + final_pdoom_upper_2035) / 2
 
         print("\nFinal P(doom by 2035) Estimate Range based on your answers:")
-        print(f" -> Lower Bound (Optimistic Sensitivity): {final_pdoom_lower_2035:.1f}%")
+        print(f" -> Lower Bound ({lower_label}): {final_pdoom_lower_2035:.1f}%")
         if pdoom_high_vh_central is not None:
              print(f" -> Central Estimate:                   {central_point_2035_percent:.1f}%")
         else:
              print(f" -> Central Estimate:                   (Calculation Failed, Midpoint Shown: {central_point_2035_percent:.1f}%)")
-        print(f" -> Upper Bound (Pessimistic Sensitivity): {final_pdoom_upper_2035:.1f}%")
+        print(f" -> Upper Bound ({upper_label}): {final_pdoom_upper_2035:.1f}%")
         print(f"\n   Suggesting a plausible 2035 range of: {final_pdoom_lower_2035:.0f}% - {final_pdoom_upper_2035:.0f}% for P(Doom=High or VeryHigh)")
 
         # --- Get Timeline for Heuristics ---
@@ -624,6 +973,20 @@ def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
     pdoom_central_2100 = calculate_heuristic_pdoom(central_point_2035_percent, timeline_state_for_heuristic, 2100)
     pdoom_upper_2100 = calculate_heuristic_pdoom(final_pdoom_upper_2035, timeline_state_for_heuristic, 2100)
 
+    if HORIZON_MODEL == 'timeline_mixture':
+        horizon = calculate_horizon_ranges(user_evidence, [cpts_c, cpts_o, cpts_p], sorted(set(HORIZON_YEARS) | {2050, 2100}))
+        if horizon is None:
+            print("Warning: Horizon curves need compiled CPTs. Using the heuristic estimates.", file=sys.stderr)
+        else:
+            print("Curves mix every Timeline outcome, weighted by its probability given your answers.")
+            print(f"Horizon ranges span the optimistic / pessimistic CPT perturbation (+/- {PERTURBATION_DELTA*100:.0f}% points)"
+                  + ("." if range_method == 'perturbation' else f", not the {range_method} range shown for 2035."))
+            for year, (lower, central, upper) in horizon.items():
+                if year in HORIZON_YEARS:
+                    print(f" -> P(doom by {year}): ~{central:.1f}% (range {lower:.0f}% - {upper:.0f}%)")
+            (pdoom_lower_2050, pdoom_central_2050, pdoom_upper_2050) = horizon[2050]
+            (pdoom_lower_2100, pdoom_central_2100, pdoom_upper_2100) = horizon[2100]
+
     # Display Heuristic Results
     if all(p is not None for p in [pdoom_lower_2050, pdoom_central_2050, pdoom_upper_2050]):
         print("\nHeuristic P(doom by 2050) Estimate Range:")
@@ -700,8 +1063,14 @@ def compare_expert(year_str, user_estimate_percent, experts_data):
 
 # --- Main execution ---
 if __name__ == "__main__":
+    try:
+        CPTS_central = MODEL.central
+    except ValueError:
+        print("Exiting due to CPT loading failure.", file=sys.stderr)
+        sys.exit(1)
+
     # Perform quiz to get evidence
     user_evidence = run_quiz(CPTS_central)
 
     # Calculate and display final results including sensitivity and heuristics
-    display_final_results(user_evidence, CPTS_central, CPTS_optimistic, CPTS_pessimistic)
\ No newline at end of file
+    display_final_results(user_evidence, CPTS_central, MODEL.optimistic, MODEL.pessimistic)
\ No newline at end of file
@@ -7,21 +7,40 @@
 # MODIFIED: Displays final probability as a range based on simplified sensitivity analysis.
 # ADDED: Heuristic calculation for P(doom) by 2050 and 2100 based on 2035 result and Timeline.
 # ADDED: Text-based bar chart comparing user's 2035 estimate to expert spectrum.
+# ADDED: Parsed CPTs are snapshotted next to the JSON (bn_cache) and reused while the JSON's hash matches.
+# MODIFIED: CPTs load lazily through CPTModel (MODEL); importing the module reads and prints nothing.
+# MODIFIED: Optimistic / pessimistic CPTs are copy-on-write layers (bn_engine.LayeredCPTs) over the loaded CPTs, not deep copies.
 
 import itertools
 import csv
 import os
 import sys
 import json
-import copy
+from collections import OrderedDict
+from collections.abc import Mapping
+import hashlib
+import time
 import numpy as np
+import bn_cache
+import bn_engine
+import bn_exact
+import bn_sampling
 import shutil # For getting terminal width
 
 # --- Configuration ---
 EXPERTS_CSV_PATH = 'experts_pdoom.csv'
 CPTS_JSON_PATH = 'bn_cpts.json'
+CPTS_SNAPSHOT_PATH = 'bn_cpts.snapshot' # Parsed CPTs keyed by the JSON's SHA-256, reused on restart (None = always parse)
+COMPILED_CPTS_PATH = 'bn_cpts.bnc' # Memory-mapped tensors compiled from CPTS_JSON_PATH (rebuilt when the JSON changes)
 KEY_DELIMITER = '|'
 PERTURBATION_DELTA = 0.10 # For sensitivity analysis on 2035 CPT
+INFERENCE_MODE = 'forward' # 'forward' (top-down pass), 'exact' (junction tree posteriors) or 'sampling' (likelihood weighting)
+SAMPLING_TARGET_SE = 0.005 # INFERENCE_MODE = 'sampling': stop once every marginal's standard error is below this
+SAMPLING_MAX_SAMPLES = 1000000
+SAMPLING_SEED = 0 # Fixed so repeated queries (and cached results) agree
+RESULT_CACHE_SIZE = 4096 # Max in-memory cached query results (LRU)
+COMPILED_CACHE_SIZE = 32 # Max CPT sets kept compiled (LRU); each entry pins its CPT dict and network
+RESULT_CACHE_PATH = None # e.g. 'bn_results.sqlite' to keep cached results across restarts
 
 # --- Heuristic Configuration ---
 BASE_INCREASE_2050 = 7.5
@@ -114,47 +133,58 @@ STATES = {
 }
 
 # --- 3. Load CPTs from JSON File ---
-def load_cpts_from_json(json_path, parents_map, delimiter):
-    # [Function unchanged from previous version]
+def load_cpts_from_json(json_path, parents_map, delimiter, snapshot_path=None):
+    # [Clean parses are snapshotted at snapshot_path, keyed by the JSON's SHA-256, and reused while it matches]
     print(f"Loading CPTs from {json_path}...")
     if not os.path.exists(json_path):
         print(f"Error: CPTs file not found at {json_path}", file=sys.stderr); return None
+    start = time.perf_counter()
     try:
-        with open(json_path, 'r', encoding='utf-8') as f: raw_cpts = json.load(f)
+        with open(json_path, 'rb') as f: raw_bytes = f.read() # Hash and parse the same bytes
+        if snapshot_path:
+            key = bn_cache.snapshot_key(hashlib.sha256(raw_bytes).hexdigest(), [parents_map, STATES, delimiter])
+            snapshot = bn_cache.load_snapshot(snapshot_path, key)
+            if snapshot is not None: print(f"Successfully loaded CPTs for {len(snapshot)} nodes from snapshot {snapshot_path} (hash match, {(time.perf_counter() - start) * 1000:.1f} ms)."); return snapshot
+        raw_cpts = json.loads(raw_bytes.decode('utf-8'))
     except Exception as e: print(f"Error reading/parsing {json_path}: {e}", file=sys.stderr); return None
 
-    reconstructed_cpts = {}; nodes_processed = set()
+    reconstructed_cpts = {}; nodes_processed = set(); clean = True
     for node_name, node_data in raw_cpts.items():
         nodes_processed.add(node_name)
-        if node_name not in parents_map: continue # Skip unknown node
+        if node_name not in parents_map: clean = False; continue # Skip unknown node
         parent_nodes = parents_map.get(node_name, [])
         if not parent_nodes: # Prior
             if isinstance(node_data, dict): reconstructed_cpts[node_name] = node_data
+            else: clean = False
         else: # Conditional
-            if not isinstance(node_data, dict): continue # Skip invalid format
+            if not isinstance(node_data, dict): clean = False; continue # Skip invalid format
+            if bn_engine.is_parametric(node_data): # e.g. noisy-MAX: kept as a spec, compiled in factorized form
+                try: bn_engine.parametric_cpt_from_dict(node_name, node_data, parent_nodes, STATES); reconstructed_cpts[node_name] = node_data
+                except ValueError as e: print(f"Warning: Invalid parametric CPT for '{node_name}': {e} Skipping.", file=sys.stderr); clean = False
+                continue
             converted_conditional_cpt = {}
             num_expected_parents = len(parent_nodes)
             for joined_key, child_distribution in node_data.items():
                 parent_states_list = joined_key.split(delimiter)
-                if len(parent_states_list) != num_expected_parents: continue # Skip mismatched key
+                if len(parent_states_list) != num_expected_parents: clean = False; continue # Skip mismatched key
                 tuple_key = tuple(parent_states_list)
                 if isinstance(child_distribution, dict):
                     converted_conditional_cpt[tuple_key] = child_distribution
+                else: clean = False
             reconstructed_cpts[node_name] = converted_conditional_cpt
 
     missing_nodes = set(parents_map.keys()) - nodes_processed
-    if missing_nodes: print(f"Warning: Nodes in PARENTS but not in JSON: {missing_nodes}", file=sys.stderr)
+    if missing_nodes: print(f"Warning: Nodes in PARENTS but not in JSON: {missing_nodes}", file=sys.stderr); clean = False
     print(f"Successfully loaded CPTs for {len(reconstructed_cpts)} nodes found in JSON.")
+    if snapshot_path and clean: # A hit must never hide a warning
+        saved = bn_cache.save_snapshot(snapshot_path, key, reconstructed_cpts)
+        print(f"(parsed in {(time.perf_counter() - start) * 1000:.1f} ms; {'snapshot written to ' + snapshot_path if saved else 'snapshot not written'})")
     return reconstructed_cpts
 
-# --- Load the CPTs ---
-LOADED_CPTS = load_cpts_from_json(CPTS_JSON_PATH, PARENTS, KEY_DELIMITER)
-if LOADED_CPTS is None: sys.exit("Exiting due to CPT loading failure.")
-
 # --- Perturbation Helper Function ---
 def perturb_distribution(dist, delta, pessimistic=True):
     # [Function unchanged from previous version]
-    is_pdoom_node = list(dist.keys()) == STATES['P_doom_2035']
+    is_pdoom_node = set(dist.keys()) == set(STATES['P_doom_2035'])
     if not is_pdoom_node: return dist
     new_dist = dist.copy(); states_ordered = STATES['P_doom_2035']
     shift_per_state_pair = delta / 2.0
@@ -180,33 +210,32 @@ def perturb_distribution(dist, delta, pessimistic=True):
     return normalize_dist(new_dist)
 
 # --- Create Perturbed CPTs based on Loaded Data ---
-CPTS_central = LOADED_CPTS
-CPTS_optimistic = copy.deepcopy(LOADED_CPTS)
-CPTS_pessimistic = copy.deepcopy(LOADED_CPTS)
-target_node_for_perturbation = 'P_doom_2035'
-# [Perturbation logic unchanged from previous version - applies perturbation if possible]
-if target_node_for_perturbation in CPTS_central and isinstance(CPTS_central[target_node_for_perturbation], dict):
+def perturbed_cpts(loaded_cpts, delta=PERTURBATION_DELTA):
+    """(optimistic, pessimistic) layers over loaded_cpts with P_doom_2035 shifted by delta (both are loaded_cpts if it cannot be perturbed)."""
+    target_node_for_perturbation = 'P_doom_2035'
+    if not (target_node_for_perturbation in loaded_cpts and isinstance(loaded_cpts[target_node_for_perturbation], dict)):
+        print(f"Warning: Cannot perturb '{target_node_for_perturbation}'. Sensitivity range will be based on central estimate only.", file=sys.stderr)
+        return loaded_cpts, loaded_cpts # Fallback
     print(f"Perturbing CPT for node: {target_node_for_perturbation}")
-    original_pdoom_cpt = CPTS_central[target_node_for_perturbation]
+    original_pdoom_cpt = loaded_cpts[target_node_for_perturbation]
+    if bn_engine.is_parametric(original_pdoom_cpt): original_pdoom_cpt = bn_engine.expand_parametric_cpt(target_node_for_perturbation, original_pdoom_cpt, PARENTS[target_node_for_perturbation], STATES)
     perturbed_pdoom_optimistic = {}
     perturbed_pdoom_pessimistic = {}
     for condition, dist in original_pdoom_cpt.items():
          if isinstance(condition, tuple) and isinstance(dist, dict):
               norm_dist = normalize_dist(dist)
-              perturbed_pdoom_optimistic[condition] = perturb_distribution(norm_dist, PERTURBATION_DELTA, pessimistic=False)
-              perturbed_pdoom_pessimistic[condition] = perturb_distribution(norm_dist, PERTURBATION_DELTA, pessimistic=True)
+              perturbed_pdoom_optimistic[condition] = perturb_distribution(norm_dist, delta, pessimistic=False)
+              perturbed_pdoom_pessimistic[condition] = perturb_distribution(norm_dist, delta, pessimistic=True)
          else: perturbed_pdoom_optimistic[condition] = dist; perturbed_pdoom_pessimistic[condition] = dist # Keep original if format wrong
-    CPTS_optimistic[target_node_for_perturbation] = perturbed_pdoom_optimistic
-    CPTS_pessimistic[target_node_for_perturbation] = perturbed_pdoom_pessimistic
-else:
-    print(f"Warning: Cannot perturb '{target_node_for_perturbation}'. Sensitivity range will be based on central estimate only.", file=sys.stderr)
-    CPTS_optimistic = CPTS_central; CPTS_pessimistic = CPTS_central # Fallback
+    return (bn_engine.LayeredCPTs(loaded_cpts, {target_node_for_perturbation: perturbed_pdoom_optimistic}), # Other nodes stay shared with loaded_cpts
+            bn_engine.LayeredCPTs(loaded_cpts, {target_node_for_perturbation: perturbed_pdoom_pessimistic}))
 
 # --- 4. Simplified Inference Logic ---
 def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
     # [Function unchanged internally from previous version - includes robustness checks]
     if node in evidence:
-        if node not in STATES: return {}; dist = {state: 0.0 for state in STATES[node]}; dist[evidence[node]] = 1.0; return dist
+        if node not in STATES: return {}
+        dist = {state: 0.0 for state in STATES[node]}; dist[evidence[node]] = 1.0; return dist
     parent_nodes = PARENTS.get(node, [])
     if not parent_nodes: # Root
         if node not in all_cpts: print(f"Error: Prior CPT missing '{node}'. Uniform.", file=sys.stderr); node_states = STATES.get(node, []); return {s: 1./len(node_states) for s in node_states} if node_states else {}
@@ -216,6 +245,7 @@ def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
     if not node_states: return node_dist
     cpt = all_cpts.get(node)
     if not cpt or not isinstance(cpt, dict): print(f"Error: CPT missing/invalid '{node}'.", file=sys.stderr); return node_dist
+    if bn_engine.is_parametric(cpt): cpt = bn_engine.expand_parametric_cpt(node, cpt, parent_nodes, STATES) # Dict pass needs explicit rows
     parent_states_list = [STATES.get(p_node) for p_node in parent_nodes]
     if not all(parent_states_list): return node_dist
     parent_state_combinations = list(itertools.product(*parent_states_list))
@@ -232,22 +262,90 @@ def calculate_marginal_manual(node, evidence, current_probabilities, all_cpts):
         for node_state in node_states: node_dist[node_state] += norm_cond_dist.get(node_state, 0.0) * prob_parents
     return normalize_dist(node_dist)
 
-def update_all_probabilities_manual(evidence, master_cpt_dict):
-    # [Function unchanged internally from previous version - includes robustness checks]
-    calculation_order = [
-        'Timeline', 'Coordination', 'Interpretability', 'MisusePotential', 'AlignmentSolvability',
-        'Competition', 'WarningShot', 'SelfReplication', 'Regulation', 'DeceptionRisk',
-        'PowerConcentration', 'ControlLossRisk', 'P_doom_2035'
-    ]
+try: CALCULATION_ORDER = bn_engine.topological_order(PARENTS) # Parents before children, derived from PARENTS
+except ValueError as e: sys.exit(f"Error: Invalid network structure: {e}")
+
+def update_all_probabilities_reference(evidence, master_cpt_dict):
+    # [Original dict-based forward pass - kept as reference for the compiled engine]
     current_probabilities = {}
-    if not master_cpt_dict or not isinstance(master_cpt_dict, dict): print("Error: Invalid master_cpt_dict.", file=sys.stderr); return {}
-    for node in calculation_order:
+    if not master_cpt_dict or not isinstance(master_cpt_dict, Mapping): print("Error: Invalid master_cpt_dict.", file=sys.stderr); return {}
+    for node in CALCULATION_ORDER:
         if node not in master_cpt_dict and node not in evidence:
             print(f"Crit Warn: Node '{node}' missing CPTs/evidence. Uniform.", file=sys.stderr)
             node_states = STATES.get(node, []); current_probabilities[node] = {s: 1./len(node_states) for s in node_states} if node_states else {}; continue
         current_probabilities[node] = calculate_marginal_manual(node, evidence, current_probabilities, master_cpt_dict)
     return current_probabilities
 
+RESULT_CACHE = bn_cache.ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_PATH) # Keyed by CPT hash, mode and evidence
+COMPILED_NETWORKS = OrderedDict() # id(cpt dict) -> (cpt dict, CompiledNetwork or None), least recently used first
+
+def cache_compiled_network(master_cpt_dict, network):
+    COMPILED_NETWORKS[id(master_cpt_dict)] = (master_cpt_dict, network); COMPILED_NETWORKS.move_to_end(id(master_cpt_dict))
+    while len(COMPILED_NETWORKS) > COMPILED_CACHE_SIZE: COMPILED_NETWORKS.popitem(last=False)
+
+def get_compiled_network(master_cpt_dict):
+    cached = COMPILED_NETWORKS.get(id(master_cpt_dict))
+    if cached is not None and cached[0] is master_cpt_dict: COMPILED_NETWORKS.move_to_end(id(master_cpt_dict)); return cached[1]
+    base_network = get_compiled_network(master_cpt_dict.base) if isinstance(master_cpt_dict, bn_engine.LayeredCPTs) else None
+    try: network = bn_engine.compile_layered(base_network, master_cpt_dict.overrides) if base_network is not None else bn_engine.compile_network(PARENTS, STATES, master_cpt_dict, CALCULATION_ORDER) # Layers share the base tensors
+    except ValueError as e: print(f"Warning: Could not compile CPTs ({e}). Using dict-based pass.", file=sys.stderr); network = None
+    cache_compiled_network(master_cpt_dict, network)
+    return network
+
+# --- Lazy CPT Model ---
+class CPTModel:
+    """Central / optimistic / pessimistic CPTs from one JSON, loaded and perturbed on first use and cached. Raises ValueError if the JSON cannot be loaded."""
+    def __init__(self, cpts_json_path=CPTS_JSON_PATH, snapshot_path=CPTS_SNAPSHOT_PATH, compiled_path=COMPILED_CPTS_PATH, delta=PERTURBATION_DELTA):
+        self.cpts_json_path, self.snapshot_path, self.compiled_path, self.delta = cpts_json_path, snapshot_path, compiled_path, delta
+        self._central = self._perturbed = None
+    @property
+    def central(self):
+        if self._central is None:
+            cpts = load_cpts_from_json(self.cpts_json_path, PARENTS, KEY_DELIMITER, self.snapshot_path)
+            if cpts is None: raise ValueError(f"Could not load CPTs from {self.cpts_json_path}.")
+            if self.compiled_path: # Serve the JSON CPTs from the memory-mapped artifact when it was built from the current JSON
+                cache_compiled_network(cpts, bn_engine.load_or_compile(self.compiled_path, self.cpts_json_path, lambda: get_compiled_network(cpts), (PARENTS, STATES, CALCULATION_ORDER)))
+            self._central = cpts
+        return self._central
+    @property
+    def optimistic(self): return self.perturbed()[0]
+    @property
+    def pessimistic(self): return self.perturbed()[1]
+    def perturbed(self):
+        if self._perturbed is None: self._perturbed = perturbed_cpts(self.central, self.delta)
+        return self._perturbed
+    def build(self): return (self.central,) + self.perturbed() # (central, optimistic, pessimistic), built now
+
+MODEL = CPTModel() # Default model for bn_cpts.json, built on first use rather than on import
+
+def __getattr__(name): # LOADED_CPTS / CPTS_central / CPTS_optimistic / CPTS_pessimistic stay available as lazy module attributes
+    if name in ('LOADED_CPTS', 'CPTS_central'): return MODEL.central
+    if name == 'CPTS_optimistic': return MODEL.optimistic
+    if name == 'CPTS_pessimistic': return MODEL.pessimistic
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def update_all_probabilities_manual(evidence, master_cpt_dict):
+    # [Compiled NumPy forward pass - falls back to the dict-based pass for unusual inputs]
+    if not master_cpt_dict or not isinstance(master_cpt_dict, Mapping): print("Error: Invalid master_cpt_dict.", file=sys.stderr); return {}
+    if any(node in STATES and not bn_engine.is_soft_evidence(state) and state not in STATES[node] for node, state in evidence.items()): return update_all_probabilities_reference(evidence, master_cpt_dict)
+    network = get_compiled_network(master_cpt_dict)
+    if network is None: return update_all_probabilities_reference(evidence, master_cpt_dict)
+    if INFERENCE_MODE == 'exact': compute = lambda: bn_exact.junction_tree_for(network).marginals(evidence)
+    elif INFERENCE_MODE == 'sampling': compute = lambda: bn_sampling.estimate_marginals(network, evidence, network.nodes, SAMPLING_TARGET_SE, SAMPLING_MAX_SAMPLES, seed=SAMPLING_SEED).marginals()
+    else: compute = lambda: network.marginals(evidence)
+    settings = (SAMPLING_TARGET_SE, SAMPLING_MAX_SAMPLES, SAMPLING_SEED) if INFERENCE_MODE == 'sampling' else () # Sampled results depend on these
+    return bn_cache.cached_query(RESULT_CACHE, master_cpt_dict, INFERENCE_MODE, evidence, compute, settings)
+
+def update_scenarios_manual(evidence, cpt_dicts):
+    # [Several CPT variants at once; in forward mode marginals upstream of every CPT difference are computed once]
+    networks = [get_compiled_network(c) if c and isinstance(c, Mapping) else None for c in cpt_dicts]
+    if INFERENCE_MODE != 'forward' or any(n is None for n in networks) or any(node in STATES and not bn_engine.is_soft_evidence(state) and state not in STATES[node] for node, state in evidence.items()): return [update_all_probabilities_manual(evidence, c) for c in cpt_dicts]
+    computed = []
+    def compute(k):
+        if not computed: computed.extend(n.to_dicts(m) for n, m in zip(networks, bn_engine.evaluate_scenarios(networks, evidence)))
+        return computed[k]
+    return [bn_cache.cached_query(RESULT_CACHE, c, INFERENCE_MODE, evidence, lambda k=k: compute(k)) for k, c in enumerate(cpt_dicts)]
+
 # --- 5. Define Questions and Mapping (Unchanged) ---
 questions_map = {
     'Q14': {'level': 1, 'text': "Broadly, when do you expect AI systems to significantly surpass human cognitive abilities?", 'node': 'Timeline', 'options': {'1': ('Before 2035', 'Early'), '2': ('2035-2050', 'Mid'), '3': ('2050-2070', 'Late'), '4': ('After 2070 / Never', 'Late')}},
@@ -272,7 +370,7 @@ def run_quiz(initial_cpts):
     user_evidence = {}; current_level = 0
     print("\n" + "="*50 + "\n--- AI Risk Assessment (Manual BN Simulation - Target 2035) ---\n" + "="*50)
     print("NOTE: Probabilities loaded from JSON. Includes sensitivity range & heuristics.")
-    if initial_cpts and isinstance(initial_cpts, dict):
+    if initial_cpts and isinstance(initial_cpts, Mapping):
         all_probs_initial = update_all_probabilities_manual({}, initial_cpts)
         initial_prob_dist = all_probs_initial.get('P_doom_2035', {})
         print("\nInitial Estimated P(doom by 2035) Distribution (Approx Ranges):")
@@ -399,16 +497,18 @@ def display_final_results(user_evidence, cpts_c, cpts_o, cpts_p):
     final_probs_central = {}
 
     print(f"Calculating 2035 range using P(doom) CPT perturbation delta: +/- {PERTURBATION_DELTA*100:.0f}% points...")
-    if cpts_c and isinstance(cpts_c, dict):
-        print("Running central estimate..."); final_probs_central = update_all_probabilities_manual(user_evidence, cpts_c)
+    scenarios = [c for c in (cpts_c, cpts_o, cpts_p) if c and isinstance(c, Mapping)]
+    scenario_results = dict(zip(map(id, scenarios), update_scenarios_manual(user_evidence, scenarios))) # Shared upstream marginals
+    if cpts_c and isinstance(cpts_c, Mapping):
+        print("Running central estimate..."); final_probs_central = scenario_results[id(cpts_c)]
         p_doom_dist_c = final_probs_central.get('P_doom_2035', {})
         if p_doom_dist_c and isinstance(p_doom_dist_c, dict): pdoom_high_vh_central = p_doom_dist_c.get('High', 0.0) + p_doom_dist_c.get('VeryHigh', 0.0)
-    if cpts_o and isinstance(cpts_o, dict) and cpts_o != cpts_c:
-        print("Running optimistic estimate..."); final_probs_o = update_all_probabilities_manual(user_evidence, cpts_o)
+    if cpts_o and isinstance(cpts_o, Mapping) and cpts_o != cpts_c:
+        print("Running optimistic estimate..."); final_probs_o = scenario_results[id(cpts_o)]
         p_doom_dist_o = final_probs_o.get('P_doom_2035', {})
         if p_doom_dist_o and isinstance(p_doom_dist_o, dict): pdoom_high_vh_optimistic = p_doom_dist_o.get('High', 0.0) + p_doom_dist_o.get('VeryHigh', 0.0)
-    if cpts_p and isinstance(cpts_p, dict) and cpts_p != cpts_c:
-        print("Running pessimistic estimate..."); final_probs_p = update_all_probabilities_manual(user_evidence, cpts_p)
+    if cpts_p and isinstance(cpts_p, Mapping) and cpts_p != cpts_c:
+        print("Running pessimistic estimate..."); final_probs_p = scenario_results[id(cpts_p)]
         p_doom_dist_p = final_probs_p.get('P_doom_2035', {})
         if p_doom_dist_p and isinstance(p_doom_dist_p, dict): pdoom_high_vh_pessimistic = p_doom_dist_p.get('High', 0.0) + p_doom_dist_p.get('VeryHigh', 0.0)
 
@@ -502,5 +602,7 @@ def compare_expert(year_str, user_estimate_percent, experts_data):
 
 # --- Main execution ---
 if __name__ == "__main__":
+    try: CPTS_central = MODEL.central
+    except ValueError: sys.exit("Exiting due to CPT loading failure.")
     user_evidence = run_quiz(CPTS_central)
-    display_final_results(user_evidence, CPTS_central, CPTS_optimistic, CPTS_pessimistic)
\ No newline at end of file
+    display_final_results(user_evidence, CPTS_central, MODEL.optimistic, MODEL.pessimistic)
\ No newline at end of file